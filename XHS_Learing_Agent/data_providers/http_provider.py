@@ -1,6 +1,7 @@
 from typing import List, Optional
 from loguru import logger
 import requests
+from requests.adapters import HTTPAdapter
 from model_service.interfaces import DataProvider, NoteInfo
 
 
@@ -15,12 +16,16 @@ class HTTPDataProvider(DataProvider):
         """
         self.spider_api_url = spider_api_url.rstrip('/')
         self.timeout = timeout
+        # 复用到爬虫服务的长连接
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_maxsize=10))
+        self.session.mount('https://', HTTPAdapter(pool_maxsize=10))
         logger.info(f"✅ 初始化HTTP数据提供者，爬虫服务地址: {self.spider_api_url}")
     
     def _check_health(self) -> bool:
         """检查爬虫服务是否可用"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.spider_api_url}/health",
                 timeout=5
             )
@@ -52,7 +57,7 @@ class HTTPDataProvider(DataProvider):
             
             logger.info(f"正在从爬虫服务获取笔记: {len(user_ids)}个用户")
             
-            response = requests.post(
+            response = self.session.post(
                 url,
                 json=payload,
                 timeout=self.timeout
@@ -2,20 +2,52 @@
 """
 小红书爬虫API服务，负责所有数据获取功能
 """
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g
 from flask_cors import CORS
 from loguru import logger
 from apis.xhs_pc_apis import XHS_Apis
-from xhs_utils.common_util import load_env
-from xhs_utils.note_fetcher import NoteFetcher
+from xhs_utils.concurrency_limiter import get_concurrency_limiter
+from xhs_utils.config import SpiderConfig
+from xhs_utils.cookie_pool import load_cookie_pool
+from xhs_utils.deadline import set_deadline, reset_deadline, expired
+from xhs_utils.note_detail_cache import get_note_detail_cache
+from xhs_utils.note_fetcher import DETAIL_MODES, NoteFetcher
+from xhs_utils.proxy_pool import load_proxy_pool
+from xhs_utils.rate_limiter import get_rate_limiter
+from xhs_utils.response_cache import get_response_cache
+from xhs_utils.single_flight import get_single_flight
+from xhs_utils.token_registry import USER
+from xhs_utils.xhs_util import warmup, get_sign_stats
 
 app = Flask(__name__)
 CORS(app)  # 允许跨域请求
 
-xhs_apis = XHS_Apis()
+# 从 XHS_COOKIES_FILE / COOKIES_LIST / COOKIES 加载账号池
+cookie_pool = load_cookie_pool()
 
-# 从环境变量加载 cookies
-cookies_str = load_env()
+# 从 XHS_PROXIES_FILE / PROXY_LIST 加载代理池，未配置时直连
+proxy_pool = load_proxy_pool()
+
+xhs_apis = XHS_Apis(cookie_pool=cookie_pool, proxy_pool=proxy_pool)
+
+
+def pick_cookies():
+    """为本次调用从账号池中选择一个账号"""
+    return cookie_pool.acquire() if cookie_pool is not None else None
+
+
+@app.before_request
+def start_deadline():
+    """为每个请求设置截止时间，所有上游请求共享剩余时间"""
+    if SpiderConfig.REQUEST_DEADLINE > 0:
+        g.deadline_token = set_deadline(SpiderConfig.REQUEST_DEADLINE)
+
+
+@app.teardown_request
+def clear_deadline(exc):
+    token = g.pop('deadline_token', None)
+    if token is not None:
+        reset_deadline(token)
 
 
 @app.route('/api/search/user', methods=['POST'])
@@ -52,7 +84,7 @@ def search_user_api():
         
         logger.info(f'收到搜索用户请求: query={query}, page={page}')
         
-        success, msg, res_json = xhs_apis.search_user(query, cookies_str, page, proxies)
+        success, msg, res_json = xhs_apis.search_user(query, pick_cookies(), page, proxies)
         
         if success:
             return jsonify({
@@ -110,7 +142,7 @@ def search_user_batch_api():
         
         logger.info(f'收到批量搜索用户请求: query={query}, require_num={require_num}')
         
-        success, msg, user_list = xhs_apis.search_some_user(query, require_num, cookies_str, proxies)
+        success, msg, user_list = xhs_apis.search_some_user(query, require_num, pick_cookies(), proxies)
         
         if success:
             return jsonify({
@@ -137,6 +169,23 @@ def search_user_batch_api():
         }), 500
 
 
+# /api/users/notes 可返回的字段 -> (NoteFetcher 结果中的字段名, 默认值)
+NOTE_FIELDS = {
+    "note_id": ('note_id', ''),
+    "title": ('title', ''),
+    "desc": ('desc', ''),
+    "type": ('note_type', 'normal'),
+    "liked_count": ('liked_count', 0),
+    "collected_count": ('collected_count', 0),
+    "comment_count": ('comment_count', 0),
+    "user_id": ('user_id', ''),
+    "nickname": ('nickname', ''),
+    "tags": ('tags', []),
+    "note_url": ('note_url', ''),
+}
+DEFAULT_NOTE_FIELDS = ["note_id", "title", "desc", "type", "liked_count", "collected_count", "comment_count", "user_id", "nickname", "tags"]
+
+
 @app.route('/api/users/notes', methods=['POST'])
 def get_users_notes():
     """
@@ -145,7 +194,9 @@ def get_users_notes():
     {
         "user_ids": ["user_id1", "user_id2", ...],
         "max_users": 5,  # 可选，最多处理几个用户，默认5
-        "notes_per_user": 5  # 可选，每个用户获取几条笔记，默认5
+        "notes_per_user": 5,  # 可选，每个用户获取几条笔记，默认5
+        "fields": ["note_id", "title", "liked_count"],  # 可选，返回的字段（列表或逗号分隔），默认为下面示例中的字段
+        "detail": "lazy"  # 可选，none: 只用笔记列表，不请求详情; lazy（默认）: fields 中有列表没有的字段（desc、收藏/评论数、tags）时才请求详情; full: 总是请求详情
     }
     
     返回格式:
@@ -169,7 +220,8 @@ def get_users_notes():
                 ...
             ],
             "count": 25,
-            "users_processed": 5
+            "users_processed": 5,
+            "users": [{"user_id": "...", "success": true, "msg": "success", "count": 5}, ...]
         }
     }
     """
@@ -193,6 +245,17 @@ def get_users_notes():
         
         max_users = data.get('max_users', 5)
         notes_per_user = data.get('notes_per_user', 5)
+        fields = data.get('fields') or DEFAULT_NOTE_FIELDS
+        if isinstance(fields, str):
+            fields = [field.strip() for field in fields.split(',') if field.strip()]
+        detail = data.get('detail', 'lazy')
+        unknown_fields = [field for field in fields if field not in NOTE_FIELDS]
+        if unknown_fields or detail not in DETAIL_MODES:
+            return jsonify({
+                "success": False,
+                "msg": f"不支持的 fields: {unknown_fields}" if unknown_fields else f"detail 只能是 {'、'.join(DETAIL_MODES)}",
+                "data": None
+            }), 400
         
         logger.info(f'收到获取用户笔记请求: {len(user_ids)}个用户')
         
@@ -200,24 +263,15 @@ def get_users_notes():
         user_ids = user_ids[:max_users]
         
         # 获取笔记
-        fetcher = NoteFetcher(cookies_str)
-        notes = fetcher.get_users_latest_notes(user_ids, max_users, notes_per_user)
+        fetcher = NoteFetcher(cookie_pool, xhs_apis)
+        notes, user_results = fetcher.fetch_users_notes(
+            user_ids, max_users, notes_per_user, [NOTE_FIELDS[field][0] for field in fields], detail
+        )
         
-        # 转换为标准格式
+        # 转换为标准格式，只保留请求的字段
         formatted_notes = []
         for note in notes:
-            formatted_notes.append({
-                "note_id": note.get('note_id', ''),
-                "title": note.get('title', ''),
-                "desc": note.get('desc', ''),
-                "type": note.get('note_type', 'normal'),
-                "liked_count": note.get('liked_count', 0),
-                "collected_count": note.get('collected_count', 0),
-                "comment_count": note.get('comment_count', 0),
-                "user_id": note.get('user_id', ''),
-                "nickname": note.get('nickname', ''),
-                "tags": note.get('tags', [])
-            })
+            formatted_notes.append({field: note.get(*NOTE_FIELDS[field]) for field in fields})
         
         return jsonify({
             "success": True,
@@ -225,7 +279,9 @@ def get_users_notes():
             "data": {
                 "notes": formatted_notes,
                 "count": len(formatted_notes),
-                "users_processed": min(len(user_ids), max_users)
+                "users_processed": min(len(user_ids), max_users),
+                "users": user_results,
+                "partial": expired()
             }
         }), 200
         
@@ -298,10 +354,10 @@ def get_users_notes():
 @app.route('/api/user/notes/<user_id>', methods=['GET'])
 def get_user_notes_single(user_id: str):
     """
-    获取单个用户的所有笔记
+    获取单个用户最新的笔记
     查询参数:
     - limit: 限制返回数量，默认20
-    - search_keyword: 可选，用于搜索用户获取xsec_token的关键词
+    - search_keyword: 可选，xsec_token 登记表中没有该用户时，用于搜索用户获取xsec_token的关键词
     """
     try:
         limit = request.args.get('limit', 20, type=int)
@@ -309,15 +365,16 @@ def get_user_notes_single(user_id: str):
         
         logger.info(f'收到获取用户笔记请求: user_id={user_id}, limit={limit}')
         
-        # 构建用户URL
-        user_url = f"https://www.xiaohongshu.com/user/profile/{user_id}"
+        # 先从 xsec_token 登记表获取完整URL，没有时构建基础URL
+        registered_url = xhs_apis.token_registry.user_url(user_id) if xhs_apis.token_registry is not None else None
+        user_url = registered_url or f"https://www.xiaohongshu.com/user/profile/{user_id}"
         
-        # 如果提供了搜索关键词，尝试获取完整URL（包含xsec_token）
-        if search_keyword:
+        # 登记表中没有且提供了搜索关键词时，尝试获取完整URL（包含xsec_token）
+        if not registered_url and search_keyword:
             try:
                 # 搜索用户获取xsec_token
                 success_search, msg_search, res_json = xhs_apis.search_user(
-                    search_keyword, cookies_str, page=1
+                    search_keyword, pick_cookies(), page=1
                 )
                 if success_search and res_json:
                     users = res_json.get('data', {}).get('users', [])
@@ -331,14 +388,11 @@ def get_user_notes_single(user_id: str):
             except Exception as e:
                 logger.warning(f"搜索用户获取token失败: {e}，将使用基础URL")
         
-        # 获取用户所有笔记
-        success, msg, all_note_info = xhs_apis.get_user_all_notes(user_url, cookies_str)
+        # 只获取最新的limit条，凑够后不再翻页
+        success, msg, all_note_info = xhs_apis.get_user_latest_notes(user_url, pick_cookies(), limit=limit)
         
         if success:
-            logger.info(f'用户 {user_id} 作品数量: {len(all_note_info)}')
-            
-            # 限制数量
-            all_note_info = all_note_info[:limit]
+            logger.info(f'用户 {user_id} 获取到 {len(all_note_info)} 条笔记')
             
             # 转换为标准格式（按照main.py的方式遍历）
             formatted_notes = []
@@ -393,7 +447,7 @@ def get_user_notes_single(user_id: str):
 @app.route('/api/user/url/<user_id>', methods=['GET'])
 def get_user_url_with_token(user_id: str):
     """
-    通过用户ID获取包含xsec_token的完整URL
+    通过用户ID获取包含xsec_token的完整URL，优先使用 xsec_token 登记表，没有时再搜索
     查询参数:
     - search_keyword: 搜索关键词（用于搜索用户）
     """
@@ -405,11 +459,27 @@ def get_user_url_with_token(user_id: str):
         # 基础URL
         base_url = f"https://www.xiaohongshu.com/user/profile/{user_id}"
         
+        # 搜索、笔记列表等响应中记录过该用户的 xsec_token 时直接返回
+        token_registry = xhs_apis.token_registry
+        row = token_registry.lookup(USER, user_id) if token_registry is not None else None
+        if row is not None:
+            xsec_token, xsec_source, _ = row
+            return jsonify({
+                "success": True,
+                "msg": "获取完整URL成功",
+                "data": {
+                    "user_id": user_id,
+                    "base_url": base_url,
+                    "full_url": f"{base_url}?xsec_token={xsec_token}&xsec_source={xsec_source}",
+                    "xsec_token": xsec_token
+                }
+            }), 200
+        
         # 如果提供了搜索关键词，尝试获取完整URL
         if search_keyword:
             try:
                 success, msg, res_json = xhs_apis.search_user(
-                    search_keyword, cookies_str, page=1
+                    search_keyword, pick_cookies(), page=1
                 )
                 
                 if success and res_json:
@@ -481,6 +551,31 @@ def get_user_url_with_token(user_id: str):
         }), 500
 
 
+@app.route('/api/stats', methods=['GET'])
+def stats_api():
+    """运行统计接口（签名缓存命中率、限流等待时间等）"""
+    rate_limiter = get_rate_limiter()
+    concurrency_limiter = get_concurrency_limiter()
+    single_flight = get_single_flight()
+    response_cache = get_response_cache()
+    note_detail_cache = get_note_detail_cache()
+    return jsonify({
+        "success": True,
+        "msg": "成功",
+        "data": {
+            "sign": get_sign_stats(),
+            "rate_limit": rate_limiter.stats() if rate_limiter is not None else None,
+            "accounts": cookie_pool.stats() if cookie_pool is not None else [],
+            "account_concurrency": concurrency_limiter.stats() if concurrency_limiter is not None else None,
+            "proxies": proxy_pool.stats() if proxy_pool is not None else None,
+            "single_flight": single_flight.stats() if single_flight is not None else None,
+            "response_cache": response_cache.stats() if response_cache is not None else None,
+            "note_detail_cache": note_detail_cache.stats() if note_detail_cache is not None else None,
+            "token_registry": xhs_apis.token_registry.stats() if xhs_apis.token_registry is not None else None
+        }
+    }), 200
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查接口"""
@@ -499,6 +594,8 @@ if __name__ == '__main__':
     logger.info('批量搜索用户接口: POST /api/search/user/batch')
     logger.info('获取用户笔记接口: POST /api/users/notes')
     logger.info('获取单个用户笔记: GET /api/user/notes/<user_id>')
+    logger.info('运行统计接口: GET /api/stats')
     logger.info('健康检查接口: GET /health')
     logger.info('=' * 60)
+    warmup()
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
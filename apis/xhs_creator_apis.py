@@ -1,12 +1,26 @@
+import urllib.parse
 import requests
-from xhs_utils.cookie_util import trans_cookies
+from xhs_utils.cookie_util import Credential
+from xhs_utils.http_util import get_shared_session, get_timeout
+from xhs_utils.rate_limiter import get_rate_limiter
 from xhs_utils.xhs_creator_util import get_common_headers, generate_xs, splice_str
 from xhs_utils.xhs_util import generate_x_b3_traceid
 
 
 class XHS_Creator_Apis():
-    def __init__(self):
+    def __init__(self, session: requests.Session = None):
+        """
+            :param session: 发送请求使用的 session，默认使用进程内共享的连接池
+        """
         self.base_url = "https://edith.xiaohongshu.com"
+        self.session = session or get_shared_session()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is not None:
+            rate_limiter.acquire((kwargs.get('cookies') or {}).get('a1', ''), urllib.parse.urlparse(url).path)
+        kwargs.setdefault('timeout', get_timeout(url))
+        return self.session.request(method, url, **kwargs)
 
 
     # page: 页数
@@ -25,10 +39,10 @@ class XHS_Creator_Apis():
                 params["page"] = str(page)
             splice_api = splice_str(api, params)
             headers = get_common_headers()
-            cookies = trans_cookies(cookies_str)
-            xs, xt, _ = generate_xs(cookies['a1'], splice_api, '')
+            credential = Credential.of(cookies_str)
+            xs, xt, _ = generate_xs(credential.a1, splice_api, '')
             headers['x-s'], headers['x-t'] = xs, str(xt)
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, verify=False)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=credential.cookies, verify=False)
             res_json = response.json()
             success = res_json["success"]
         except Exception as e:
@@ -1,18 +1,274 @@
 # encoding: utf-8
 import json
+import math
 import re
+import time
 import urllib
+from contextlib import nullcontext
 import requests
-from xhs_utils.xhs_util import splice_str, generate_request_params, generate_x_b3_traceid, get_common_headers
+from xhs_utils.concurrency_limiter import get_concurrency_limiter
+from xhs_utils.config import SpiderConfig
+from xhs_utils.cookie_util import Credential
+from xhs_utils.deadline import expired
+from xhs_utils.http_util import get_shared_session, get_timeout
+from xhs_utils.proxy_pool import to_requests_proxies
+from xhs_utils.raw_store import get_raw_store, stored
+from xhs_utils.rate_limiter import endpoint_family, get_rate_limiter
+from xhs_utils.response_cache import cached
+from xhs_utils.retry_policy import ACCOUNT_ERRORS, OK, SERVER, classify_exception, classify_response, get_retry_policy
+from xhs_utils.single_flight import coalesce
+from xhs_utils.token_registry import get_token_registry, harvested
+from xhs_utils.xhs_util import splice_str, generate_request_params, generate_x_b3_traceid, get_common_headers, presign
 from loguru import logger
 
+# 用户笔记列表接口单页的最大笔记数量
+USER_NOTES_PAGE_SIZE = 30
+
 """
     获小红书的api
-    :param cookies_str: 你的cookies
+    :param cookies_str: 你的cookies，字符串或预先解析好的 xhs_utils.cookie_util.Credential
 """
 class XHS_Apis():
-    def __init__(self):
-        self.base_url = "https://edith.xiaohongshu.com"
+    def __init__(self, session: requests.Session = None, cookie_pool=None, proxy_pool=None, raw_store=None, token_registry=None, base_url: str = None):
+        """
+            :param session: 发送请求使用的 session，默认使用进程内共享的连接池
+            :param cookie_pool: xhs_utils.cookie_pool.CookiePool，传入后统计池中账号的并发数与请求结果
+            :param proxy_pool: xhs_utils.proxy_pool.ProxyPool，调用方没有指定 proxies 时从池中选择代理
+            :param raw_store: xhs_utils.raw_store.RawStore，笔记详情、用户信息、搜索等接口的原始响应写入其中，未过期时直接读取，默认按 SpiderConfig.RAW_STORE_ENABLED 使用全局存储
+            :param token_registry: xhs_utils.token_registry.TokenRegistry，搜索、主页推荐、笔记列表响应中的 xsec_token 记录到其中，默认按 SpiderConfig.TOKEN_REGISTRY_ENABLED 使用全局登记表
+            :param base_url: 上游接口地址，默认 SpiderConfig.XHS_BASE_URL
+        """
+        self.base_url = (base_url or SpiderConfig.XHS_BASE_URL).rstrip('/')
+        self.session = session or get_shared_session()
+        self.cookie_pool = cookie_pool
+        self.proxy_pool = proxy_pool
+        self.raw_store = raw_store or get_raw_store()
+        self.token_registry = token_registry or get_token_registry()
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+            所有接口请求的统一出口
+            未指定 timeout 时使用 SpiderConfig 中的接口超时，并受当前请求截止时间限制
+            网络错误、5xx、限流按接口类别对应的重试策略退避重试，翻页接口重试的仍是失败的那一页
+            限流、验证码等账号级错误换用 cookie 池中的其他账号重新签名后重试，没有可换的账号时不重试
+        """
+        path = urllib.parse.urlparse(url).path
+        policy = get_retry_policy(endpoint_family(path))
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response, kind = self._send(method, url, path, dict(kwargs))
+            except requests.RequestException as e:
+                delay = policy.next_delay(classify_exception(e), attempt, started_at)
+                if delay is None:
+                    raise
+                logger.warning(f'{path} 第 {attempt} 次请求失败（{e}），{delay:.2f}s 后重试')
+            else:
+                delay = policy.next_delay(kind, attempt, started_at) if kind != OK else None
+                if delay is None:
+                    return response
+                # 出错的账号已进入冷却，不能再用它重试
+                if kind in ACCOUNT_ERRORS and not self._switch_account(method, url, kwargs):
+                    return response
+                logger.warning(f'{path} 第 {attempt} 次请求失败（{kind}），{delay:.2f}s 后重试')
+            time.sleep(delay)
+
+    def _switch_account(self, method: str, url: str, kwargs: dict) -> bool:
+        """
+            换用 cookie 池中另一个不在冷却中的账号，并用新账号重新签名，直接修改 kwargs 中的 headers 和 cookies
+            :return: 是否换成功
+        """
+        if self.cookie_pool is None or not url.startswith(self.base_url):
+            return False
+        credential = self.cookie_pool.acquire_other((kwargs.get('cookies') or {}).get('a1', ''))
+        if credential is None:
+            return False
+        data = kwargs.get('data') or ''
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        # 签名使用的 api 为 url 去掉 base_url 的部分（GET 包含查询参数），POST 的 data 为原始请求体
+        kwargs['headers'], kwargs['cookies'], _ = generate_request_params(credential, url[len(self.base_url):], json.loads(data) if data else '', method)
+        logger.info(f'换用账号 {credential.a1[:8]}*** 重试')
+        return True
+
+    def _send(self, method: str, url: str, path: str, kwargs: dict):
+        """
+            发出一次请求，并把结果上报给限流器、代理池和 cookie 池
+            :return: (response, 错误类别)
+        """
+        a1 = (kwargs.get('cookies') or {}).get('a1', '')
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is not None:
+            rate_limiter.acquire(a1, path)
+        concurrency_limiter = get_concurrency_limiter()
+        with concurrency_limiter.slot(a1) if concurrency_limiter is not None else nullcontext():
+            return self._send_request(method, url, a1, kwargs)
+
+    def _send_request(self, method: str, url: str, a1: str, kwargs: dict):
+        """已占用账号并发名额后发出请求"""
+        kwargs.setdefault('timeout', get_timeout(url))
+        proxy = None
+        if self.proxy_pool is not None and not kwargs.get('proxies'):
+            proxy = self.proxy_pool.select(a1)
+            if proxy:
+                kwargs['proxies'] = to_requests_proxies(proxy)
+        tracked = self.cookie_pool is not None and self.cookie_pool.begin(a1)
+        account_ok = None
+        responded = False
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+            kind = classify_response(response)
+            responded = True
+            # 5xx 与账号无关，不计入账号健康分
+            account_ok = None if kind == SERVER else kind not in ACCOUNT_ERRORS
+            return response, kind
+        finally:
+            # 收到任何响应都说明代理可用，连接失败、超时才记为代理失败
+            if proxy:
+                self.proxy_pool.report(proxy, time.monotonic() - start, responded)
+            if tracked:
+                self.cookie_pool.end(a1, account_ok)
+
+    def presign(self, cookies_str: str, sign_items: list):
+        """
+            预先批量签名接下来要发出的请求，签名失败不影响后续请求（届时会现场签名）
+            :param cookies_str: 你的cookies
+            :param sign_items: [(api, data, method), ...]
+        """
+        if not sign_items:
+            return
+        try:
+            presign(Credential.of(cookies_str).a1, sign_items)
+        except Exception as e:
+            logger.warning(f'批量预签名失败: {e}')
+
+    def presign_user_note_info(self, users: list, cookies_str: str, num: int = USER_NOTES_PAGE_SIZE):
+        """
+            批量预签名多个用户笔记列表的第一页
+            :param users: [(user_id, xsec_token, xsec_source), ...]
+            :param cookies_str: 你的cookies
+            :param num: 第一页的笔记数量，需与之后实际请求的一致
+        """
+        num = min(num, USER_NOTES_PAGE_SIZE)
+        self.presign(cookies_str, [(self._user_note_info_api(user_id, '', xsec_token, xsec_source, num), '', 'GET') for user_id, xsec_token, xsec_source in users])
+
+    def presign_note_info(self, urls: list, cookies_str: str):
+        """
+            批量预签名多个笔记详情请求
+            :param urls: 笔记url列表
+            :param cookies_str: 你的cookies
+        """
+        sign_items = []
+        for url in urls:
+            note_id, kvDist = self._parse_url(url)
+            if 'xsec_token' in kvDist:
+                sign_items.append(("/api/sns/web/v1/feed", self._note_info_data(note_id, kvDist['xsec_token'], kvDist.get('xsec_source', 'pc_search')), 'POST'))
+        self.presign(cookies_str, sign_items)
+
+    @staticmethod
+    def _parse_url(url: str):
+        urlParse = urllib.parse.urlparse(url)
+        object_id = urlParse.path.split("/")[-1]
+        kvs = urlParse.query.split('&') if urlParse.query else []
+        # xsec_token 是 base64，末尾可能带 "="，只按第一个 "=" 分割
+        kvDist = dict(kv.split('=', 1) for kv in kvs if '=' in kv)
+        return object_id, kvDist
+
+    @staticmethod
+    def _cursor_page(res_json: dict, items_key: str, remaining: int = None):
+        """
+            解析按 cursor 翻页接口的一页，同步和异步版本共用
+            :param remaining: 还差的条目数量，None 表示不限
+            :return: (本页条目, 下一页的cursor, 新的remaining)，最后一页的cursor为 None
+        """
+        data = res_json.get("data") or {}
+        items = data.get(items_key) or []
+        has_more = bool(items) and data.get("has_more", False) and 'cursor' in data
+        cursor = str(data["cursor"]) if has_more else None
+        if remaining is not None:
+            if len(items) > remaining:
+                # 截断后本页剩余的条目无法用cursor定位，不再提供继续的位置
+                items, cursor = items[:remaining], None
+            remaining -= len(items)
+        return items, cursor, remaining
+
+    @staticmethod
+    def _numbered_page(res_json: dict, items_key: str, page: int, remaining: int = None):
+        """
+            解析按页码翻页接口的一页，同步和异步版本共用
+            :return: (本页条目, 下一页的页码, 新的remaining)，最后一页的页码为 None；响应中没有条目列表时返回 None
+        """
+        data = res_json.get("data") or {}
+        if items_key not in data:
+            return None
+        items = data[items_key]
+        page = page + 1 if data.get("has_more", False) else None
+        if remaining is not None:
+            if len(items) > remaining:
+                items, page = items[:remaining], None
+            remaining -= len(items)
+        return items, page, remaining
+
+    @staticmethod
+    def _iter_pages(fetch, items_key: str, cursor: str = '', limit: int = None, page_size: int = None):
+        """
+            按 cursor 翻页的通用生成器，请求失败时抛出异常
+            :param fetch: fetch(cursor) -> (success, msg, res_json)，指定 page_size 时为 fetch(cursor, num)
+            :param items_key: res_json["data"] 中条目列表的键
+            :param cursor: 从哪一页开始，默认第一页
+            :param limit: 最多获取的条目数量，凑够后不再请求下一页，None 表示不限
+            :param page_size: 接口单页的最大数量，指定时每页只请求还差的数量
+            :return: 逐页生成 (本页条目, 下一页的cursor)，最后一页的cursor为 None；中断后可以用最后拿到的cursor继续
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            if page_size:
+                success, msg, res_json = fetch(cursor, page_size if remaining is None else min(remaining, page_size))
+            else:
+                success, msg, res_json = fetch(cursor)
+            if not success:
+                raise Exception(msg)
+            items, cursor, remaining = XHS_Apis._cursor_page(res_json, items_key, remaining)
+            yield items, cursor
+            if cursor is None:
+                return
+
+    @staticmethod
+    def _iter_page_numbers(fetch, items_key: str, page: int = 1, limit: int = None):
+        """
+            按页码翻页的通用生成器（搜索接口），请求失败时抛出异常
+            :param fetch: fetch(page) -> (success, msg, res_json)
+            :param limit: 最多获取的条目数量，凑够后不再请求下一页，None 表示不限
+            :return: 逐页生成 (本页条目, 下一页的页码)，最后一页的页码为 None
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            success, msg, res_json = fetch(page)
+            if not success:
+                raise Exception(msg)
+            parsed = XHS_Apis._numbered_page(res_json, items_key, page, remaining)
+            if parsed is None:
+                return
+            items, page, remaining = parsed
+            yield items, page
+            if page is None:
+                return
+
+    @staticmethod
+    def _collect(pages):
+        """把翻页生成器的所有条目合并为列表，出错时返回已获取的部分"""
+        item_list = []
+        try:
+            for items, _ in pages:
+                item_list.extend(items)
+            success, msg = True, 'success'
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, item_list
 
     def get_homefeed_all_channel(self, cookies_str: str, proxies: dict = None):
         """
@@ -23,7 +279,7 @@ class XHS_Apis():
         try:
             api = "/api/sns/web/v1/homefeed/category"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -31,6 +287,7 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    @harvested('pc_feed')
     def get_homefeed_recommend(self, category, cursor_score, refresh_type, note_index, cookies_str: str, proxies: dict = None):
         """
             获取主页推荐的笔记
@@ -63,7 +320,7 @@ class XHS_Apis():
                 "need_filter_image": False
             }
             headers, cookies, trans_data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=trans_data, cookies=cookies, proxies=proxies)
+            response = self._request('POST', self.base_url + api, headers=headers, data=trans_data, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -102,6 +359,9 @@ class XHS_Apis():
             note_list = note_list[:require_num]
         return success, msg, note_list
 
+    @cached('user', 'user_id')
+    @coalesce('user_id')
+    @stored('user', 'user_id')
     def get_user_info(self, user_id: str, cookies_str: str, proxies: dict = None):
         """
             获取用户的信息
@@ -117,7 +377,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -135,7 +395,7 @@ class XHS_Apis():
         try:
             api = f"/api/sns/web/v1/user/selfinfo"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -154,7 +414,7 @@ class XHS_Apis():
         try:
             api = f"/api/sns/web/v2/user/me"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -162,28 +422,24 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def get_user_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
+    # 单页笔记数量不影响翻页结果的正确性（cursor 指向最后一条笔记之后），因此不计入缓存key
+    @cached('user_posted', 'user_id', 'cursor')
+    @stored('user_posted', 'user_id', 'cursor')
+    @harvested('pc_user')
+    def get_user_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None, num: int = USER_NOTES_PAGE_SIZE):
         """
             获取用户指定位置的笔记
             :param user_id: 你想要获取的用户的id
             :param cursor: 你想要获取的笔记的cursor
             :param cookies_str: 你的cookies
+            :param num: 本页的笔记数量，最多30
             返回用户指定位置的笔记
         """
         res_json = None
         try:
-            api = f"/api/sns/web/v1/user_posted"
-            params = {
-                "num": "30",
-                "cursor": cursor,
-                "user_id": user_id,
-                "image_formats": "jpg,webp,avif",
-                "xsec_token": xsec_token,
-                "xsec_source": xsec_source,
-            }
-            splice_api = splice_str(api, params)
+            splice_api = self._user_note_info_api(user_id, cursor, xsec_token, xsec_source, num)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -191,7 +447,21 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    @staticmethod
+    def _user_note_info_api(user_id: str, cursor: str, xsec_token='', xsec_source='', num: int = USER_NOTES_PAGE_SIZE):
+        api = f"/api/sns/web/v1/user_posted"
+        params = {
+            "num": str(num),
+            "cursor": cursor,
+            "user_id": user_id,
+            "image_formats": "jpg,webp,avif",
+            "xsec_token": xsec_token,
+            "xsec_source": xsec_source,
+        }
+        return splice_str(api, params)
+
 
+    @coalesce('user_url', empty=list)
     def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None):
         """
            获取用户所有笔记
@@ -199,32 +469,23 @@ class XHS_Apis():
            :param cookies_str: 你的cookies
            返回用户的所有笔记
         """
-        cursor = ''
-        note_list = []
-        try:
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
-            while True:
-                success, msg, res_json = self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
+        success, msg, note_list = self._collect(self.iter_user_notes(user_url, cookies_str, proxies=proxies))
         return success, msg, note_list
+
+    def iter_user_notes(self, user_url: str, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+           逐页获取用户的笔记
+           :param user_url: 用户主页url（可包含xsec_token）
+           :param cursor: 从哪一页开始，默认第一页
+           :param limit: 最多获取的笔记数量，每页只请求还差的数量，None 表示全部
+           生成 (本页笔记, 下一页的cursor)
+        """
+        user_id, kvDist = self._parse_url(user_url)
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
+        yield from self._iter_pages(lambda cursor, num: self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies, num), "notes", cursor, limit, USER_NOTES_PAGE_SIZE)
     
+    @coalesce('user_url', 'limit', empty=list)
     def get_user_latest_notes(self, user_url: str, cookies_str: str, limit: int = 5, proxies: dict = None):
         """
         获取用户最新的前N条笔记（优化版，只获取需要的数量）
@@ -234,70 +495,16 @@ class XHS_Apis():
         :param proxies: 代理设置（可选）
         :return: (success, msg, note_list) 返回最新的前N条笔记
         """
-        cursor = ''
-        note_list = []
-        try:
-            # 解析用户URL，提取user_id和xsec_token
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            
-            # 解析查询参数
-            kvs = urlParse.query.split('&') if urlParse.query else []
-            kvDist = {}
-            for kv in kvs:
-                if '=' in kv:
-                    key, value = kv.split('=', 1)
-                    kvDist[key] = value
-            
-            xsec_token = kvDist.get('xsec_token', '')
-            xsec_source = kvDist.get('xsec_source', 'pc_search')
-            
-            # 只获取需要的数量，不需要获取所有笔记
-            while len(note_list) < limit:
-                success, msg, res_json = self.get_user_note_info(
-                    user_id, cursor, cookies_str, xsec_token, xsec_source, proxies
-                )
-                
-                if not success:
-                    raise Exception(msg)
-                
-                notes = res_json.get("data", {}).get("notes", [])
-                
-                if not notes:
-                    # 没有更多笔记了
-                    break
-                
-                # 添加笔记到列表
-                note_list.extend(notes)
-                
-                # 如果已经获取足够的笔记，停止
-                if len(note_list) >= limit:
-                    # 只保留前limit条
-                    note_list = note_list[:limit]
-                    break
-                
-                # 检查是否还有更多笔记
-                if not res_json.get("data", {}).get("has_more", False):
-                    # 没有更多了
-                    break
-                
-                # 更新cursor，准备获取下一页
-                if 'cursor' in res_json.get("data", {}):
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    # 没有cursor了，停止
-                    break
-            
-            success = True
+        # 每页只请求还差的数量，凑够后不再翻页
+        success, msg, note_list = self._collect(self.iter_user_notes(user_url, cookies_str, proxies=proxies, limit=limit))
+        if success:
             msg = f"成功获取 {len(note_list)} 条笔记"
-            
-        except Exception as e:
-            success = False
-            msg = str(e)
+        elif not expired():
+            # 超过截止时间时保留已获取的部分结果
             note_list = []
-        
         return success, msg, note_list
 
+    @harvested('pc_user')
     def get_user_like_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
         """
             获取用户指定位置喜欢的笔记
@@ -319,7 +526,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -334,33 +541,20 @@ class XHS_Apis():
             :param cookies_str: 你的cookies
             返回用户的所有喜欢笔记
         """
-        cursor = ''
-        note_list = []
-        try:
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_user"
-            while True:
-                success, msg, res_json = self.get_user_like_note_info(user_id, cursor, cookies_str, xsec_token,
-                                                                      xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, note_list
+        return self._collect(self.iter_user_like_notes(user_url, cookies_str, proxies=proxies))
+
+    def iter_user_like_notes(self, user_url: str, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取用户喜欢的笔记
+            :param limit: 最多获取的数量，None 表示全部
+            生成 (本页笔记, 下一页的cursor)
+        """
+        user_id, kvDist = self._parse_url(user_url)
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_user"
+        yield from self._iter_pages(lambda cursor: self.get_user_like_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies), "notes", cursor, limit)
 
+    @harvested('pc_user')
     def get_user_collect_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None):
         """
             获取用户指定位置收藏的笔记
@@ -382,7 +576,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -397,33 +591,22 @@ class XHS_Apis():
             :param cookies_str: 你的cookies
             返回用户的所有收藏笔记
         """
-        cursor = ''
-        note_list = []
-        try:
-            urlParse = urllib.parse.urlparse(user_url)
-            user_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
-            xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
-            xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
-            while True:
-                success, msg, res_json = self.get_user_collect_note_info(user_id, cursor, cookies_str, xsec_token,
-                                                                         xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, note_list
+        return self._collect(self.iter_user_collect_note_info(user_url, cookies_str, proxies=proxies))
 
+    def iter_user_collect_note_info(self, user_url: str, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取用户收藏的笔记
+            :param limit: 最多获取的数量，None 表示全部
+            生成 (本页笔记, 下一页的cursor)
+        """
+        user_id, kvDist = self._parse_url(user_url)
+        xsec_token = kvDist['xsec_token'] if 'xsec_token' in kvDist else ""
+        xsec_source = kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search"
+        yield from self._iter_pages(lambda cursor: self.get_user_collect_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies), "notes", cursor, limit)
+
+    @cached('note', 'url')
+    @coalesce('url')
+    @stored('note', 'url')
     def get_note_info(self, url: str, cookies_str: str, proxies: dict = None):
         """
             获取笔记的详细
@@ -436,32 +619,33 @@ class XHS_Apis():
         success = True 
         msg = "" 
         try:
-            urlParse = urllib.parse.urlparse(url)
-            note_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+            note_id, kvDist = self._parse_url(url)
             api = f"/api/sns/web/v1/feed"
-            data = {
-                "source_note_id": note_id,
-                "image_formats": [
-                    "jpg",
-                    "webp",
-                    "avif"
-                ],
-                "extra": {
-                    "need_body_topic": "1"
-                },
-                "xsec_source": kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search",
-                "xsec_token": kvDist['xsec_token']
-            }
+            data = self._note_info_data(note_id, kvDist['xsec_token'], kvDist['xsec_source'] if 'xsec_source' in kvDist else "pc_search")
             headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=data, cookies=cookies, proxies=proxies)
+            response = self._request('POST', self.base_url + api, headers=headers, data=data, cookies=cookies, proxies=proxies)
             res_json = response.json()
         except Exception as e:
             success = False
             msg = str(e)
         return success, msg, res_json
 
+    @staticmethod
+    def _note_info_data(note_id: str, xsec_token: str, xsec_source: str = "pc_search"):
+        return {
+            "source_note_id": note_id,
+            "image_formats": [
+                "jpg",
+                "webp",
+                "avif"
+            ],
+            "extra": {
+                "need_body_topic": "1"
+            },
+            "xsec_source": xsec_source,
+            "xsec_token": xsec_token
+        }
+
 
     def get_search_keyword(self, word: str, cookies_str: str, proxies: dict = None):
         """
@@ -478,7 +662,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -486,7 +670,10 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
-    def search_note(self, query: str, cookies_str: str, page=1, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None):
+    @cached('search', 'query', 'page', 'sort_type_choice', 'note_type', 'note_time', 'note_range', 'pos_distance', 'geo')
+    @stored('search_note', 'query', 'page', 'sort_type_choice', 'note_type', 'note_time', 'note_range', 'pos_distance', 'geo', policy='search')
+    @harvested('pc_search')
+    def search_note(self, query: str, cookies_str: str, page=1, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None, search_id: str = None):
         """
             获取搜索笔记的结果
             :param query 搜索的关键词
@@ -497,9 +684,24 @@ class XHS_Apis():
             :param note_time 笔记时间 0 不限, 1 一天内, 2 一周内天, 3 半年内
             :param note_range 笔记范围 0 不限, 1 已看过, 2 未看过, 3 已关注
             :param pos_distance 位置距离 0 不限, 1 同城, 2 附近 指定这个必须要指定 geo
+            :param search_id 搜索id，同一次搜索翻页时保持一致，默认随机生成
             返回搜索的结果
         """
         res_json = None
+        try:
+            api = "/api/sns/web/v1/search/notes"
+            data = self._search_note_data(query, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, search_id)
+            headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
+            response = self._request('POST', self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
+            res_json = response.json()
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    @staticmethod
+    def _search_note_data(query: str, page=1, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", search_id: str = None):
         sort_type = "general"
         if sort_type_choice == 1:
             sort_type = "time_descending"
@@ -535,64 +737,55 @@ class XHS_Apis():
             filter_pos_distance = "附近"
         if geo:
             geo = json.dumps(geo, separators=(',', ':'))
-        try:
-            api = "/api/sns/web/v1/search/notes"
-            data = {
-                "keyword": query,
-                "page": page,
-                "page_size": 20,
-                "search_id": generate_x_b3_traceid(21),
-                "sort": "general",
-                "note_type": 0,
-                "ext_flags": [],
-                "filters": [
-                    {
-                        "tags": [
-                            sort_type
-                        ],
-                        "type": "sort_type"
-                    },
-                    {
-                        "tags": [
-                            filter_note_type
-                        ],
-                        "type": "filter_note_type"
-                    },
-                    {
-                        "tags": [
-                            filter_note_time
-                        ],
-                        "type": "filter_note_time"
-                    },
-                    {
-                        "tags": [
-                            filter_note_range
-                        ],
-                        "type": "filter_note_range"
-                    },
-                    {
-                        "tags": [
-                            filter_pos_distance
-                        ],
-                        "type": "filter_pos_distance"
-                    }
-                ],
-                "geo": geo,
-                "image_formats": [
-                    "jpg",
-                    "webp",
-                    "avif"
-                ]
-            }
-            headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
-            res_json = response.json()
-            success, msg = res_json["success"], res_json["msg"]
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, res_json
+        return {
+            "keyword": query,
+            "page": page,
+            "page_size": 20,
+            "search_id": search_id or generate_x_b3_traceid(21),
+            "sort": "general",
+            "note_type": 0,
+            "ext_flags": [],
+            "filters": [
+                {
+                    "tags": [
+                        sort_type
+                    ],
+                    "type": "sort_type"
+                },
+                {
+                    "tags": [
+                        filter_note_type
+                    ],
+                    "type": "filter_note_type"
+                },
+                {
+                    "tags": [
+                        filter_note_time
+                    ],
+                    "type": "filter_note_time"
+                },
+                {
+                    "tags": [
+                        filter_note_range
+                    ],
+                    "type": "filter_note_range"
+                },
+                {
+                    "tags": [
+                        filter_pos_distance
+                    ],
+                    "type": "filter_pos_distance"
+                }
+            ],
+            "geo": geo,
+            "image_formats": [
+                "jpg",
+                "webp",
+                "avif"
+            ]
+        }
 
+    @coalesce('query', 'require_num', 'sort_type_choice', 'note_type', 'note_time', 'note_range', 'pos_distance', 'geo', empty=list)
     def search_some_note(self, query: str, require_num: int, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None):
         """
             指定数量搜索笔记，设置排序方式和笔记类型和笔记数量
@@ -607,27 +800,29 @@ class XHS_Apis():
             :param geo: 定位信息 经纬度
             返回搜索的结果
         """
-        page = 1
-        note_list = []
-        try:
-            while True:
-                success, msg, res_json = self.search_note(query, cookies_str, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies)
-                if not success:
-                    raise Exception(msg)
-                if "items" not in res_json["data"]:
-                    break
-                notes = res_json["data"]["items"]
-                note_list.extend(notes)
-                page += 1
-                if len(note_list) >= require_num or not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        if len(note_list) > require_num:
-            note_list = note_list[:require_num]
+        success, msg, note_list = self._collect(self.iter_search_notes(query, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, limit=require_num))
         return success, msg, note_list
 
+    def iter_search_notes(self, query: str, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None, page=1, search_id: str = None, limit: int = None):
+        """
+            逐页搜索笔记，请求失败时抛出异常，参数同 search_some_note
+            :param page 从第几页开始
+            :param search_id 同一次搜索的所有分页使用相同的search_id，从中断处继续时传入上次的search_id，默认新生成
+            :param limit 最多获取的笔记数量，凑够后不再请求下一页，None 表示全部
+            生成 (本页笔记, 下一页的页码)，最后一页的页码为 None
+        """
+        search_id = search_id or generate_x_b3_traceid(21)
+        # 同一次搜索的所有分页使用相同的search_id，因此可以提前批量签名
+        if limit:
+            presign_pages = min(math.ceil(limit / 20), SpiderConfig.SIGN_BATCH_SIZE)
+            if presign_pages > 1:
+                self.presign(cookies_str, [("/api/sns/web/v1/search/notes", self._search_note_data(query, p, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, search_id), 'POST') for p in range(page, page + presign_pages)])
+        yield from self._iter_page_numbers(lambda page: self.search_note(query, cookies_str, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, search_id), "items", page, limit)
+
+    @cached('search', 'query', 'page')
+    @coalesce('query', 'page')
+    @stored('search_user', 'query', 'page', policy='search')
+    @harvested('pc_search')
     def search_user(self, query: str, cookies_str: str, page=1, proxies: dict = None):
         """
             获取搜索用户的结果
@@ -639,18 +834,9 @@ class XHS_Apis():
         res_json = None
         try:
             api = "/api/sns/web/v1/search/usersearch"
-            data = {
-                "search_user_request": {
-                    "keyword": query,
-                    "search_id": "2dn9they1jbjxwawlo4xd",
-                    "page": page,
-                    "page_size": 15,
-                    "biz_type": "web_search_user",
-                    "request_id": "22471139-1723999898524"
-                }
-            }
+            data = self._search_user_data(query, page)
             headers, cookies, data = generate_request_params(cookies_str, api, data, 'POST')
-            response = requests.post(self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
+            response = self._request('POST', self.base_url + api, headers=headers, data=data.encode('utf-8'), cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -658,6 +844,20 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    @staticmethod
+    def _search_user_data(query: str, page=1):
+        return {
+            "search_user_request": {
+                "keyword": query,
+                "search_id": "2dn9they1jbjxwawlo4xd",
+                "page": page,
+                "page_size": 15,
+                "biz_type": "web_search_user",
+                "request_id": "22471139-1723999898524"
+            }
+        }
+
+    @coalesce('query', 'require_num', empty=list)
     def search_some_user(self, query: str, require_num: int, cookies_str: str, proxies: dict = None):
         """
             指定数量搜索用户
@@ -666,26 +866,21 @@ class XHS_Apis():
             :param cookies_str 你的cookies
             返回搜索的结果
         """
-        page = 1
-        user_list = []
-        try:
-            while True:
-                success, msg, res_json = self.search_user(query, cookies_str, page, proxies)
-                if not success:
-                    raise Exception(msg)
-                if "users" not in res_json["data"]:
-                    break
-                users = res_json["data"]["users"]
-                user_list.extend(users)
-                page += 1
-                if len(user_list) >= require_num or not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        if len(user_list) > require_num:
-            user_list = user_list[:require_num]
-        return success, msg, user_list
+        return self._collect(self.iter_search_users(query, cookies_str, proxies=proxies, limit=require_num))
+
+    def iter_search_users(self, query: str, cookies_str: str, page=1, proxies: dict = None, limit: int = None):
+        """
+            逐页搜索用户，请求失败时抛出异常
+            :param query 搜索的关键词
+            :param page 从第几页开始
+            :param limit 最多获取的用户数量，凑够后不再请求下一页，None 表示全部
+            生成 (本页用户, 下一页的页码)，最后一页的页码为 None
+        """
+        if limit:
+            presign_pages = min(math.ceil(limit / 15), SpiderConfig.SIGN_BATCH_SIZE)
+            if presign_pages > 1:
+                self.presign(cookies_str, [("/api/sns/web/v1/search/usersearch", self._search_user_data(query, p), 'POST') for p in range(page, page + presign_pages)])
+        yield from self._iter_page_numbers(lambda page: self.search_user(query, cookies_str, page, proxies), "users", page, limit)
 
     def get_note_out_comment(self, note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
         """
@@ -707,7 +902,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -722,25 +917,17 @@ class XHS_Apis():
             :param cookies_str 你的cookies
             返回笔记的全部一级评论
         """
-        cursor = ''
-        note_out_comment_list = []
-        try:
-            while True:
-                success, msg, res_json = self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                comments = res_json["data"]["comments"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_out_comment_list.extend(comments)
-                if len(note_out_comment_list) == 0 or not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, note_out_comment_list
+        return self._collect(self.iter_note_out_comments(note_id, xsec_token, cookies_str, proxies=proxies))
+
+    def iter_note_out_comments(self, note_id: str, xsec_token: str, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取笔记的一级评论
+            :param note_id 笔记的id
+            :param cursor 从哪一页开始，默认第一页
+            :param limit: 最多获取的数量，None 表示全部
+            生成 (本页评论, 下一页的cursor)
+        """
+        yield from self._iter_pages(lambda cursor: self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies), "comments", cursor, limit)
 
     def get_note_inner_comment(self, comment: dict, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
         """
@@ -752,19 +939,9 @@ class XHS_Apis():
         """
         res_json = None
         try:
-            api = "/api/sns/web/v2/comment/sub/page"
-            params = {
-                "note_id": comment['note_id'],
-                "root_comment_id": comment['id'],
-                "num": "10",
-                "cursor": cursor,
-                "image_formats": "jpg,webp,avif",
-                "top_comment_id": '',
-                "xsec_token": xsec_token
-            }
-            splice_api = splice_str(api, params)
+            splice_api = self._note_inner_comment_api(comment, cursor, xsec_token)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -772,6 +949,20 @@ class XHS_Apis():
             msg = str(e)
         return success, msg, res_json
 
+    @staticmethod
+    def _note_inner_comment_api(comment: dict, cursor: str, xsec_token: str):
+        api = "/api/sns/web/v2/comment/sub/page"
+        params = {
+            "note_id": comment['note_id'],
+            "root_comment_id": comment['id'],
+            "num": "10",
+            "cursor": cursor,
+            "image_formats": "jpg,webp,avif",
+            "top_comment_id": '',
+            "xsec_token": xsec_token
+        }
+        return splice_str(api, params)
+
     def get_note_all_inner_comment(self, comment: dict, xsec_token: str, cookies_str: str, proxies: dict = None):
         """
             获取笔记的全部二级评论
@@ -779,29 +970,26 @@ class XHS_Apis():
             :param cookies_str 你的cookies
             返回笔记的全部二级评论
         """
-        try:
-            if not comment['sub_comment_has_more']:
-                return True, 'success', comment
-            cursor = comment['sub_comment_cursor']
-            inner_comment_list = []
-            while True:
-                success, msg, res_json = self.get_note_inner_comment(comment, cursor, xsec_token, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                comments = res_json["data"]["comments"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                inner_comment_list.extend(comments)
-                if not res_json["data"]["has_more"]:
-                    break
+        if not comment['sub_comment_has_more']:
+            return True, 'success', comment
+        success, msg, inner_comment_list = self._collect(self.iter_note_inner_comments(comment, xsec_token, cookies_str, proxies=proxies))
+        if success:
             comment['sub_comments'].extend(inner_comment_list)
-        except Exception as e:
-            success = False
-            msg = str(e)
         return success, msg, comment
 
+    def iter_note_inner_comments(self, comment: dict, xsec_token: str, cookies_str: str, cursor: str = None, proxies: dict = None):
+        """
+            逐页获取一级评论下的二级评论（不包含一级评论中已带的部分）
+            :param comment 笔记的一级评论
+            :param cursor 从哪一页开始，默认为一级评论中的 sub_comment_cursor
+            生成 (本页评论, 下一页的cursor)
+        """
+        if cursor is None:
+            if not comment['sub_comment_has_more']:
+                return
+            cursor = comment['sub_comment_cursor']
+        yield from self._iter_pages(lambda cursor: self.get_note_inner_comment(comment, cursor, xsec_token, cookies_str, proxies), "comments", cursor)
+
     def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None):
         """
             获取一篇文章的所有评论
@@ -811,17 +999,19 @@ class XHS_Apis():
         """
         out_comment_list = []
         try:
-            urlParse = urllib.parse.urlparse(url)
-            note_id = urlParse.path.split("/")[-1]
-            kvs = urlParse.query.split('&')
-            kvDist = {kv.split('=')[0]: kv.split('=')[1] for kv in kvs}
+            note_id, kvDist = self._parse_url(url)
             success, msg, out_comment_list = self.get_note_all_out_comment(note_id, kvDist['xsec_token'], cookies_str, proxies)
             if not success:
                 raise Exception(msg)
-            for comment in out_comment_list:
-                success, msg, new_comment = self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
+            batch_size = SpiderConfig.SIGN_BATCH_SIZE
+            for i in range(0, len(out_comment_list), batch_size):
+                batch = out_comment_list[i:i + batch_size]
+                # 二级评论首页的cursor都已知，每批先统一预签名
+                self.presign(cookies_str, [(self._note_inner_comment_api(comment, comment['sub_comment_cursor'], kvDist['xsec_token']), '', 'GET') for comment in batch if comment['sub_comment_has_more']])
+                for comment in batch:
+                    success, msg, new_comment = self.get_note_all_inner_comment(comment, kvDist['xsec_token'], cookies_str, proxies)
+                    if not success:
+                        raise Exception(msg)
         except Exception as e:
             success = False
             msg = str(e)
@@ -837,7 +1027,7 @@ class XHS_Apis():
         try:
             api = "/api/sns/web/unread_count"
             headers, cookies, data = generate_request_params(cookies_str, api, '', 'GET')
-            response = requests.get(self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -861,7 +1051,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -875,26 +1065,17 @@ class XHS_Apis():
             :param cookies_str: 你的cookies
             返回全部的评论和@提醒
         """
-        cursor = ''
-        metions_list = []
-        try:
-            while True:
-                success, msg, res_json = self.get_metions(cursor, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                metions = res_json["data"]["message_list"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                metions_list.extend(metions)
-                if not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, metions_list
+        return self._collect(self.iter_metions(cookies_str, proxies=proxies))
 
+    def iter_metions(self, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取评论和@提醒
+            :param limit: 最多获取的数量，None 表示全部
+            生成 (本页提醒, 下一页的cursor)
+        """
+        yield from self._iter_pages(lambda cursor: self.get_metions(cursor, cookies_str, proxies), "message_list", cursor, limit)
+
+    @harvested('pc_user')
     def get_user_collect_notes(self, user_id: str, cookies_str: str, cursor: str = '', xsec_token: str = '', xsec_source: str = 'pc_user', proxies: dict = None):
         """
             获取用户收藏笔记列表（简化版，直接使用 user_id）
@@ -922,7 +1103,7 @@ class XHS_Apis():
             
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -940,27 +1121,14 @@ class XHS_Apis():
             :param proxies: 代理设置，可选
             返回用户所有收藏笔记列表
         """
-        cursor = ''
-        note_list = []
-        try:
-            while True:
-                success, msg, res_json = self.get_user_collect_notes(user_id, cookies_str, cursor, xsec_token, xsec_source, proxies)
-                if not success:
-                    raise Exception(msg)
-                if 'data' not in res_json or 'notes' not in res_json['data']:
-                    break
-                notes = res_json["data"]["notes"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                note_list.extend(notes)
-                if len(notes) == 0 or not res_json["data"].get("has_more", False):
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, note_list
+        return self._collect(self.iter_user_collect_notes(user_id, cookies_str, xsec_token=xsec_token, xsec_source=xsec_source, proxies=proxies))
+
+    def iter_user_collect_notes(self, user_id: str, cookies_str: str, cursor: str = '', xsec_token: str = '', xsec_source: str = 'pc_user', proxies: dict = None):
+        """
+            逐页获取用户收藏笔记（简化版，直接使用 user_id）
+            生成 (本页笔记, 下一页的cursor)
+        """
+        yield from self._iter_pages(lambda cursor: self.get_user_collect_notes(user_id, cookies_str, cursor, xsec_token, xsec_source, proxies), "notes", cursor)
 
     def get_likesAndcollects(self, cursor: str, cookies_str: str, proxies: dict = None):
         """
@@ -978,7 +1146,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -992,25 +1160,15 @@ class XHS_Apis():
             :param cookies_str: 你的cookies
             返回全部的赞和收藏
         """
-        cursor = ''
-        likesAndcollects_list = []
-        try:
-            while True:
-                success, msg, res_json = self.get_likesAndcollects(cursor, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                likesAndcollects = res_json["data"]["message_list"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                likesAndcollects_list.extend(likesAndcollects)
-                if not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, likesAndcollects_list
+        return self._collect(self.iter_likesAndcollects(cookies_str, proxies=proxies))
+
+    def iter_likesAndcollects(self, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取赞和收藏
+            :param limit: 最多获取的数量，None 表示全部
+            生成 (本页消息, 下一页的cursor)
+        """
+        yield from self._iter_pages(lambda cursor: self.get_likesAndcollects(cursor, cookies_str, proxies), "message_list", cursor, limit)
 
     def get_new_connections(self, cursor: str, cookies_str: str, proxies: dict = None):
         """
@@ -1028,7 +1186,7 @@ class XHS_Apis():
             }
             splice_api = splice_str(api, params)
             headers, cookies, data = generate_request_params(cookies_str, splice_api, '', 'GET')
-            response = requests.get(self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            response = self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
             res_json = response.json()
             success, msg = res_json["success"], res_json["msg"]
         except Exception as e:
@@ -1042,25 +1200,15 @@ class XHS_Apis():
             :param cookies_str: 你的cookies
             返回全部的新增关注
         """
-        cursor = ''
-        connections_list = []
-        try:
-            while True:
-                success, msg, res_json = self.get_new_connections(cursor, cookies_str, proxies)
-                if not success:
-                    raise Exception(msg)
-                connections = res_json["data"]["message_list"]
-                if 'cursor' in res_json["data"]:
-                    cursor = str(res_json["data"]["cursor"])
-                else:
-                    break
-                connections_list.extend(connections)
-                if not res_json["data"]["has_more"]:
-                    break
-        except Exception as e:
-            success = False
-            msg = str(e)
-        return success, msg, connections_list
+        return self._collect(self.iter_new_connections(cookies_str, proxies=proxies))
+
+    def iter_new_connections(self, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取新增关注
+            :param limit: 最多获取的数量，None 表示全部
+            生成 (本页消息, 下一页的cursor)
+        """
+        yield from self._iter_pages(lambda cursor: self.get_new_connections(cursor, cookies_str, proxies), "message_list", cursor, limit)
 
     @staticmethod
     def get_note_no_water_video(note_id):
@@ -1075,7 +1223,7 @@ class XHS_Apis():
         try:
             headers = get_common_headers()
             url = f"https://www.xiaohongshu.com/explore/{note_id}"
-            response = requests.get(url, headers=headers)
+            response = get_shared_session().get(url, headers=headers, timeout=get_timeout(url))
             res = response.text
             video_addr = re.findall(r'<meta name="og:video" content="(.*?)">', res)[0]
         except Exception as e:
@@ -0,0 +1,540 @@
+# encoding: utf-8
+import asyncio
+import json
+import math
+import time
+import urllib
+from contextlib import nullcontext
+import aiohttp
+from yarl import URL
+from loguru import logger
+from apis.xhs_pc_apis import USER_NOTES_PAGE_SIZE, XHS_Apis
+from xhs_utils.concurrency_limiter import get_concurrency_limiter
+from xhs_utils.config import SpiderConfig
+from xhs_utils.cookie_util import Credential
+from xhs_utils.deadline import expired, remaining
+from xhs_utils.http_util import get_timeout
+from xhs_utils.rate_limiter import endpoint_family, get_rate_limiter
+from xhs_utils.response_cache import cached
+from xhs_utils.retry_policy import ACCOUNT_ERRORS, OK, SERVER, classify_exception, classify_status, get_retry_policy
+from xhs_utils.xhs_util import splice_str, generate_request_params_async, generate_x_b3_traceid, presign_async
+
+"""
+    获小红书的api（asyncio版本），接口与返回值和 XHS_Apis 保持一致
+    与同步版本共用限流器、账号并发上限和响应缓存；不使用单飞合并、原始响应存储和 xsec_token 登记表
+    用法:
+        async with AsyncXHS_Apis() as xhs_apis:
+            success, msg, note_info = await xhs_apis.get_note_info(note_url, cookies_str)
+    :param cookies_str: 你的cookies，字符串或预先解析好的 xhs_utils.cookie_util.Credential
+"""
+class AsyncXHS_Apis():
+    def __init__(self, session: aiohttp.ClientSession = None, cookie_pool=None, proxy_pool=None, base_url: str = None):
+        """
+            :param session: 发送请求使用的 aiohttp session，默认在首次请求时创建（必须在事件循环中）
+            :param cookie_pool: xhs_utils.cookie_pool.CookiePool，传入后统计池中账号的并发数与请求结果
+            :param proxy_pool: xhs_utils.proxy_pool.ProxyPool，调用方没有指定 proxies 时从池中选择代理
+            :param base_url: 上游接口地址，默认 SpiderConfig.XHS_BASE_URL
+        """
+        self.base_url = (base_url or SpiderConfig.XHS_BASE_URL).rstrip('/')
+        self.session = session
+        self.cookie_pool = cookie_pool
+        self.proxy_pool = proxy_pool
+        self._own_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=SpiderConfig.HTTP_POOL_CONNECTIONS * SpiderConfig.HTTP_POOL_MAXSIZE,
+                limit_per_host=SpiderConfig.HTTP_POOL_MAXSIZE,
+            )
+            # 与同步版本一样，cookie 只随每次请求显式传入
+            self.session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar())
+            self._own_session = True
+        return self.session
+
+    async def close(self):
+        if self._own_session and self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def _request(self, method: str, url: str, headers: dict = None, cookies: dict = None, data=None, proxies: dict = None) -> dict:
+        """
+            所有接口请求的统一出口，返回解析后的json
+            网络错误、5xx、限流按接口类别对应的重试策略退避重试
+            限流、验证码等账号级错误换用 cookie 池中的其他账号重新签名后重试，没有可换的账号时不重试
+            :param proxies: requests 格式的代理 {'http': ..., 'https': ...}
+        """
+        path = urllib.parse.urlparse(url).path
+        policy = get_retry_policy(endpoint_family(path))
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                res_json, kind = await self._send(method, url, path, headers, cookies, data, proxies)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                delay = policy.next_delay(classify_exception(e), attempt, started_at)
+                if delay is None:
+                    raise
+                logger.warning(f'{path} 第 {attempt} 次请求失败（{e!r}），{delay:.2f}s 后重试')
+            else:
+                delay = policy.next_delay(kind, attempt, started_at) if kind != OK else None
+                if delay is None:
+                    return res_json
+                # 出错的账号已进入冷却，不能再用它重试
+                if kind in ACCOUNT_ERRORS:
+                    switched = await self._switch_account(method, url, cookies, data)
+                    if switched is None:
+                        return res_json
+                    headers, cookies = switched
+                logger.warning(f'{path} 第 {attempt} 次请求失败（{kind}），{delay:.2f}s 后重试')
+            await asyncio.sleep(delay)
+
+    async def _switch_account(self, method: str, url: str, cookies: dict, data):
+        """
+            换用 cookie 池中另一个不在冷却中的账号，并用新账号重新签名
+            :return: 新的 (headers, cookies)，没有可换的账号时返回 None
+        """
+        if self.cookie_pool is None or not url.startswith(self.base_url):
+            return None
+        credential = self.cookie_pool.acquire_other((cookies or {}).get('a1', ''))
+        if credential is None:
+            return None
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        # 签名使用的 api 为 url 去掉 base_url 的部分（GET 包含查询参数），POST 的 data 为原始请求体
+        headers, cookies, _ = await generate_request_params_async(credential, url[len(self.base_url):], json.loads(data) if data else '', method)
+        logger.info(f'换用账号 {credential.a1[:8]}*** 重试')
+        return headers, cookies
+
+    async def _send(self, method: str, url: str, path: str, headers: dict, cookies: dict, data, proxies: dict):
+        """
+            发出一次请求，并把结果上报给限流器、代理池和 cookie 池
+            :return: (解析后的json, 错误类别)
+        """
+        a1 = (cookies or {}).get('a1', '')
+        rate_limiter = get_rate_limiter()
+        if rate_limiter is not None:
+            await rate_limiter.acquire_async(a1, path)
+        # 与同步版本共用每个账号的并发名额
+        concurrency_limiter = get_concurrency_limiter()
+        async with concurrency_limiter.slot_async(a1) if concurrency_limiter is not None else nullcontext():
+            return await self._send_request(method, url, a1, headers, cookies, data, proxies)
+
+    async def _send_request(self, method: str, url: str, a1: str, headers: dict, cookies: dict, data, proxies: dict):
+        """已占用账号并发名额后发出请求"""
+        proxy = (proxies.get('https') or proxies.get('http')) if proxies else None
+        connect, read = get_timeout(url)
+        timeout = aiohttp.ClientTimeout(total=remaining(), sock_connect=connect, sock_read=read)
+        pooled_proxy = None
+        if self.proxy_pool is not None and proxy is None:
+            proxy = pooled_proxy = self.proxy_pool.select(a1)
+        tracked = self.cookie_pool is not None and self.cookie_pool.begin(a1)
+        account_ok = None
+        responded = False
+        start = time.monotonic()
+        try:
+            # 签名基于原样拼接的 url 计算，不能让 aiohttp 重新编码
+            async with self._get_session().request(method, URL(url, encoded=True), headers=headers, cookies=cookies, data=data, proxy=proxy, timeout=timeout) as response:
+                try:
+                    res_json = await response.json(content_type=None)
+                except ValueError:
+                    res_json = {'success': False, 'msg': f'HTTP {response.status}'}
+                code = None if res_json.get('success', True) else res_json.get('code')
+                kind = classify_status(response.status, code)
+                responded = True
+                # 5xx 与账号无关，不计入账号健康分
+                account_ok = None if kind == SERVER else kind not in ACCOUNT_ERRORS
+                return res_json, kind
+        finally:
+            if pooled_proxy:
+                self.proxy_pool.report(pooled_proxy, time.monotonic() - start, responded)
+            if tracked:
+                self.cookie_pool.end(a1, account_ok)
+
+    async def _get(self, splice_api: str, cookies_str: str, proxies: dict = None):
+        res_json = None
+        try:
+            headers, cookies, data = await generate_request_params_async(cookies_str, splice_api, '', 'GET')
+            res_json = await self._request('GET', self.base_url + splice_api, headers=headers, cookies=cookies, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def _post(self, api: str, data: dict, cookies_str: str, proxies: dict = None):
+        res_json = None
+        try:
+            headers, cookies, trans_data = await generate_request_params_async(cookies_str, api, data, 'POST')
+            res_json = await self._request('POST', self.base_url + api, headers=headers, data=trans_data.encode('utf-8'), cookies=cookies, proxies=proxies)
+            success, msg = res_json["success"], res_json["msg"]
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, res_json
+
+    async def presign(self, cookies_str: str, sign_items: list):
+        """
+            预先批量签名接下来要发出的请求，签名失败不影响后续请求（届时会现场签名）
+            :param cookies_str: 你的cookies
+            :param sign_items: [(api, data, method), ...]
+        """
+        if not sign_items:
+            return
+        try:
+            await presign_async(Credential.of(cookies_str).a1, sign_items)
+        except Exception as e:
+            logger.warning(f'批量预签名失败: {e}')
+
+    @staticmethod
+    async def _iter_pages(fetch, items_key: str, cursor: str = '', limit: int = None, page_size: int = None):
+        """
+            XHS_Apis._iter_pages 的异步版本，fetch 为协程函数，每页的解析与同步版本共用 XHS_Apis._cursor_page
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            if page_size:
+                success, msg, res_json = await fetch(cursor, page_size if remaining is None else min(remaining, page_size))
+            else:
+                success, msg, res_json = await fetch(cursor)
+            if not success:
+                raise Exception(msg)
+            items, cursor, remaining = XHS_Apis._cursor_page(res_json, items_key, remaining)
+            yield items, cursor
+            if cursor is None:
+                return
+
+    @staticmethod
+    async def _iter_page_numbers(fetch, items_key: str, page: int = 1, limit: int = None):
+        """
+            XHS_Apis._iter_page_numbers 的异步版本，每页的解析与同步版本共用 XHS_Apis._numbered_page
+        """
+        remaining = limit
+        while remaining is None or remaining > 0:
+            success, msg, res_json = await fetch(page)
+            if not success:
+                raise Exception(msg)
+            parsed = XHS_Apis._numbered_page(res_json, items_key, page, remaining)
+            if parsed is None:
+                return
+            items, page, remaining = parsed
+            yield items, page
+            if page is None:
+                return
+
+    @staticmethod
+    async def _collect(pages):
+        """把异步翻页生成器的所有条目合并为列表，出错时返回已获取的部分"""
+        item_list = []
+        try:
+            async for items, _ in pages:
+                item_list.extend(items)
+            success, msg = True, 'success'
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, item_list
+
+    async def get_homefeed_all_channel(self, cookies_str: str, proxies: dict = None):
+        """
+            获取主页的所有频道
+            返回主页的所有频道
+        """
+        return await self._get("/api/sns/web/v1/homefeed/category", cookies_str, proxies)
+
+    async def get_homefeed_recommend(self, category, cursor_score, refresh_type, note_index, cookies_str: str, proxies: dict = None):
+        """
+            获取主页推荐的笔记
+            :param category: 你想要获取的频道
+            :param cursor_score: 你想要获取的笔记的cursor
+            :param refresh_type: 你想要获取的笔记的刷新类型
+            :param note_index: 你想要获取的笔记的index
+            :param cookies_str: 你的cookies
+            返回主页推荐的笔记
+        """
+        data = {
+            "cursor_score": cursor_score,
+            "num": 20,
+            "refresh_type": refresh_type,
+            "note_index": note_index,
+            "unread_begin_note_id": "",
+            "unread_end_note_id": "",
+            "unread_note_count": 0,
+            "category": category,
+            "search_key": "",
+            "need_num": 10,
+            "image_formats": [
+                "jpg",
+                "webp",
+                "avif"
+            ],
+            "need_filter_image": False
+        }
+        return await self._post("/api/sns/web/v1/homefeed", data, cookies_str, proxies)
+
+    async def get_homefeed_recommend_by_num(self, category, require_num, cookies_str: str, proxies: dict = None):
+        """
+            根据数量获取主页推荐的笔记
+            :param category: 你想要获取的频道
+            :param require_num: 你想要获取的笔记的数量
+            :param cookies_str: 你的cookies
+            根据数量返回主页推荐的笔记
+        """
+        cursor_score, refresh_type, note_index = "", 1, 0
+        note_list = []
+        try:
+            while True:
+                success, msg, res_json = await self.get_homefeed_recommend(category, cursor_score, refresh_type, note_index, cookies_str, proxies)
+                if not success:
+                    raise Exception(msg)
+                if "items" not in res_json["data"]:
+                    break
+                note_list.extend(res_json["data"]["items"])
+                cursor_score = res_json["data"]["cursor_score"]
+                refresh_type = 3
+                note_index += 20
+                if len(note_list) > require_num:
+                    break
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, note_list[:require_num]
+
+    @cached('user', 'user_id')
+    async def get_user_info(self, user_id: str, cookies_str: str, proxies: dict = None):
+        """
+            获取用户的信息
+            :param user_id: 你想要获取的用户的id
+            :param cookies_str: 你的cookies
+            返回用户的信息
+        """
+        splice_api = splice_str("/api/sns/web/v1/user/otherinfo", {"target_user_id": user_id})
+        return await self._get(splice_api, cookies_str, proxies)
+
+    @cached('user_posted', 'user_id', 'cursor')
+    async def get_user_note_info(self, user_id: str, cursor: str, cookies_str: str, xsec_token='', xsec_source='', proxies: dict = None, num: int = USER_NOTES_PAGE_SIZE):
+        """
+            获取用户指定位置的笔记
+            :param user_id: 你想要获取的用户的id
+            :param cursor: 你想要获取的笔记的cursor
+            :param cookies_str: 你的cookies
+            :param num: 本页的笔记数量，最多30
+            返回用户指定位置的笔记
+        """
+        splice_api = XHS_Apis._user_note_info_api(user_id, cursor, xsec_token, xsec_source, num)
+        return await self._get(splice_api, cookies_str, proxies)
+
+    async def get_user_all_notes(self, user_url: str, cookies_str: str, proxies: dict = None):
+        """
+           获取用户所有笔记
+           :param user_url: 用户完整URL（包含xsec_token）
+           :param cookies_str: 你的cookies
+           返回用户的所有笔记
+        """
+        return await self._collect(self.iter_user_notes(user_url, cookies_str, proxies=proxies))
+
+    async def iter_user_notes(self, user_url: str, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+           逐页获取用户的笔记，参数同 XHS_Apis.iter_user_notes
+           生成 (本页笔记, 下一页的cursor)
+        """
+        user_id, kvDist = XHS_Apis._parse_url(user_url)
+        xsec_token = kvDist.get('xsec_token', '')
+        xsec_source = kvDist.get('xsec_source', 'pc_search')
+        async for page in self._iter_pages(lambda cursor, num: self.get_user_note_info(user_id, cursor, cookies_str, xsec_token, xsec_source, proxies, num), "notes", cursor, limit, USER_NOTES_PAGE_SIZE):
+            yield page
+
+    async def get_user_latest_notes(self, user_url: str, cookies_str: str, limit: int = 5, proxies: dict = None):
+        """
+        获取用户最新的前N条笔记
+        :param user_url: 用户完整URL（包含xsec_token）
+        :param cookies_str: 你的cookies
+        :param limit: 需要获取的笔记数量，默认5条
+        :param proxies: 代理设置（可选）
+        :return: (success, msg, note_list) 返回最新的前N条笔记
+        """
+        # 每页只请求还差的数量，凑够后不再翻页
+        success, msg, note_list = await self._collect(self.iter_user_notes(user_url, cookies_str, proxies=proxies, limit=limit))
+        if success:
+            msg = f"成功获取 {len(note_list)} 条笔记"
+        elif not expired():
+            # 超过截止时间时保留已获取的部分结果
+            note_list = []
+        return success, msg, note_list
+
+    @cached('note', 'url')
+    async def get_note_info(self, url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的详细
+            :param url: 你想要获取的笔记的url
+            :param cookies_str: 你的cookies
+            返回笔记的详细
+        """
+        try:
+            note_id, kvDist = XHS_Apis._parse_url(url)
+            data = XHS_Apis._note_info_data(note_id, kvDist['xsec_token'], kvDist.get('xsec_source', 'pc_search'))
+        except Exception as e:
+            return False, str(e), None
+        return await self._post("/api/sns/web/v1/feed", data, cookies_str, proxies)
+
+    async def get_search_keyword(self, word: str, cookies_str: str, proxies: dict = None):
+        """
+            获取搜索关键词
+            :param word: 你的关键词
+            :param cookies_str: 你的cookies
+            返回搜索关键词
+        """
+        splice_api = splice_str("/api/sns/web/v1/search/recommend", {"keyword": urllib.parse.quote(word)})
+        return await self._get(splice_api, cookies_str, proxies)
+
+    @cached('search', 'query', 'page', 'sort_type_choice', 'note_type', 'note_time', 'note_range', 'pos_distance', 'geo')
+    async def search_note(self, query: str, cookies_str: str, page=1, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None, search_id: str = None):
+        """
+            获取搜索笔记的结果，参数含义同 XHS_Apis.search_note
+        """
+        data = XHS_Apis._search_note_data(query, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, search_id)
+        return await self._post("/api/sns/web/v1/search/notes", data, cookies_str, proxies)
+
+    async def search_some_note(self, query: str, require_num: int, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None):
+        """
+            指定数量搜索笔记，参数含义同 XHS_Apis.search_some_note
+        """
+        return await self._collect(self.iter_search_notes(query, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, limit=require_num))
+
+    async def iter_search_notes(self, query: str, cookies_str: str, sort_type_choice=0, note_type=0, note_time=0, note_range=0, pos_distance=0, geo="", proxies: dict = None, page=1, search_id: str = None, limit: int = None):
+        """
+            逐页搜索笔记，参数同 XHS_Apis.iter_search_notes
+            生成 (本页笔记, 下一页的页码)，最后一页的页码为 None
+        """
+        search_id = search_id or generate_x_b3_traceid(21)
+        # 同一次搜索的所有分页使用相同的search_id，因此可以提前批量签名
+        if limit:
+            presign_pages = min(math.ceil(limit / 20), SpiderConfig.SIGN_BATCH_SIZE)
+            if presign_pages > 1:
+                await self.presign(cookies_str, [("/api/sns/web/v1/search/notes", XHS_Apis._search_note_data(query, p, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, search_id), 'POST') for p in range(page, page + presign_pages)])
+        async for result in self._iter_page_numbers(lambda page: self.search_note(query, cookies_str, page, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, search_id), "items", page, limit):
+            yield result
+
+    @cached('search', 'query', 'page')
+    async def search_user(self, query: str, cookies_str: str, page=1, proxies: dict = None):
+        """
+            获取搜索用户的结果
+            :param query 搜索的关键词
+            :param cookies_str 你的cookies
+            :param page 搜索的页数
+            返回搜索的结果
+        """
+        return await self._post("/api/sns/web/v1/search/usersearch", XHS_Apis._search_user_data(query, page), cookies_str, proxies)
+
+    async def search_some_user(self, query: str, require_num: int, cookies_str: str, proxies: dict = None):
+        """
+            指定数量搜索用户
+            :param query 搜索的关键词
+            :param require_num 搜索的数量
+            :param cookies_str 你的cookies
+            返回搜索的结果
+        """
+        return await self._collect(self.iter_search_users(query, cookies_str, proxies=proxies, limit=require_num))
+
+    async def iter_search_users(self, query: str, cookies_str: str, page=1, proxies: dict = None, limit: int = None):
+        """
+            逐页搜索用户，参数同 XHS_Apis.iter_search_users
+            生成 (本页用户, 下一页的页码)，最后一页的页码为 None
+        """
+        if limit:
+            presign_pages = min(math.ceil(limit / 15), SpiderConfig.SIGN_BATCH_SIZE)
+            if presign_pages > 1:
+                await self.presign(cookies_str, [("/api/sns/web/v1/search/usersearch", XHS_Apis._search_user_data(query, p), 'POST') for p in range(page, page + presign_pages)])
+        async for result in self._iter_page_numbers(lambda page: self.search_user(query, cookies_str, page, proxies), "users", page, limit):
+            yield result
+
+    async def get_note_out_comment(self, note_id: str, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取指定位置的笔记一级评论
+            :param note_id 笔记的id
+            :param cursor 指定位置的评论的cursor
+            :param cookies_str 你的cookies
+            返回指定位置的笔记一级评论
+        """
+        params = {
+            "note_id": note_id,
+            "cursor": cursor,
+            "top_comment_id": "",
+            "image_formats": "jpg,webp,avif",
+            "xsec_token": xsec_token
+        }
+        return await self._get(splice_str("/api/sns/web/v2/comment/page", params), cookies_str, proxies)
+
+    async def get_note_all_out_comment(self, note_id: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的全部一级评论
+            :param note_id 笔记的id
+            :param cookies_str 你的cookies
+            返回笔记的全部一级评论
+        """
+        return await self._collect(self.iter_note_out_comments(note_id, xsec_token, cookies_str, proxies=proxies))
+
+    async def iter_note_out_comments(self, note_id: str, xsec_token: str, cookies_str: str, cursor: str = '', proxies: dict = None, limit: int = None):
+        """
+            逐页获取笔记的一级评论，参数同 XHS_Apis.iter_note_out_comments
+            生成 (本页评论, 下一页的cursor)
+        """
+        async for page in self._iter_pages(lambda cursor: self.get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies), "comments", cursor, limit):
+            yield page
+
+    async def get_note_inner_comment(self, comment: dict, cursor: str, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取指定位置的笔记二级评论
+            :param comment 笔记的一级评论
+            :param cursor 指定位置的评论的cursor
+            :param cookies_str 你的cookies
+            返回指定位置的笔记二级评论
+        """
+        return await self._get(XHS_Apis._note_inner_comment_api(comment, cursor, xsec_token), cookies_str, proxies)
+
+    async def get_note_all_inner_comment(self, comment: dict, xsec_token: str, cookies_str: str, proxies: dict = None):
+        """
+            获取笔记的全部二级评论
+            :param comment 笔记的一级评论
+            :param cookies_str 你的cookies
+            返回笔记的全部二级评论
+        """
+        if not comment['sub_comment_has_more']:
+            return True, 'success', comment
+        success, msg, inner_comment_list = await self._collect(self._iter_pages(lambda cursor: self.get_note_inner_comment(comment, cursor, xsec_token, cookies_str, proxies), "comments", comment['sub_comment_cursor']))
+        if success:
+            comment['sub_comments'].extend(inner_comment_list)
+        return success, msg, comment
+
+    async def get_note_all_comment(self, url: str, cookies_str: str, proxies: dict = None):
+        """
+            获取一篇文章的所有评论，各一级评论下的二级评论并发获取
+            :param url: 你想要获取的笔记的url
+            :param cookies_str: 你的cookies
+            返回一篇文章的所有评论
+        """
+        out_comment_list = []
+        try:
+            note_id, kvDist = XHS_Apis._parse_url(url)
+            xsec_token = kvDist['xsec_token']
+            success, msg, out_comment_list = await self.get_note_all_out_comment(note_id, xsec_token, cookies_str, proxies)
+            if not success:
+                raise Exception(msg)
+            batch_size = SpiderConfig.SIGN_BATCH_SIZE
+            for i in range(0, len(out_comment_list), batch_size):
+                batch = out_comment_list[i:i + batch_size]
+                await self.presign(cookies_str, [(XHS_Apis._note_inner_comment_api(comment, comment['sub_comment_cursor'], xsec_token), '', 'GET') for comment in batch if comment['sub_comment_has_more']])
+                results = await asyncio.gather(*[self.get_note_all_inner_comment(comment, xsec_token, cookies_str, proxies) for comment in batch])
+                for success, msg, _ in results:
+                    if not success:
+                        raise Exception(msg)
+        except Exception as e:
+            success = False
+            msg = str(e)
+        return success, msg, out_comment_list
@@ -0,0 +1,51 @@
+"""
+签名性能测试脚本
+对比不同签名引擎每秒可完成的签名次数
+用法: python bench_sign.py [签名次数] [并发线程数]
+"""
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from xhs_utils import xhs_util
+from xhs_utils.config import SpiderConfig
+from xhs_utils.sign_pool import get_sign_pool
+
+A1 = '18f0b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6e7f8a9b0c1d2e3f4a5b6'
+API = '/api/sns/web/v1/user_posted?num=30&cursor=&user_id=5fcc82fa000000000101dc00&image_formats=jpg,webp,avif'
+
+
+def bench(name, total, workers):
+    """按指定签名引擎签名 total 次，返回每秒签名次数"""
+    SpiderConfig.SIGN_ENGINE = name
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda _: xhs_util.generate_headers(A1, API, '', 'GET'), range(total)))
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed
+    print(f'{name:<8} {total} 次签名, 耗时 {elapsed:.2f}s, {rate:.1f} 次/秒')
+    return rate
+
+
+def bench_many(name, total, batch_size):
+    """按批调用 sign_many 签名 total 次，返回每秒签名次数"""
+    SpiderConfig.SIGN_ENGINE = name
+    start = time.perf_counter()
+    for i in range(0, total, batch_size):
+        xhs_util.sign_many(A1, [(API, '', 'GET')] * min(batch_size, total - i))
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed
+    print(f'{name:<8} sign_many 每批 {batch_size} 个, {total} 次签名, 耗时 {elapsed:.2f}s, {rate:.1f} 次/秒')
+    return rate
+
+
+if __name__ == '__main__':
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else SpiderConfig.SIGN_POOL_SIZE
+    print(f'签名次数: {total}, 并发线程数: {workers}')
+    # 进程池启动时间不计入测试
+    get_sign_pool()
+    rates = {name: bench(name, total, workers) for name in ['execjs', 'pool', 'python']}
+    for name in ['pool', 'python']:
+        print(f'{name} 相对 execjs 提升: {rates[name] / rates["execjs"]:.1f}x')
+    for name in ['execjs', 'pool']:
+        bench_many(name, total, SpiderConfig.SIGN_BATCH_SIZE)
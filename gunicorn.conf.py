@@ -0,0 +1,16 @@
+# encoding: utf-8
+"""
+gunicorn 部署配置: gunicorn -c gunicorn.conf.py api_server:app
+在 master 进程 fork worker 之前预热签名引擎，worker 继承编译好的签名脚本，不必各自承担首个请求的预热开销
+"""
+import os
+
+bind = os.getenv('XHS_API_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('XHS_API_WORKERS', 4))
+threads = int(os.getenv('XHS_API_THREADS', 8))
+
+
+def on_starting(server):
+    """master 进程启动时调用，早于加载应用和 fork worker"""
+    from xhs_utils.xhs_util import warmup
+    warmup()
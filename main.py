@@ -3,12 +3,20 @@ import os
 from loguru import logger
 from apis.xhs_pc_apis import XHS_Apis
 from xhs_utils.common_util import init
+from xhs_utils.config import SpiderConfig
 from xhs_utils.data_util import handle_note_info, download_note, save_to_xlsx
+from xhs_utils.note_detail_cache import get_note_detail
+from xhs_utils.pipeline import Pipeline, Stage
+from xhs_utils.raw_store import RawStore, get_raw_store
 
 
 class Data_Spider():
-    def __init__(self):
-        self.xhs_apis = XHS_Apis()
+    def __init__(self, raw_store: RawStore = None):
+        """
+        :param raw_store: 原始响应存储，默认使用 SpiderConfig.RAW_STORE_PATH
+        """
+        self.raw_store = raw_store or get_raw_store() or RawStore()
+        self.xhs_apis = XHS_Apis(raw_store=self.raw_store)
 
     def spider_note(self, note_url: str, cookies_str: str, proxies=None):
         """
@@ -19,73 +27,123 @@ class Data_Spider():
         """
         note_info = None
         try:
-            success, msg, note_info = self.xhs_apis.get_note_info(note_url, cookies_str, proxies)
-            import json
-            note_info_json_path = os.path.abspath(os.path.join(base_path['excel'], f'{note_url.split("/")[-1].split("?")[0]}_note_info.json'))
-            with open(note_info_json_path, 'w', encoding='utf-8') as f:
-                json.dump(note_info, f, ensure_ascii=False, indent=2)
-            logger.info(f'笔记信息已保存到: {note_info_json_path},{success},{msg}')
-            if success:
-                note_info = note_info['data']['items'][0]
-                note_info['url'] = note_url
-                note_info = handle_note_info(note_info)
-                handle_note_info_json_path = os.path.abspath(os.path.join(base_path['excel'], f'{note_url.split("/")[-1].split("?")[0]}_handle_note_info.json'))
-                with open(handle_note_info_json_path, 'w', encoding='utf-8') as f:
-                    json.dump(note_info, f, ensure_ascii=False, indent=2)
-                logger.info(f'handle_note_info笔记信息已保存到: {handle_note_info_json_path}')
+            # 原始响应由 XHS_Apis 写入 self.raw_store，可用 replay_notes 回放
+            # 优先使用笔记详情缓存，链接中没有 xsec_token 时使用缓存记住的 xsec_token
+            success, msg, note_info = get_note_detail(self.xhs_apis, note_url, cookies_str, proxies)
         except Exception as e:
             success = False
             msg = e
         logger.info(f'爬取笔记信息 {note_url}: {success}, msg: {msg}')
         return success, msg, note_info
 
+    def replay_notes(self, base_path: dict, save_choice: str, excel_name: str = 'replay', since: float = None):
+        """
+        不访问上游接口，用原始响应存储中每篇笔记最新的详情重新处理并保存
+        :param base_path: 保存路径
+        :param save_choice: 同 spider_some_note
+        :param since: 只回放该时间（时间戳）之后获取的笔记
+        :return: 处理后的笔记列表
+        """
+        note_list = []
+        for note_id, fetched_at, res_json in self.raw_store.iter_latest('note', since):
+            try:
+                note_info = res_json['data']['items'][0]
+                xsec_token = note_info.get('xsec_token', '')
+                note_url = f"https://www.xiaohongshu.com/explore/{note_id}?xsec_token={xsec_token}" if xsec_token else f"https://www.xiaohongshu.com/explore/{note_id}"
+                note_list.append(handle_note_info({**note_info, 'url': note_url}))
+            except Exception as e:
+                logger.warning(f'回放笔记 {note_id} 失败: {e}')
+        logger.info(f'回放笔记数量: {len(note_list)}')
+        for note_info in note_list:
+            if save_choice == 'all' or 'media' in save_choice:
+                download_note(note_info, base_path['media'], save_choice)
+        if (save_choice == 'all' or save_choice == 'excel') and note_list:
+            file_path = os.path.abspath(os.path.join(base_path['excel'], f'{excel_name}.xlsx'))
+            save_to_xlsx(note_list, file_path)
+        return note_list
+
     def spider_some_note(self, notes: list, cookies_str: str, base_path: dict, save_choice: str, excel_name: str = '', proxies=None):
         """
         爬取一些笔记的信息
-        :param notes:
+        :param notes: 笔记url列表，也可以是逐个生成笔记url的生成器
         :param cookies_str:
         :param base_path:
-        :return:
+        :return: 爬取成功的笔记信息列表
         """
         if (save_choice == 'all' or save_choice == 'excel') and excel_name == '':
             raise ValueError('excel_name 不能为空')
-        note_list = []
-        for note_url in notes:
-            success, msg, note_info = self.spider_note(note_url, cookies_str, proxies)
-            if note_info is not None and success:
-                note_list.append(note_info)
-        for note_info in note_list:
-            if save_choice == 'all' or 'media' in save_choice:
-                download_note(note_info, base_path['media'], save_choice)
+        _, _, note_list = self._crawl_notes(notes, cookies_str, base_path, save_choice, proxies)
         if save_choice == 'all' or save_choice == 'excel':
             file_path = os.path.abspath(os.path.join(base_path['excel'], f'{excel_name}.xlsx'))
             save_to_xlsx(note_list, file_path)
+        return note_list
+
+    def _crawl_notes(self, note_urls, cookies_str: str, base_path: dict, save_choice: str, proxies=None):
+        """
+        流水线抓取：笔记url -> 笔记详情 -> 下载媒体，各阶段的线程数见 SpiderConfig.PIPELINE_*
+        note_urls 为生成器时，列表翻页与详情获取、下载同时进行
+        :return: (note_urls 是否迭代成功, msg, 笔记信息列表)，笔记按 note_urls 的顺序排列
+        """
+        def detail(note_url):
+            success, msg, note_info = self.spider_note(note_url, cookies_str, proxies)
+            return note_info if success else None
+
+        def save(note_info):
+            # 下载失败只影响媒体文件，笔记信息仍然保留
+            try:
+                download_note(note_info, base_path['media'], save_choice)
+            except Exception as e:
+                logger.warning(f'下载笔记媒体失败 {note_info.get("note_url")}: {e}')
+            return note_info
 
+        stages = [Stage('detail', detail, SpiderConfig.PIPELINE_DETAIL_WORKERS)]
+        if save_choice == 'all' or 'media' in save_choice:
+            stages.append(Stage('save', save, SpiderConfig.PIPELINE_SAVE_WORKERS))
+        pipeline = Pipeline(stages)
+        success, msg, note_list = pipeline.run(note_urls)
+        logger.info(f'流水线统计: {pipeline.stats()}')
+        return success, msg, note_list
 
-    def spider_user_all_note(self, user_url: str, cookies_str: str, base_path: dict, save_choice: str, excel_name: str = '', proxies=None):
+    def _note_urls(self, pages, cookies_str: str, note_list: list, id_key: str = 'note_id', listed: list = None):
+        """
+        把翻页生成器中的笔记逐个转换为笔记url，每页的详情请求先预签名
+        :param pages: iter_user_notes、iter_search_notes 等生成的 (本页笔记, 下一页)
+        :param note_list: 生成过的笔记url会追加到这里
+        :param listed: 列表接口返回的笔记会追加到这里
+        """
+        for notes, _ in pages:
+            if listed is not None:
+                listed.extend(notes)
+            urls = [f"https://www.xiaohongshu.com/explore/{note[id_key]}?xsec_token={note['xsec_token']}" for note in notes if note.get('model_type', 'note') == 'note']
+            self.xhs_apis.presign_note_info(urls, cookies_str)
+            for note_url in urls:
+                note_list.append(note_url)
+                yield note_url
+
+    def spider_user_all_note(self, user_url: str, cookies_str: str, base_path: dict, save_choice: str, excel_name: str = '', proxies=None, limit: int = 5):
         """
         爬取一个用户的所有笔记
         :param user_url:
         :param cookies_str:
         :param base_path:
+        :param limit: 最多爬取的笔记数量，None 表示全部
         :return:
         """
         note_list = []
+        all_note_info = []
         try:
-            success, msg, all_note_info = self.xhs_apis.get_user_latest_notes(user_url, cookies_str, limit = 5,proxies=proxies)
-            import json
+            if save_choice == 'all' or save_choice == 'excel':
+                excel_name = user_url.split('/')[-1].split('?')[0]
+            pages = self.xhs_apis.iter_user_notes(user_url, cookies_str, proxies=proxies, limit=limit)
+            success, msg, note_infos = self._crawl_notes(self._note_urls(pages, cookies_str, note_list, listed=all_note_info), cookies_str, base_path, save_choice, proxies)
             user_notes_json_path = os.path.abspath(os.path.join(base_path['excel'], f'{user_url.split("/")[-1].split("?")[0]}_all_notes.json'))
             with open(user_notes_json_path, 'w', encoding='utf-8') as f:
                 json.dump(all_note_info, f, ensure_ascii=False, indent=2)
             logger.info(f'用户 {user_url} 笔记信息已保存到: {user_notes_json_path}')
-            if success:
-                logger.info(f'用户 {user_url} 作品数量: {len(all_note_info)}')
-                for simple_note_info in all_note_info:
-                    note_url = f"https://www.xiaohongshu.com/explore/{simple_note_info['note_id']}?xsec_token={simple_note_info['xsec_token']}"
-                    note_list.append(note_url)
+            logger.info(f'用户 {user_url} 作品数量: {len(note_list)}')
             if save_choice == 'all' or save_choice == 'excel':
-                excel_name = user_url.split('/')[-1].split('?')[0]
-            self.spider_some_note(note_list, cookies_str, base_path, save_choice, excel_name, proxies)
+                file_path = os.path.abspath(os.path.join(base_path['excel'], f'{excel_name}.xlsx'))
+                save_to_xlsx(note_infos, file_path)
         except Exception as e:
             success = False
             msg = e
@@ -108,16 +166,14 @@ class Data_Spider():
         """
         note_list = []
         try:
-            success, msg, notes = self.xhs_apis.search_some_note(query, require_num, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies)
-            if success:
-                notes = list(filter(lambda x: x['model_type'] == "note", notes))
-                logger.info(f'搜索关键词 {query} 笔记数量: {len(notes)}')
-                for note in notes:
-                    note_url = f"https://www.xiaohongshu.com/explore/{note['id']}?xsec_token={note['xsec_token']}"
-                    note_list.append(note_url)
             if save_choice == 'all' or save_choice == 'excel':
                 excel_name = query
-            self.spider_some_note(note_list, cookies_str, base_path, save_choice, excel_name, proxies)
+            pages = self.xhs_apis.iter_search_notes(query, cookies_str, sort_type_choice, note_type, note_time, note_range, pos_distance, geo, proxies, limit=require_num)
+            success, msg, note_infos = self._crawl_notes(self._note_urls(pages, cookies_str, note_list, id_key='id'), cookies_str, base_path, save_choice, proxies)
+            logger.info(f'搜索关键词 {query} 笔记数量: {len(note_list)}')
+            if save_choice == 'all' or save_choice == 'excel':
+                file_path = os.path.abspath(os.path.join(base_path['excel'], f'{excel_name}.xlsx'))
+                save_to_xlsx(note_infos, file_path)
         except Exception as e:
             success = False
             msg = e
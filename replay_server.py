@@ -0,0 +1,314 @@
+# encoding: utf-8
+"""
+本地上游替身服务，用于离线压测
+回放 XHS_Apis 用到的接口（user_posted、feed、search/usersearch、search/notes、comment/page、comment/sub/page），
+响应来自原始响应存储（xhs_utils.raw_store）中录制的数据，没有录制数据时生成结构一致的假数据；
+可以配置延迟分布、错误率和翻页深度
+
+启动: python replay_server.py --port 5005 --latency lognormal:80,0.5 --error-rate 0.01 --pages 5
+使用: XHS_BASE_URL=http://127.0.0.1:5005 python api_server.py，或 XHS_Apis(base_url='http://127.0.0.1:5005')
+"""
+import argparse
+import copy
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from flask import Flask, request, jsonify
+from loguru import logger
+from xhs_utils.raw_store import RawStore
+
+
+def parse_latency(spec: str):
+    """
+    解析延迟分布，返回生成延迟（秒）的函数，单位均为毫秒
+    fixed:80 | uniform:20,200 | normal:100,30（均值,标准差） | lognormal:80,0.5（中位数,sigma）
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',') if v]
+    if kind == 'fixed':
+        return lambda: values[0] / 1000
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda: max(random.gauss(values[0], values[1]), 0) / 1000
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f'不支持的延迟分布: {spec}')
+
+
+class ReplayConfig:
+    """替身服务配置"""
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0, rate_limit_rate: float = 0.0, captcha_rate: float = 0.0, pages: int = 3, page_size: int = 20, raw_store_path: str = None, seed: int = None):
+        """
+        :param latency: 延迟分布，见 parse_latency
+        :param error_rate: 返回 503 的比例
+        :param rate_limit_rate: 返回“访问频次异常”（code 300013）的比例
+        :param captcha_rate: 返回 461（需要验证）的比例
+        :param pages: 翻页接口的总页数
+        :param page_size: 生成数据时每页的条数
+        :param raw_store_path: 录制数据所在的原始响应存储，None 表示只使用生成的数据
+        :param seed: 随机数种子
+        """
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.captcha_rate = captcha_rate
+        self.pages = pages
+        self.page_size = page_size
+        self.raw_store_path = raw_store_path
+        if seed is not None:
+            random.seed(seed)
+
+
+class Recordings:
+    """启动时把每个接口类别最新的录制响应读入内存，按对象id查找，找不到时随机取一条同类响应"""
+
+    def __init__(self, raw_store_path: str = None):
+        self._data = defaultdict(dict)
+        self._user_pages = {}
+        if raw_store_path:
+            store = RawStore(raw_store_path)
+            for endpoint in ('note', 'user_posted', 'search_note', 'search_user'):
+                for object_id, _, data in store.iter_latest(endpoint):
+                    self._data[endpoint][object_id] = data
+            self._index_user_pages()
+            logger.info(f'已加载录制数据: { {endpoint: len(items) for endpoint, items in self._data.items()} }')
+
+    def _index_user_pages(self):
+        """
+        user_posted 按 [user_id, cursor] 录制，回放时的 cursor 是生成的（c1、c2…），
+        因此从第一页开始沿录制响应中的 cursor 把每个用户的录制页按顺序串起来，回放时按页序号查找
+        """
+        pages_by_key = {}
+        for object_id, data in self._data.get('user_posted', {}).items():
+            try:
+                user_id, cursor = json.loads(object_id)
+            except (ValueError, TypeError):
+                continue
+            pages_by_key[(user_id, cursor)] = data
+        for (user_id, cursor), data in pages_by_key.items():
+            if cursor:
+                continue
+            pages, seen = [], set()
+            while data is not None and cursor not in seen:
+                seen.add(cursor)
+                pages.append(data)
+                cursor = (data.get('data') or {}).get('cursor', '')
+                data = pages_by_key.get((user_id, cursor)) if cursor else None
+            self._user_pages[user_id] = pages
+
+    def user_page(self, user_id: str, page: int):
+        """该用户录制的第 page 页（从0开始），没有时返回 None，不会返回其他用户的数据"""
+        pages = self._user_pages.get(user_id) or []
+        return copy.deepcopy(pages[page]) if page < len(pages) else None
+
+    def get(self, endpoint: str, object_id: str = None):
+        items = self._data.get(endpoint)
+        if not items:
+            return None
+        data = items.get(object_id) if object_id is not None else None
+        return copy.deepcopy(data if data is not None else random.choice(list(items.values())))
+
+
+def _ok(data: dict) -> dict:
+    return {'code': 0, 'success': True, 'msg': '成功', 'data': data}
+
+
+def _page_index(cursor: str) -> int:
+    # 生成的 cursor 形如 c3，表示第3页（从0开始）
+    if cursor and cursor.startswith('c') and cursor[1:].isdigit():
+        return int(cursor[1:])
+    return 0
+
+
+def _note_card(note_id: str, user_id: str) -> dict:
+    return {
+        'type': 'normal',
+        'title': f'回放笔记 {note_id}',
+        'desc': '本地回放服务生成的笔记',
+        'user': {'user_id': user_id, 'nickname': f'用户{user_id[-4:]}', 'avatar': ''},
+        'interact_info': {'liked_count': '10', 'collected_count': '2', 'comment_count': '3', 'share_count': '1'},
+        'image_list': [{'info_list': [{'image_scene': 'WB_DFT', 'url': f'http://127.0.0.1/{note_id}.jpg'}]}],
+        'tag_list': [{'name': '回放'}],
+        'time': int(time.time() * 1000),
+        'ip_location': '本地',
+    }
+
+
+def create_app(config: ReplayConfig) -> Flask:
+    app = Flask(__name__)
+    recordings = Recordings(config.raw_store_path)
+    counts = defaultdict(lambda: defaultdict(int))
+    counts_lock = threading.Lock()
+
+    def count(endpoint: str, name: str):
+        with counts_lock:
+            counts[endpoint][name] += 1
+
+    def respond(endpoint: str, build):
+        """按配置注入延迟和错误，否则返回 build() 的结果"""
+        time.sleep(config.latency())
+        roll = random.random()
+        if roll < config.error_rate:
+            count(endpoint, 'server_error')
+            return jsonify({'code': -1, 'success': False, 'msg': 'service unavailable'}), 503
+        roll -= config.error_rate
+        if roll < config.rate_limit_rate:
+            count(endpoint, 'rate_limited')
+            return jsonify({'code': 300013, 'success': False, 'msg': '访问频次异常，请勿频繁操作或重启试试'}), 200
+        roll -= config.rate_limit_rate
+        if roll < config.captcha_rate:
+            count(endpoint, 'captcha')
+            return jsonify({'code': 300012, 'success': False, 'msg': '需要验证'}), 461
+        count(endpoint, 'ok')
+        return jsonify(_ok(build())), 200
+
+    def paginate(data: dict, page: int, cursor_key: str = 'cursor'):
+        """按配置的翻页深度改写录制数据中的翻页字段"""
+        data['has_more'] = page + 1 < config.pages
+        data[cursor_key] = f'c{page + 1}'
+        return data
+
+    @app.route('/api/sns/web/v1/user_posted', methods=['GET'])
+    def user_posted():
+        user_id = request.args.get('user_id', '')
+        cursor = request.args.get('cursor', '')
+        page = _page_index(cursor)
+        # 与上游一致，按请求的 num 返回，不超过 page_size
+        page_size = min(request.args.get('num', config.page_size, type=int), config.page_size)
+
+        def build():
+            # 只使用该用户自己录制的页，没有时生成数据
+            recorded = recordings.user_page(user_id, page)
+            if recorded is not None:
+                return paginate(recorded.get('data', {}), page)
+            notes = [{
+                'note_id': f'{user_id[-8:]}{page:04d}{i:04d}',
+                'xsec_token': 'replay',
+                'display_title': f'回放笔记 {page}-{i}',
+                'type': 'normal',
+                'user': {'user_id': user_id, 'nickname': f'用户{user_id[-4:]}'},
+                'interact_info': {'liked_count': '10'},
+            } for i in range(page_size)]
+            return paginate({'notes': notes}, page)
+        return respond('user_posted', build)
+
+    @app.route('/api/sns/web/v1/feed', methods=['POST'])
+    def feed():
+        note_id = (request.get_json(force=True, silent=True) or {}).get('source_note_id', '')
+
+        def build():
+            recorded = recordings.get('note', note_id)
+            if recorded is not None:
+                data = recorded.get('data', {})
+                for item in data.get('items', []):
+                    item['id'] = note_id
+                return data
+            return {'items': [{'id': note_id, 'model_type': 'note', 'note_card': _note_card(note_id, 'replayuser0000')}]}
+        return respond('feed', build)
+
+    @app.route('/api/sns/web/v1/search/notes', methods=['POST'])
+    def search_notes():
+        body = request.get_json(force=True, silent=True) or {}
+        page = int(body.get('page', 1)) - 1
+
+        def build():
+            recorded = recordings.get('search_note')
+            if recorded is not None:
+                data = recorded.get('data', {})
+                data['has_more'] = page + 1 < config.pages
+                return data
+            items = [{
+                'id': f'search{page:04d}{i:04d}',
+                'model_type': 'note',
+                'xsec_token': 'replay',
+                'note_card': _note_card(f'search{page:04d}{i:04d}', 'replayuser0000'),
+            } for i in range(config.page_size)]
+            return {'items': items, 'has_more': page + 1 < config.pages}
+        return respond('search_notes', build)
+
+    @app.route('/api/sns/web/v1/search/usersearch', methods=['POST'])
+    def search_users():
+        body = (request.get_json(force=True, silent=True) or {}).get('search_user_request', {})
+        page = int(body.get('page', 1)) - 1
+
+        def build():
+            recorded = recordings.get('search_user')
+            if recorded is not None:
+                data = recorded.get('data', {})
+                data['has_more'] = page + 1 < config.pages
+                return data
+            users = [{
+                'id': f'replayuser{page:03d}{i:03d}',
+                'name': f'回放用户 {page}-{i}',
+                'red_id': f'{page:03d}{i:03d}',
+                'xsec_token': 'replay',
+                'fans': '100',
+                'note_count': config.pages * config.page_size,
+            } for i in range(config.page_size)]
+            return {'users': users, 'has_more': page + 1 < config.pages}
+        return respond('search_users', build)
+
+    @app.route('/api/sns/web/v2/comment/page', methods=['GET'])
+    def comment_page():
+        note_id = request.args.get('note_id', '')
+        page = _page_index(request.args.get('cursor', ''))
+
+        def build():
+            comments = [{
+                'id': f'{note_id}c{page:03d}{i:03d}',
+                'note_id': note_id,
+                'content': f'回放评论 {page}-{i}',
+                'user_info': {'user_id': 'replayuser0000', 'nickname': '回放用户'},
+                'sub_comments': [],
+                'sub_comment_has_more': i == 0,
+                'sub_comment_cursor': 'c0',
+            } for i in range(config.page_size)]
+            return paginate({'comments': comments}, page)
+        return respond('comment', build)
+
+    @app.route('/api/sns/web/v2/comment/sub/page', methods=['GET'])
+    def comment_sub_page():
+        note_id = request.args.get('note_id', '')
+        root_comment_id = request.args.get('root_comment_id', '')
+        page = _page_index(request.args.get('cursor', ''))
+
+        def build():
+            comments = [{
+                'id': f'{root_comment_id}s{page:03d}{i:03d}',
+                'note_id': note_id,
+                'content': f'回放回复 {page}-{i}',
+                'user_info': {'user_id': 'replayuser0000', 'nickname': '回放用户'},
+            } for i in range(10)]
+            return paginate({'comments': comments}, page)
+        return respond('comment_sub', build)
+
+    @app.route('/replay/stats', methods=['GET'])
+    def stats():
+        with counts_lock:
+            return jsonify({endpoint: dict(items) for endpoint, items in counts.items()})
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='小红书接口本地回放服务（离线压测用）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5005)
+    parser.add_argument('--latency', default='lognormal:80,0.5', help='延迟分布（毫秒）: fixed:80 | uniform:20,200 | normal:100,30 | lognormal:80,0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 503 的比例')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='返回访问频次异常的比例')
+    parser.add_argument('--captcha-rate', type=float, default=0.0, help='返回 461 的比例')
+    parser.add_argument('--pages', type=int, default=3, help='翻页接口的总页数')
+    parser.add_argument('--page-size', type=int, default=20)
+    parser.add_argument('--raw-store', default=None, help='录制数据所在的原始响应存储（SQLite 文件）')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    config = ReplayConfig(args.latency, args.error_rate, args.rate_limit_rate, args.captcha_rate, args.pages, args.page_size, args.raw_store, args.seed)
+    logger.info(f'回放服务: http://{args.host}:{args.port}，设置 XHS_BASE_URL 指向该地址')
+    create_app(config).run(host=args.host, port=args.port, threaded=True)
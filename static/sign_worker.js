@@ -0,0 +1,44 @@
+// 常驻签名进程：启动时加载一次签名脚本，之后通过 stdin/stdout 按行收发 JSON
+// 请求: {"id": 1, "fn": "get_request_headers_params", "args": [api, data, a1, method]}
+// 响应: {"id": 1, "ok": true, "result": ...} 或 {"id": 1, "ok": false, "error": "..."}
+const readline = require("readline");
+
+// 签名脚本中的 console.log 会污染 stdout 协议
+console.log = function () {};
+
+const xs = require("./xhs_xs_xsc_56.js");
+
+const handlers = {
+  ping: () => "pong",
+  get_request_headers_params: (api, data, a1, method) =>
+    xs.get_request_headers_params(api, data, a1, method),
+  get_request_headers_params_many: (items, a1) =>
+    items.map(([api, data, method]) => xs.get_request_headers_params(api, data, a1, method)),
+};
+
+function reply(message) {
+  process.stdout.write(JSON.stringify(message) + "\n");
+}
+
+const rl = readline.createInterface({ input: process.stdin });
+rl.on("line", (line) => {
+  if (!line.trim()) return;
+  let request;
+  try {
+    request = JSON.parse(line);
+  } catch (e) {
+    reply({ id: null, ok: false, error: "invalid request: " + e.message });
+    return;
+  }
+  const handler = handlers[request.fn];
+  if (!handler) {
+    reply({ id: request.id, ok: false, error: "unknown function: " + request.fn });
+    return;
+  }
+  try {
+    reply({ id: request.id, ok: true, result: handler(...(request.args || [])) });
+  } catch (e) {
+    reply({ id: request.id, ok: false, error: String((e && e.stack) || e) });
+  }
+});
+rl.on("close", () => process.exit(0));
@@ -0,0 +1,96 @@
+"""
+纯Python签名与 static 目录下JS脚本的对照测试
+JS 端把随机数和时间戳固定住，两边用同一组输入计算，输出必须逐字节一致
+运行: python -m pytest test_xhs_sign.py
+"""
+import os
+import execjs
+import pytest
+from xhs_utils import xhs_sign, xhs_xray
+
+SEED = 0x9E3779B9
+TIMESTAMP = 1717171717171
+A1 = '18f0b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6e7f8a9b0c1d2e3f4a5b6'
+
+# (method, api, data)
+GOLDEN_INPUTS = [
+    ('GET', '/api/sns/web/v1/homefeed/category', ''),
+    ('GET', '/api/sns/web/v1/user_posted?num=30&cursor=&user_id=5fcc82fa000000000101dc00&image_formats=jpg,webp,avif&xsec_token=ABpui90HV_J-zs9tYIk6ITzTsoz_co3aHcSneR8ykIaT8=&xsec_source=pc_feed', ''),
+    ('GET', '/api/sns/web/v1/search/recommend?keyword=%E6%A6%B4%E8%8E%B2', ''),
+    ('GET', '/api/sns/web/v1/note', {'note_id': 'abc', 'tags': ['a', None, 1], 'token': 'x=y', 'empty': None}),
+    ('POST', '/api/sns/web/v1/feed', {
+        'source_note_id': '67d7c713000000000900e391',
+        'image_formats': ['jpg', 'webp', 'avif'],
+        'extra': {'need_body_topic': '1'},
+        'xsec_source': 'pc_user',
+        'xsec_token': 'AB1ACxbo5cevHxV_bWibTmK8R1DDz0NnAW1PbFZLABXtE=',
+    }),
+    ('POST', '/api/sns/web/v1/search/usersearch', {
+        'search_user_request': {'keyword': '美食', 'search_id': '2dn9they1jbjxwawlo4xd', 'page': 1, 'page_size': 15},
+    }),
+    ('POST', '/api/sns/web/v1/homefeed', ''),
+]
+
+
+@pytest.fixture(scope='module')
+def js():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/xhs_xs_xsc_56.js')
+    source = open(path, 'r', encoding='utf-8').read()
+    # 固定随机数与时间，得到可复现的签名
+    source += f'\nfunction rand32() {{ return {SEED}; }}\nDate.now = function () {{ return {TIMESTAMP}; }};\n'
+    return execjs.compile(source)
+
+
+@pytest.mark.parametrize('method, api, data', GOLDEN_INPUTS)
+def test_build_content_string(js, method, api, data):
+    assert xhs_sign.build_content_string(method, api, data) == js.call('buildContentString', method, api, data)
+
+
+@pytest.mark.parametrize('method, api, data', GOLDEN_INPUTS)
+def test_sign_xs(js, method, api, data):
+    expected = js.call('signXs', method, api, A1, 'xhs-pc-web', data)
+    assert xhs_sign.sign_xs(method, api, A1, 'xhs-pc-web', data, timestamp=TIMESTAMP, rand32=lambda: SEED) == expected
+
+
+@pytest.mark.parametrize('method, api, data', GOLDEN_INPUTS)
+def test_sign_xs_common(js, method, api, data):
+    xs = xhs_sign.sign_xs(method, api, A1, 'xhs-pc-web', data, timestamp=TIMESTAMP, rand32=lambda: SEED)
+    assert xhs_sign.sign_xs_common(A1, xs, TIMESTAMP) == js.call('XsCommon', A1, xs, TIMESTAMP)
+
+
+def test_sign_xs_long_a1(js):
+    a1 = A1 * 2
+    expected = js.call('signXs', 'GET', '/api/sns/web/v2/user/me', a1, 'xhs-pc-web', '')
+    assert xhs_sign.sign_xs('GET', '/api/sns/web/v2/user/me', a1, timestamp=TIMESTAMP, rand32=lambda: SEED) == expected
+
+
+def test_get_request_headers_params_shape():
+    ret = xhs_sign.get_request_headers_params('/api/sns/web/v1/feed', {'source_note_id': '1'}, A1, 'POST')
+    assert ret['xs'].startswith('XYS_')
+    assert isinstance(ret['xt'], int)
+    assert ret['xs_common']
+
+
+def test_trace_id_layout_matches_js():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static/xhs_xray.js')
+    xray_js = execjs.compile(open(path, 'r', encoding='utf-8').read(), cwd=os.path.dirname(path))
+    expected = xray_js.call('traceId', TIMESTAMP)
+    actual = xhs_xray.trace_id(TIMESTAMP)
+    assert len(actual) == len(expected) == 32
+    assert int(actual[:16], 16) >> 23 == int(expected[:16], 16) >> 23 == TIMESTAMP
+
+
+def test_trace_id_sequence_increments():
+    first, second = xhs_xray.trace_id(TIMESTAMP), xhs_xray.trace_id(TIMESTAMP)
+    first_seq, second_seq = int(first[:16], 16) & xhs_xray.MAX_SEQ, int(second[:16], 16) & xhs_xray.MAX_SEQ
+    assert second_seq == (first_seq + 1) & xhs_xray.MAX_SEQ
+
+
+def test_sign_cache_reuses_get_signatures(monkeypatch):
+    from xhs_utils import xhs_util
+    from xhs_utils.cache_util import TTLCache
+    monkeypatch.setattr(xhs_util, '_sign_cache', TTLCache(2, 30))
+    first = xhs_util.generate_xs_xs_common(A1, '/api/sns/web/v2/user/me', '', 'GET')
+    assert xhs_util.generate_xs_xs_common(A1, '/api/sns/web/v2/user/me', '', 'GET') == first
+    assert xhs_util.generate_xs_xs_common(A1 * 2, '/api/sns/web/v2/user/me', '', 'GET') != first
+    assert xhs_util.get_sign_cache().stats()['hits'] == 1
@@ -0,0 +1,877 @@
+"""
+xhs_utils 中不依赖网络的工具测试（超时、缓存等）
+运行: python -m pytest test_xhs_utils.py
+"""
+import json
+import shutil
+import threading
+import time
+import pytest
+import requests
+from xhs_utils.config import SpiderConfig
+from xhs_utils.deadline import deadline, DeadlineExceeded
+from xhs_utils.http_util import get_timeout
+
+FEED_URL = 'https://edith.xiaohongshu.com/api/sns/web/v1/feed'
+
+
+def test_timeout_defaults(monkeypatch):
+    monkeypatch.setattr(SpiderConfig, 'ENDPOINT_TIMEOUTS', {'/api/sns/web/v1/search/': [2, 20]})
+    assert get_timeout(FEED_URL) == (SpiderConfig.HTTP_CONNECT_TIMEOUT, SpiderConfig.HTTP_READ_TIMEOUT)
+    assert get_timeout('https://edith.xiaohongshu.com/api/sns/web/v1/search/notes') == (2, 20)
+    assert get_timeout(FEED_URL, 60)[1] == 60
+
+
+def test_timeout_is_bounded_by_deadline():
+    with deadline(1):
+        connect, read = get_timeout(FEED_URL)
+        assert 0 < connect <= 1 and 0 < read <= 1
+        with deadline(10):
+            assert get_timeout(FEED_URL)[1] <= 1
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            get_timeout(FEED_URL)
+
+
+def test_rate_limiter_buckets_per_account_and_family():
+    from xhs_utils.rate_limiter import RateLimiter
+    limiter = RateLimiter({'search': [1, 2], 'other': [100, 100]})
+    assert limiter._reserve('a', '/api/sns/web/v1/search/notes') == 0
+    assert limiter._reserve('a', '/api/sns/web/v1/search/usersearch') == 0
+    assert limiter._reserve('a', '/api/sns/web/v1/search/notes') == pytest.approx(1, abs=0.05)
+    # 其他账号、其他接口类别不受影响
+    assert limiter._reserve('b', '/api/sns/web/v1/search/notes') == 0
+    assert limiter._reserve('a', '/api/sns/web/v1/feed') == 0
+    assert limiter.stats()['search'] == {'requests': 4, 'waits': 1, 'wait_seconds': pytest.approx(1, abs=0.05)}
+    with deadline(0.5):
+        with pytest.raises(DeadlineExceeded):
+            limiter.acquire('a', '/api/sns/web/v1/search/notes')
+    # 超时未发出的请求不占用令牌，下一个请求仍只需等前一个预留的令牌
+    assert limiter._reserve('a', '/api/sns/web/v1/search/notes') == pytest.approx(2, abs=0.05)
+
+
+def test_cookie_pool_rotates_and_cools_down():
+    from xhs_utils.cookie_pool import CookiePool
+    pool = CookiePool(['a1=aaa; web_session=1', 'a1=bbb; web_session=2'], cooldown=60)
+    first, second = pool.acquire(), pool.acquire()
+    assert {first.a1, second.a1} == {'aaa', 'bbb'}
+    # 进行中请求少的账号优先
+    assert pool.begin('aaa')
+    assert pool.acquire().a1 == 'bbb'
+    pool.end('aaa', True)
+    # 出错的账号进入冷却，不再被选中
+    pool.begin('bbb')
+    pool.end('bbb', False)
+    assert [pool.acquire().a1 for _ in range(3)] == ['aaa'] * 3
+    assert not pool.begin('unknown')
+    stats = {account['a1']: account for account in pool.stats()}
+    assert stats['bbb***']['failures'] == 1 and stats['bbb***']['cooldown_seconds'] > 0
+
+
+def test_account_errors_retry_on_another_account(monkeypatch):
+    from apis.xhs_pc_apis import XHS_Apis
+    from xhs_utils.cookie_pool import CookiePool
+    from xhs_utils.retry_policy import RetryPolicy
+    monkeypatch.setattr(SpiderConfig, 'RATE_LIMIT_ENABLED', False)
+    monkeypatch.setattr(SpiderConfig, 'TOKEN_REGISTRY_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.rate_limiter._rate_limiter', None)
+    monkeypatch.setattr('xhs_utils.retry_policy._retry_policies', {'search': RetryPolicy(base_delay=0.01)})
+    sent = []
+
+    class Session:
+        def request(self, method, url, **kwargs):
+            sent.append((kwargs['cookies']['a1'], kwargs['headers']['x-s'], kwargs['data']))
+            response = requests.Response()
+            response.status_code = 200
+            body = {'success': False, 'code': 300013, 'msg': '访问频次异常'} if kwargs['cookies']['a1'] == 'aaa' else {'success': True, 'msg': '', 'data': {}}
+            response._content = json.dumps(body, separators=(',', ':')).encode('utf-8')
+            return response
+    pool = CookiePool(['a1=aaa; web_session=1', 'a1=bbb; web_session=2'], cooldown=60)
+    apis = XHS_Apis(session=Session(), cookie_pool=pool)
+    success, msg, _ = apis.search_user('q', 'a1=aaa; web_session=1')
+    # 限流的账号进入冷却，换另一个账号重新签名后重试，请求体不变
+    assert success and [a1 for a1, _, _ in sent] == ['aaa', 'bbb']
+    assert sent[0][1] != sent[1][1] and sent[0][2] == sent[1][2]
+    assert pool.is_cooling('aaa')
+    # 没有可换的账号时不在冷却中的账号上重试
+    pool.begin('bbb')
+    pool.end('bbb', False)
+    sent.clear()
+    assert not apis.search_user('q2', 'a1=aaa; web_session=1')[0]
+    assert [a1 for a1, _, _ in sent] == ['aaa']
+
+
+def test_proxy_pool_prefers_fast_healthy_proxies():
+    from xhs_utils.proxy_pool import ProxyPool
+    pool = ProxyPool(['http://p1', 'http://p2', 'http://p3'], sticky=False, max_failures=2)
+    # 未测量过的代理先被探测
+    for url, latency in [('http://p1', 0.5), ('http://p2', 0.1), ('http://p3', 0.3)]:
+        assert pool.select() == url
+        pool.report(url, latency, True)
+    assert pool.select() == 'http://p2'
+    pool.report('http://p2', 0.1, False)
+    assert pool.select() == 'http://p3'
+    pool.report('http://p2', 0.1, False)
+    assert 'http://p2' in [proxy['proxy'] for proxy in pool.stats()['evicted']]
+    assert len(pool) == 2
+    # 全部被剔除后不退回直连，使用代价最小的被剔除代理，成功后恢复
+    for url in ('http://p1', 'http://p3'):
+        pool.report(url, 0.1, False)
+        pool.report(url, 0.1, False)
+    assert len(pool) == 0 and pool.select() == 'http://p2'
+    pool.report('http://p2', 0.2, True)
+    assert len(pool) == 1 and pool.select() == 'http://p2'
+
+
+def test_proxy_pool_sticky_binding():
+    from xhs_utils.proxy_pool import ProxyPool
+    pool = ProxyPool(['http://p1', 'http://p2'], sticky=True, max_failures=1)
+    first, second = pool.select('aaa'), pool.select('bbb')
+    assert first != second
+    assert [pool.select('aaa') for _ in range(3)] == [first] * 3
+    pool.report(first, 1, False)
+    assert pool.select('aaa') == second
+
+
+def test_retry_classification():
+    from xhs_utils import retry_policy as rp
+    assert rp.classify_status(200) == rp.OK
+    assert rp.classify_status(503) == rp.SERVER
+    assert rp.classify_status(429) == rp.RATE_LIMITED
+    assert rp.classify_status(200, 300013) == rp.RATE_LIMITED
+    assert rp.classify_status(461) == rp.CAPTCHA
+    assert rp.classify_status(200, -100) == rp.AUTH
+    assert rp.classify_exception(requests.exceptions.ConnectTimeout()) == rp.NETWORK
+    assert rp.classify_exception(ValueError()) == rp.OTHER
+
+
+def test_retry_policy_backoff_and_limits(monkeypatch):
+    from xhs_utils.retry_policy import RetryPolicy, NETWORK, AUTH
+    monkeypatch.setattr('time.sleep', lambda seconds: None)
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=1.5, max_elapsed=30)
+    assert all(0 <= policy.backoff(attempt) <= 1.5 for attempt in range(1, 10))
+    assert policy.next_delay(AUTH, 1, time.monotonic()) is None
+    assert policy.next_delay(NETWORK, 3, time.monotonic()) is None
+    assert policy.next_delay(NETWORK, 1, time.monotonic() - 30) is None
+    with deadline(0):
+        assert policy.next_delay(NETWORK, 1, time.monotonic()) is None
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise requests.exceptions.ConnectionError()
+        return 'ok'
+    assert policy.call(flaky) == 'ok' and len(calls) == 3
+    with pytest.raises(ValueError):
+        policy.call(lambda: calls.append(1) or int('x'))
+    assert len(calls) == 4
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    from xhs_utils.single_flight import SingleFlight
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    calls, results = [], []
+
+    def fetch(user_id):
+        calls.append(user_id)
+        started.set()
+        release.wait(5)
+        return True, 'success', [user_id]
+
+    leader = threading.Thread(target=lambda: results.append(flight.do('u1', fetch, 'u1')))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('u1', fetch, 'u1'))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    while flight.stats()['shared'] < 3:
+        time.sleep(0.01)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert calls == ['u1'] and len(results) == 4 and all(result is results[0] for result in results)
+    assert flight.stats()['in_flight'] == 0
+    # 调用结束后相同 key 会重新执行，异常同样传给等待方
+    with pytest.raises(ValueError):
+        flight.do('u1', lambda: int('x'))
+    assert flight.do('u1', fetch, 'u2')[2] == ['u2']
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_response_cache_ttl_and_stale_while_revalidate(backend, tmp_path):
+    from xhs_utils.response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+    if backend == 'sqlite':
+        store = SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), maxsize=2, evict_every=1)
+    else:
+        store = MemoryCacheBackend(maxsize=2)
+    cache = ResponseCache(store, {'note': {'ttl': 0.2, 'stale': 5}})
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return True, 'success', {'success': True, 'n': len(calls)}
+    assert cache.get_or_fetch('note', 'k1', fetch)[2]['n'] == 1
+    assert cache.get_or_fetch('note', 'k1', fetch)[2]['n'] == 1
+    # 过期后先返回旧结果，后台刷新
+    time.sleep(0.25)
+    assert cache.get_or_fetch('note', 'k1', fetch)[2]['n'] == 1
+    cache._executor.shutdown(wait=True)
+    assert cache.get_or_fetch('note', 'k1', fetch)[2]['n'] == 2
+    # 失败的结果和未配置的接口类别不缓存
+    assert not cache.get_or_fetch('note', 'k2', lambda: (False, 'err', None))[0]
+    cache.get_or_fetch('search', 'k3', fetch)
+    cache.get_or_fetch('note', 'k4', fetch)
+    cache.get_or_fetch('note', 'k5', fetch)
+    assert len(store) == 2
+    assert cache.stats()['endpoints']['note'] == {'misses': 4, 'hits': 2, 'stale_hits': 1}
+
+
+def test_raw_store_versions_and_replay(tmp_path):
+    from xhs_utils.raw_store import RawStore
+    store = RawStore(str(tmp_path / 'raw.sqlite3'))
+    store.put('note', 'n1', {'v': 1}, fetched_at=100)
+    store.put('note', 'n1', {'v': 2}, fetched_at=200)
+    store.put('note', 'n2', {'v': 3})
+    store.put('user', 'u1', {'v': 4})
+    assert store.latest('note', 'n1') == (200, {'v': 2})
+    assert store.latest('note', 'n1', max_age=60) is None
+    assert store.latest('note', 'n3') is None
+    assert [(object_id, data) for object_id, _, data in store.iter_latest('note')] == [('n1', {'v': 2}), ('n2', {'v': 3})]
+    assert [object_id for object_id, _, _ in store.iter_latest('note', since=1000)] == ['n2']
+    assert store.count() == 4
+    store.prune(keep=1)
+    assert store.count('note') == 2
+
+
+def test_raw_store_write_through_and_read(tmp_path):
+    from xhs_utils.raw_store import RawStore, stored
+    calls = []
+
+    class Apis:
+        raw_store = RawStore(str(tmp_path / 'raw.sqlite3'))
+
+        @stored('note', 'url')
+        def get_note_info(self, url, cookies_str, proxies=None):
+            calls.append(url)
+            return True, '', {'success': True, 'data': {'items': [url]}}
+    apis = Apis()
+    apis.get_note_info('https://www.xiaohongshu.com/explore/n1?xsec_token=a', 'a1=x')
+    # 同一笔记（链接按 note_id 归一）直接从存储读取
+    assert apis.get_note_info('https://www.xiaohongshu.com/explore/n1?xsec_token=b', 'a1=y')[0]
+    assert len(calls) == 1 and Apis.raw_store.latest('note', 'n1') is not None
+
+
+def test_replay_server_serves_paginated_responses(monkeypatch, tmp_path):
+    from werkzeug.serving import make_server
+    from apis.xhs_pc_apis import XHS_Apis
+    from replay_server import ReplayConfig, create_app
+    from xhs_utils.token_registry import TokenRegistry
+    monkeypatch.setattr(SpiderConfig, 'RESPONSE_CACHE_BACKEND', 'none')
+    monkeypatch.setattr(SpiderConfig, 'RATE_LIMIT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.response_cache._response_cache', None)
+    monkeypatch.setattr('xhs_utils.rate_limiter._rate_limiter', None)
+    server = make_server('127.0.0.1', 0, create_app(ReplayConfig(pages=3, page_size=5, seed=1)), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        apis = XHS_Apis(token_registry=TokenRegistry(str(tmp_path / 'tokens.sqlite3')), base_url=f'http://127.0.0.1:{server.server_port}')
+        success, msg, notes = apis.get_user_all_notes('https://www.xiaohongshu.com/user/profile/replayuser0001', 'a1=replay; web_session=1')
+        assert success, msg
+        assert len(notes) == 15
+        assert apis.token_registry.count('note') == 15
+        success, msg, res_json = apis.get_note_info(f"https://www.xiaohongshu.com/explore/{notes[0]['note_id']}?xsec_token=replay", 'a1=replay')
+        assert success and res_json['data']['items'][0]['id'] == notes[0]['note_id']
+    finally:
+        server.shutdown()
+
+
+def test_replay_server_replays_recorded_user_pages_in_order(tmp_path):
+    from replay_server import ReplayConfig, create_app
+    from xhs_utils.raw_store import RawStore
+    path = str(tmp_path / 'raw.sqlite3')
+    store = RawStore(path)
+    for user_id in ('ua', 'ub'):
+        store.put('user_posted', json.dumps([user_id, '']), {'data': {'notes': [{'note_id': f'{user_id}-0'}], 'cursor': f'{user_id}-next'}})
+        store.put('user_posted', json.dumps([user_id, f'{user_id}-next']), {'data': {'notes': [{'note_id': f'{user_id}-1'}], 'cursor': ''}})
+    client = create_app(ReplayConfig(pages=3, page_size=2, raw_store_path=path)).test_client()
+
+    def note_ids(user_id, cursor):
+        return [note['note_id'] for note in client.get(f'/api/sns/web/v1/user_posted?user_id={user_id}&cursor={cursor}').get_json()['data']['notes']]
+    assert [note_ids('ub', cursor) for cursor in ('', 'c1')] == [['ub-0'], ['ub-1']]
+    # 没有录制的页、没有录制的用户使用生成的数据，不会返回其他用户的页
+    assert note_ids('ub', 'c2') == ['ub00020000', 'ub00020001']
+    assert note_ids('uc', '') == ['uc00000000', 'uc00000001']
+
+
+def test_iter_user_notes_yields_pages_and_resumes(monkeypatch):
+    from apis.xhs_pc_apis import XHS_Apis
+    pages = {'': ('c1', True), 'c1': ('c2', True), 'c2': ('c3', False)}
+    calls = []
+
+    def get_user_note_info(user_id, cursor, cookies_str, xsec_token='', xsec_source='', proxies=None, num=30):
+        calls.append(cursor)
+        next_cursor, has_more = pages[cursor]
+        return True, 'success', {'data': {'notes': [f'{cursor}-{i}' for i in range(2)], 'cursor': next_cursor, 'has_more': has_more}}
+    monkeypatch.setattr(SpiderConfig, 'TOKEN_REGISTRY_ENABLED', False)
+    apis = XHS_Apis()
+    monkeypatch.setattr(apis, 'get_user_note_info', get_user_note_info)
+    url = 'https://www.xiaohongshu.com/user/profile/u1?xsec_token=t'
+    pages_iter = apis.iter_user_notes(url, 'a1=x')
+    # 生成器是惰性的，取到第一页时只请求了一次
+    assert next(pages_iter) == (['-0', '-1'], 'c1') and calls == ['']
+    assert [cursor for _, cursor in apis.iter_user_notes(url, 'a1=x', cursor='c1')] == ['c2', None]
+    assert apis.get_user_all_notes(url, 'a1=x') == (True, 'success', ['-0', '-1', 'c1-0', 'c1-1', 'c2-0', 'c2-1'])
+
+    monkeypatch.setattr(apis, 'get_user_note_info', lambda *args, **kwargs: (False, 'boom', None))
+    assert apis.get_user_all_notes(url, 'a1=x') == (False, 'boom', [])
+
+
+def test_limit_stops_paging_and_sizes_pages(monkeypatch):
+    from apis.xhs_pc_apis import XHS_Apis
+    requested = []
+
+    def get_user_note_info(user_id, cursor, cookies_str, xsec_token='', xsec_source='', proxies=None, num=30):
+        requested.append((cursor, num))
+        index = int(cursor or 0)
+        return True, 'success', {'data': {'notes': list(range(index, index + num)), 'cursor': str(index + num), 'has_more': True}}
+    monkeypatch.setattr(SpiderConfig, 'TOKEN_REGISTRY_ENABLED', False)
+    apis = XHS_Apis()
+    monkeypatch.setattr(apis, 'get_user_note_info', get_user_note_info)
+    url = 'https://www.xiaohongshu.com/user/profile/u2'
+    success, msg, notes = apis.get_user_latest_notes(url, 'a1=x', limit=5)
+    assert success and notes == [0, 1, 2, 3, 4] and requested == [('', 5)]
+    requested.clear()
+    assert len(apis.get_user_latest_notes(url, 'a1=x', limit=45)[2]) == 45
+    assert requested == [('', 30), ('30', 15)]
+
+
+def test_parse_url_keeps_base64_padding(monkeypatch):
+    from apis.xhs_pc_apis import XHS_Apis
+    tokens = []
+
+    def get_user_note_info(user_id, cursor, cookies_str, xsec_token='', xsec_source='', proxies=None, num=30):
+        tokens.append((user_id, xsec_token, xsec_source))
+        return True, 'success', {'data': {'notes': [1], 'cursor': '', 'has_more': False}}
+    monkeypatch.setattr(SpiderConfig, 'TOKEN_REGISTRY_ENABLED', False)
+    apis = XHS_Apis()
+    monkeypatch.setattr(apis, 'get_user_note_info', get_user_note_info)
+    url = 'https://www.xiaohongshu.com/user/profile/u3?xsec_token=ABqQKj8xg=&xsec_source=pc_user'
+    assert XHS_Apis._parse_url(url) == ('u3', {'xsec_token': 'ABqQKj8xg=', 'xsec_source': 'pc_user'})
+    apis.get_user_latest_notes(url, 'a1=x', limit=1)
+    assert tokens == [('u3', 'ABqQKj8xg=', 'pc_user')]
+
+
+def test_note_fetcher_fetches_users_concurrently_in_order(monkeypatch):
+    from xhs_utils.note_fetcher import NoteFetcher
+    monkeypatch.setattr(SpiderConfig, 'SINGLE_FLIGHT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.single_flight._single_flight', None)
+
+    class Apis:
+        def presign_user_note_info(self, users, cookies_str, num=30):
+            pass
+
+        def presign_note_info(self, urls, cookies_str):
+            pass
+
+        def iter_user_notes(self, user_url, cookies_str, cursor='', proxies=None, limit=None):
+            user_id = user_url.split('/')[-1]
+            if user_id == 'bad':
+                raise Exception('boom')
+            time.sleep(0.1)
+            yield [{'note_id': f'{user_id}-{i}', 'xsec_token': 't'} for i in range(limit)], None
+
+        def get_note_info(self, url, cookies_str, proxies=None):
+            time.sleep(0.1)
+            return False, 'no detail', None
+    fetcher = NoteFetcher('a1=x', Apis())
+    start = time.monotonic()
+    notes, users = fetcher.fetch_users_notes(['u1', 'bad', 'u2', 'u3'], max_users=3, notes_per_user=3)
+    # 3 个用户 × (列表 + 3 条详情) 顺序执行约 1.2s，并发时约为最长链路 0.2s
+    assert time.monotonic() - start < 0.6
+    assert [note['note_id'] for note in notes] == [f'{user_id}-{i}' for user_id in ('u1', 'u2', 'u3') for i in range(3)]
+    assert [(user['user_id'], user['success'], user['count']) for user in users] == [('u1', True, 3), ('bad', False, 0), ('u2', True, 3), ('u3', True, 3)]
+
+
+def test_concurrency_limiter_caps_per_account():
+    from xhs_utils.concurrency_limiter import ConcurrencyLimiter
+    limiter = ConcurrencyLimiter(1)
+    with limiter.slot('a'):
+        with limiter.slot('b'):
+            pass
+        with deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                with limiter.slot('a'):
+                    pass
+    with limiter.slot('a'):
+        pass
+
+
+def test_pipeline_overlaps_stages_and_keeps_order():
+    from xhs_utils.pipeline import Pipeline, Stage
+    listed = []
+
+    def source():
+        for i in range(6):
+            listed.append(i)
+            yield i
+
+    def detail(i):
+        time.sleep(0.05 * (i % 3))
+        return None if i == 3 else i * 10
+
+    def save(value):
+        if value == 40:
+            raise ValueError('boom')
+        return value
+    pipeline = Pipeline([Stage('detail', detail, 3, queue_size=2), Stage('save', save, 2, queue_size=2)])
+    assert pipeline.run(source()) == (True, 'success', [0, 10, 20, 50])
+    assert listed == list(range(6))
+    assert pipeline.stats()['detail'] == {'done': 5, 'dropped': 1} and pipeline.stats()['save'] == {'done': 4, 'failed': 1}
+
+    def broken():
+        yield 1
+        raise Exception('page failed')
+    assert Pipeline([Stage('detail', lambda i: i)]).run(broken()) == (False, 'page failed', [1])
+
+
+def test_note_fetcher_serves_list_fields_without_detail(monkeypatch):
+    from xhs_utils.note_fetcher import NoteFetcher, needs_detail
+    monkeypatch.setattr(SpiderConfig, 'SINGLE_FLIGHT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.single_flight._single_flight', None)
+    detail_calls = []
+
+    class Apis:
+        def presign_user_note_info(self, users, cookies_str, num=30):
+            pass
+
+        def presign_note_info(self, urls, cookies_str):
+            pass
+
+        def iter_user_notes(self, user_url, cookies_str, cursor='', proxies=None, limit=None):
+            yield [{'note_id': f'n{i}', 'xsec_token': 't', 'display_title': f'标题{i}', 'type': 'video', 'user': {'nickname': 'nick'}, 'interact_info': {'liked_count': '7'}} for i in range(limit)], None
+
+        def get_note_info(self, url, cookies_str, proxies=None):
+            detail_calls.append(url)
+            return False, 'no detail', None
+    fetcher = NoteFetcher('a1=x', Apis())
+    notes = fetcher.get_users_latest_notes(['u1'], notes_per_user=2, fields=['note_id', 'title', 'liked_count'])
+    assert not detail_calls
+    assert [(note['note_id'], note['title'], note['liked_count'], note['note_type'], note['user_id']) for note in notes] == [('n0', '标题0', '7', '视频', 'u1'), ('n1', '标题1', '7', '视频', 'u1')]
+    fetcher.get_users_latest_notes(['u1'], notes_per_user=2, fields=['desc'], detail='none')
+    assert not detail_calls
+    fetcher.get_users_latest_notes(['u1'], notes_per_user=2)
+    assert len(detail_calls) == 2
+    assert needs_detail(['note_id'], 'full') and needs_detail(['tags']) and not needs_detail(['title'])
+    with pytest.raises(ValueError):
+        needs_detail(None, 'some')
+
+
+def test_note_detail_cache_reuses_details_and_tokens(monkeypatch):
+    from xhs_utils.note_detail_cache import NoteDetailCache, get_note_detail
+    from xhs_utils.response_cache import is_refreshing
+    cache = NoteDetailCache(10, ttl=60, counts_ttl=0.05)
+    monkeypatch.setattr('xhs_utils.note_detail_cache._note_detail_cache', cache)
+    calls = []
+
+    class Apis:
+        def get_note_info(self, url, cookies_str, proxies=None):
+            calls.append((url, is_refreshing()))
+            item = {'id': 'n1', 'note_card': {
+                'title': '标题', 'type': 'normal', 'desc': '', 'time': 0, 'last_update_time': 0, 'ip_location': '', 'tag_list': [],
+                'user': {'user_id': 'u1', 'nickname': 'nick', 'avatar': ''},
+                'interact_info': {'liked_count': str(len(calls)), 'collected_count': '0', 'comment_count': '0', 'share_count': '0'}}}
+            return True, 'success', {'success': True, 'data': {'items': [item]}}
+    url = 'https://www.xiaohongshu.com/explore/n1?xsec_token=tok&xsec_source=pc_user'
+    success, _, note = get_note_detail(Apis(), url, 'a1=x')
+    assert success and note['title'] == '标题' and note['liked_count'] == '1'
+    note['title'] = 'changed'
+    # 命中缓存时不请求上游，返回的是副本
+    assert get_note_detail(Apis(), 'https://www.xiaohongshu.com/explore/n1', 'a1=x')[2]['title'] == '标题'
+    assert len(calls) == 1
+    time.sleep(0.1)
+    # 不需要互动数据时过期的条目仍可使用
+    assert get_note_detail(Apis(), 'https://www.xiaohongshu.com/explore/n1', 'a1=x', need_counts=False)[2]['liked_count'] == '1'
+    assert len(calls) == 1
+    # 互动数据过期时跳过响应缓存重新获取，链接中没有 xsec_token 时使用记住的
+    assert get_note_detail(Apis(), 'https://www.xiaohongshu.com/explore/n1', 'a1=x')[2]['liked_count'] == '2'
+    assert calls[1] == ('https://www.xiaohongshu.com/explore/n1?xsec_token=tok&xsec_source=pc_user', True)
+    assert cache.stats() == {'size': 1, 'tokens': 1, 'misses': 1, 'hits': 2, 'stale_counts': 1}
+
+
+def test_token_registry_harvests_and_expires(tmp_path):
+    from xhs_utils.token_registry import TokenRegistry
+    from xhs_utils.user_url_helper import UserURLHelper
+    path = str(tmp_path / 'tokens.sqlite3')
+    searches = []
+
+    class Apis:
+        token_registry = TokenRegistry(path, ttl=60)
+
+        def search_user(self, query, cookies_str, page=1, proxies=None):
+            searches.append(query)
+            return True, 'success', {'data': {'users': []}}
+    registry = Apis.token_registry
+    assert registry.harvest({'data': {'users': [{'id': 'u1', 'xsec_token': 'ut1'}, {'id': 'u2'}]}}, 'pc_search') == 1
+    registry.harvest({'data': {'items': [{'id': 'n1', 'model_type': 'note', 'xsec_token': 'nt1', 'note_card': {'user': {'user_id': 'u3', 'xsec_token': 'ut3'}}}]}}, 'pc_feed')
+    registry.harvest({'data': {'notes': [{'note_id': 'n2', 'xsec_token': 'nt2'}]}}, 'pc_user')
+    # 登记表中有的用户不再搜索
+    assert UserURLHelper('a1=x', Apis()).search_user_by_id('u1') == 'https://www.xiaohongshu.com/user/profile/u1?xsec_token=ut1&xsec_source=pc_search'
+    assert UserURLHelper('a1=x', Apis()).search_user_by_id('u9') is None
+    assert searches == ['u9']
+    # 重启后仍可使用，超过有效期的不再使用
+    reopened = TokenRegistry(path, ttl=60)
+    assert reopened.lookup('user', 'u3')[:2] == ('ut3', 'pc_feed')
+    assert reopened.note_url('n2') == 'https://www.xiaohongshu.com/explore/n2?xsec_token=nt2&xsec_source=pc_user'
+    reopened.remember('note', 'old', 'tok', 'pc_user', seen_at=time.time() - 120)
+    assert reopened.lookup('note', 'old') is None
+    reopened.prune()
+    assert reopened.count() == 4
+
+
+def test_note_fetcher_uses_registered_user_tokens(monkeypatch, tmp_path):
+    from xhs_utils.note_fetcher import NoteFetcher
+    from xhs_utils.token_registry import TokenRegistry
+    monkeypatch.setattr(SpiderConfig, 'SINGLE_FLIGHT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.single_flight._single_flight', None)
+    registry = TokenRegistry(str(tmp_path / 'tokens.sqlite3'))
+    registry.remember('user', 'u1', 'ut1=', 'pc_feed')
+    presigned, listed = [], []
+
+    class Apis:
+        def presign_user_note_info(self, users, cookies_str, num=30):
+            presigned.extend(users)
+
+        def iter_user_notes(self, user_url, cookies_str, cursor='', proxies=None, limit=None):
+            listed.append(user_url)
+            yield [], None
+    NoteFetcher('a1=x', Apis(), registry).fetch_users_notes(['u1', 'u2'], notes_per_user=1, detail='none')
+    assert presigned == [('u1', 'ut1=', 'pc_feed'), ('u2', '', 'pc_search')]
+    assert sorted(listed) == ['https://www.xiaohongshu.com/user/profile/u1?xsec_token=ut1=&xsec_source=pc_feed', 'https://www.xiaohongshu.com/user/profile/u2']
+
+
+def _serve(app):
+    """在后台线程中启动 app，返回 (server, base_url)"""
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def test_async_apis_paginate_against_replay_server(monkeypatch):
+    import asyncio
+    from apis.xhs_pc_async_apis import AsyncXHS_Apis
+    from replay_server import ReplayConfig, create_app
+    monkeypatch.setattr(SpiderConfig, 'RATE_LIMIT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.rate_limiter._rate_limiter', None)
+    monkeypatch.setattr(SpiderConfig, 'RESPONSE_CACHE_BACKEND', 'none')
+    monkeypatch.setattr('xhs_utils.response_cache._response_cache', None)
+    server, base_url = _serve(create_app(ReplayConfig(pages=3, page_size=5, seed=1)))
+
+    async def run():
+        async with AsyncXHS_Apis(base_url=base_url) as apis:
+            user_url = 'https://www.xiaohongshu.com/user/profile/replayuser0001?xsec_token=t=&xsec_source=pc_user'
+            all_notes = await apis.get_user_all_notes(user_url, 'a1=replay')
+            latest = await apis.get_user_latest_notes(user_url, 'a1=replay', limit=7)
+            users = await apis.search_some_user('q', 20, 'a1=replay')
+            return all_notes, latest, users
+    try:
+        (ok_all, msg, all_notes), (ok_latest, _, latest), (ok_users, _, users) = asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert ok_all, msg
+    assert len(all_notes) == 15 and len({note['note_id'] for note in all_notes}) == 15
+    # 第二页只请求还差的 2 条
+    assert ok_latest and [note['note_id'] for note in latest] == [note['note_id'] for note in all_notes[:5]] + ['user00010001' + f'{i:04d}' for i in range(2)]
+    assert ok_users and len(users) == 15
+
+
+def test_async_apis_retry_and_switch_account(monkeypatch):
+    import asyncio
+    from flask import Flask, jsonify, request
+    from apis.xhs_pc_async_apis import AsyncXHS_Apis
+    from xhs_utils.cookie_pool import CookiePool
+    from xhs_utils.retry_policy import RetryPolicy
+    monkeypatch.setattr(SpiderConfig, 'RATE_LIMIT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.rate_limiter._rate_limiter', None)
+    monkeypatch.setattr(SpiderConfig, 'RESPONSE_CACHE_BACKEND', 'none')
+    monkeypatch.setattr('xhs_utils.response_cache._response_cache', None)
+    monkeypatch.setattr('xhs_utils.retry_policy._retry_policies', {'search': RetryPolicy(base_delay=0.01)})
+    app = Flask(__name__)
+    seen = []
+
+    @app.route('/api/sns/web/v1/search/usersearch', methods=['POST'])
+    def usersearch():
+        a1 = request.cookies.get('a1')
+        seen.append((a1, request.headers.get('x-s'), request.get_data()))
+        if len(seen) == 1:
+            return jsonify({'success': False, 'msg': 'service unavailable'}), 503
+        if a1 == 'aaa':
+            return jsonify({'code': 300013, 'success': False, 'msg': '访问频次异常'}), 200
+        return jsonify({'code': 0, 'success': True, 'msg': '成功', 'data': {'users': [], 'has_more': False}}), 200
+    server, base_url = _serve(app)
+    pool = CookiePool(['a1=aaa; web_session=1', 'a1=bbb; web_session=2'], cooldown=60)
+
+    async def run():
+        async with AsyncXHS_Apis(cookie_pool=pool, base_url=base_url) as apis:
+            return await apis.search_user('q', 'a1=aaa; web_session=1')
+    try:
+        success, msg, _ = asyncio.run(run())
+    finally:
+        server.shutdown()
+    # 503 在同一账号上重试，300013 换账号重新签名后重试，请求体不变
+    assert success, msg
+    assert [a1 for a1, _, _ in seen] == ['aaa', 'aaa', 'bbb']
+    assert seen[1][1] != seen[2][1] and len({body for _, _, body in seen}) == 1
+    assert pool.is_cooling('aaa') and not pool.is_cooling('bbb')
+
+
+def test_async_apis_closes_only_its_own_session():
+    import asyncio
+    import aiohttp
+    from apis.xhs_pc_async_apis import AsyncXHS_Apis
+
+    async def run():
+        async with AsyncXHS_Apis() as apis:
+            own = apis._get_session()
+        shared = aiohttp.ClientSession()
+        async with AsyncXHS_Apis(session=shared) as apis:
+            assert apis._get_session() is shared
+        shared_open = not shared.closed
+        await shared.close()
+        return own.closed, shared_open
+    assert asyncio.run(run()) == (True, True)
+
+
+def test_presigned_headers_match_per_call_signing(monkeypatch):
+    import types
+    from xhs_utils import xhs_sign, xhs_util
+    from xhs_utils.cache_util import TTLCache
+    monkeypatch.setattr(SpiderConfig, 'SIGN_ENGINE', 'python')
+    monkeypatch.setattr(SpiderConfig, 'SIGN_CACHE_SIZE', 0)
+    monkeypatch.setattr(xhs_util, '_presigned', TTLCache(100, SpiderConfig.SIGN_VALID_SECONDS))
+    # 固定时间戳和随机数，两种方式算出的签名应逐字节相同
+    now = time.time()
+    monkeypatch.setattr(xhs_sign, 'time', types.SimpleNamespace(time=lambda: now))
+    monkeypatch.setattr(xhs_sign, 'os', types.SimpleNamespace(urandom=lambda n: bytes(range(1, n + 1))))
+    cookies_str = 'a1=presign; web_session=1'
+    sign_items = [
+        ('/api/sns/web/v1/user_posted?num=30&cursor=&user_id=u1&image_formats=jpg,webp,avif&xsec_token=t%3D&xsec_source=pc_user', '', 'GET'),
+        ('/api/sns/web/v1/search/notes', {'keyword': '美食', 'page': 1}, 'POST'),
+        ('/api/sns/web/v1/search/notes', {'keyword': '美食', 'page': 2}, 'POST'),
+    ]
+    sign_fields = ('x-s', 'x-t', 'x-s-common')
+    expected = [{k: xhs_util.generate_request_params(cookies_str, api, data, method)[0][k] for k in sign_fields} for api, data, method in sign_items]
+    xhs_util.presign('presign', sign_items)
+    assert len(xhs_util._presigned) == 3
+    # 预签名之后时间继续走，取到的仍是预签名结果
+    monkeypatch.setattr(xhs_sign, 'time', types.SimpleNamespace(time=lambda: now + 1))
+    actual = []
+    for api, data, method in sign_items:
+        headers, _, body = xhs_util.generate_request_params(cookies_str, api, data, method)
+        actual.append({k: headers[k] for k in sign_fields})
+        if data:
+            assert body == json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    assert actual == expected
+    assert len(xhs_util._presigned) == 0
+
+
+@pytest.mark.skipif(shutil.which(SpiderConfig.NODE_PATH) is None, reason='需要 node')
+def test_sign_pool_signs_batches_and_restarts_dead_workers():
+    from xhs_utils.sign_pool import NodeSignPool
+    pool = NodeSignPool(size=1, health_check_interval=0)
+    try:
+        rets = pool.call('get_request_headers_params_many', [['/api/sns/web/v1/search/notes', {'page': 1}, 'POST'], ['/api/sns/web/v1/user_posted?num=30', '', 'GET']], 'a1')
+        assert len(rets) == 2 and all(ret['xs'].startswith('XYS_') and ret['xs_common'] for ret in rets)
+        # 进程退出后下一次调用自动重启并完成
+        pool._workers[0].process.kill()
+        pool._workers[0].process.wait()
+        assert pool.call('ping') == 'pong'
+        assert pool.restarts == 1
+    finally:
+        pool.close()
+
+
+def test_credential_keeps_equals_in_cookie_values():
+    from xhs_utils.cookie_util import Credential
+    for cookies_str in ('a1=x; web_session=ab==; k=v=w', 'a1=x;web_session=ab==;k=v=w'):
+        credential = Credential.of(cookies_str)
+        assert credential.a1 == 'x'
+        assert credential.cookies == {'a1': 'x', 'web_session': 'ab==', 'k': 'v=w'}
+        assert Credential.of(cookies_str) is credential and Credential.of(credential) is credential
+        assert str(credential) == cookies_str
+
+
+def test_api_instances_share_one_pooled_session(monkeypatch):
+    from apis.xhs_pc_apis import XHS_Apis
+    from xhs_utils import http_util
+    monkeypatch.setattr(http_util, '_shared_session', None)
+    monkeypatch.setattr(SpiderConfig, 'HTTP_POOL_CONNECTIONS', 3)
+    monkeypatch.setattr(SpiderConfig, 'HTTP_POOL_MAXSIZE', 7)
+    barrier = threading.Barrier(8)
+    sessions = []
+
+    def create():
+        barrier.wait()
+        sessions.append(XHS_Apis().session)
+    threads = [threading.Thread(target=create) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 并发创建的实例只初始化一次 session，http 和 https 共用同一个连接池
+    assert len(sessions) == 8 and len({id(session) for session in sessions}) == 1
+    session = sessions[0]
+    adapter = session.get_adapter('https://edith.xiaohongshu.com')
+    assert adapter is session.get_adapter('http://127.0.0.1')
+    assert (adapter._pool_connections, adapter._pool_maxsize) == (3, 7)
+    assert adapter.poolmanager.connection_pool_kw['maxsize'] == 7
+    assert XHS_Apis(session=requests.Session()).session is not session
+
+
+def test_async_paginators_keep_the_last_page_without_cursor():
+    import asyncio
+    from apis.xhs_pc_async_apis import AsyncXHS_Apis
+    apis = AsyncXHS_Apis()
+    pages = {
+        '': {'success': True, 'msg': '成功', 'data': {'comments': [{'id': 'c1'}, {'id': 'c2'}], 'cursor': 'c2', 'has_more': True}},
+        'c2': {'success': True, 'msg': '成功', 'data': {'comments': [{'id': 'c3'}], 'has_more': True}},
+    }
+
+    async def get_note_out_comment(note_id, cursor, xsec_token, cookies_str, proxies=None):
+        return True, '成功', pages[cursor]
+    apis.get_note_out_comment = get_note_out_comment
+    success, msg, comments = asyncio.run(apis.get_note_all_out_comment('n1', 't', 'a1=x'))
+    # 最后一页没有 cursor 时也要保留本页的评论
+    assert success, msg
+    assert [comment['id'] for comment in comments] == ['c1', 'c2', 'c3']
+
+
+def test_async_apis_share_account_slots_and_response_cache(monkeypatch):
+    import asyncio
+    from flask import Flask, jsonify
+    from apis.xhs_pc_async_apis import AsyncXHS_Apis
+    from xhs_utils.concurrency_limiter import ConcurrencyLimiter
+    from xhs_utils.response_cache import MemoryCacheBackend, ResponseCache
+    monkeypatch.setattr(SpiderConfig, 'RATE_LIMIT_ENABLED', False)
+    monkeypatch.setattr('xhs_utils.rate_limiter._rate_limiter', None)
+    monkeypatch.setattr('xhs_utils.concurrency_limiter._concurrency_limiter', ConcurrencyLimiter(2))
+    monkeypatch.setattr('xhs_utils.response_cache._response_cache', ResponseCache(MemoryCacheBackend(100)))
+    app = Flask(__name__)
+    lock = threading.Lock()
+    state = {'in_flight': 0, 'max_in_flight': 0, 'calls': 0}
+
+    @app.route('/api/sns/web/v1/user/otherinfo')
+    def otherinfo():
+        with lock:
+            state['calls'] += 1
+            state['in_flight'] += 1
+            state['max_in_flight'] = max(state['max_in_flight'], state['in_flight'])
+        time.sleep(0.05)
+        with lock:
+            state['in_flight'] -= 1
+        return jsonify({'code': 0, 'success': True, 'msg': '成功', 'data': {'basic_info': {}}})
+    server, base_url = _serve(app)
+
+    async def run():
+        async with AsyncXHS_Apis(base_url=base_url) as apis:
+            first = await asyncio.gather(*[apis.get_user_info(f'u{i}', 'a1=same') for i in range(6)])
+            again = await apis.get_user_info('u0', 'a1=same')
+            return first, again
+    try:
+        first, again = asyncio.run(run())
+    finally:
+        server.shutdown()
+    assert all(success for success, _, _ in first) and again == first[0]
+    # 同一账号同时最多 2 个请求，重复的请求命中响应缓存
+    assert state['max_in_flight'] == 2
+    assert state['calls'] == 6
+
+
+def test_spider_keeps_notes_whose_media_download_fails(monkeypatch, tmp_path):
+    import main
+    from xhs_utils.raw_store import RawStore
+    spider = main.Data_Spider(raw_store=RawStore(str(tmp_path / 'raw.sqlite3')))
+    listed = [{'note_id': f'n{i}', 'xsec_token': 't'} for i in range(3)]
+    monkeypatch.setattr(spider.xhs_apis, 'iter_user_notes', lambda *args, **kwargs: iter([(listed, None)]))
+    monkeypatch.setattr(spider.xhs_apis, 'presign_note_info', lambda *args, **kwargs: None)
+    monkeypatch.setattr(spider, 'spider_note', lambda note_url, *args: (True, 'success', {'note_id': note_url.split('/')[-1].split('?')[0], 'note_url': note_url}))
+
+    def download_note(note_info, path, save_choice):
+        if note_info['note_id'] == 'n1':
+            raise OSError('disk full')
+    saved = {}
+    monkeypatch.setattr(main, 'download_note', download_note)
+    monkeypatch.setattr(main, 'save_to_xlsx', lambda note_infos, file_path: saved.setdefault(file_path, note_infos))
+    base_path = {'media': str(tmp_path / 'media'), 'excel': str(tmp_path)}
+    note_list, success, msg = spider.spider_user_all_note('https://www.xiaohongshu.com/user/profile/u1?xsec_token=t', 'a1=x', base_path, 'all', limit=None)
+    assert success, msg
+    # 媒体下载失败的笔记仍然写入 excel
+    assert [note['note_id'] for note in saved[str(tmp_path / 'u1.xlsx')]] == ['n0', 'n1', 'n2']
+    assert len(note_list) == 3
+    with open(tmp_path / 'u1_all_notes.json', encoding='utf-8') as f:
+        assert json.load(f) == listed
+
+
+def test_unused_presigned_signatures_are_bounded(monkeypatch):
+    from xhs_utils import xhs_util
+    from xhs_utils.cache_util import TTLCache
+    monkeypatch.setattr(SpiderConfig, 'SIGN_ENGINE', 'python')
+    monkeypatch.setattr(xhs_util, '_presigned', TTLCache(3, SpiderConfig.SIGN_VALID_SECONDS))
+    # 翻页提前结束，预签名没有被取用
+    for i in range(10):
+        xhs_util.presign(f'a1_{i}', [('/api/sns/web/v1/search/notes', {'page': p}, 'POST') for p in range(1, 3)])
+    assert len(xhs_util._presigned) == 3
+    # 签名失效后不再返回，条目一并删除
+    monkeypatch.setattr(SpiderConfig, 'SIGN_VALID_SECONDS', 0)
+    assert xhs_util._pop_presigned('a1_9', '/api/sns/web/v1/search/notes', {'page': 1}, 'POST') is None
+    assert xhs_util._presigned.get(xhs_util._sign_key('a1_9', '/api/sns/web/v1/search/notes', {'page': 1}, 'POST')) is None
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_response_cache_entries_are_not_shared_or_counted_per_write(backend, tmp_path):
+    from xhs_utils.response_cache import MemoryCacheBackend, ResponseCache, SQLiteCacheBackend
+    if backend == 'sqlite':
+        store = SQLiteCacheBackend(str(tmp_path / 'cache.sqlite3'), maxsize=2, evict_every=5)
+    else:
+        store = MemoryCacheBackend(maxsize=10)
+    cache = ResponseCache(store, {'note': {'ttl': 60}})
+    result = cache.get_or_fetch('note', 'k1', lambda: (True, 'success', {'success': True, 'items': [1]}))
+    # 调用方修改返回值不影响缓存中的结果
+    result[2]['items'].append(2)
+    cache.get_or_fetch('note', 'k1', lambda: None)[2]['items'].append(3)
+    assert cache.get_or_fetch('note', 'k1', lambda: None)[2]['items'] == [1]
+    if backend == 'sqlite':
+        # 只在每 evict_every 次写入时检查容量
+        for i in range(2, 5):
+            cache.get_or_fetch('note', f'k{i}', lambda: (True, 'success', {'success': True}))
+        assert len(store) == 4
+        cache.get_or_fetch('note', 'k5', lambda: (True, 'success', {'success': True}))
+        assert len(store) == 2
+
+
+@pytest.mark.skipif(shutil.which(SpiderConfig.NODE_PATH) is None, reason='需要 node')
+def test_sign_pool_does_not_hand_out_workers_that_failed_to_restart(monkeypatch):
+    from xhs_utils.sign_pool import NodeSignPool, NodeSignWorker, SignWorkerError
+    pool = NodeSignPool(size=1, health_check_interval=0)
+    try:
+        worker = pool._workers[0]
+        worker.process.kill()
+        worker.process.wait()
+        start = NodeSignWorker.start
+
+        def broken_start(self):
+            raise OSError('node not found')
+        monkeypatch.setattr(NodeSignWorker, 'start', broken_start)
+        with pytest.raises(SignWorkerError):
+            pool.call('ping')
+        # 重启失败的进程不放回空闲队列，下一个调用方拿不到它
+        assert pool._idle.qsize() == 0 and pool._failed == [worker] and pool.failures == 1
+        with pytest.raises(SignWorkerError):
+            pool.call('ping', timeout=0.1)
+        # 健康检查重新启动成功后放回
+        monkeypatch.setattr(NodeSignWorker, 'start', start)
+        pool._revive_failed()
+        assert pool._failed == [] and pool.call('ping') == 'pong'
+    finally:
+        pool.close()
@@ -0,0 +1,90 @@
+"""
+按账号限制同时进行的上游请求数
+多线程并发抓取时，同一账号同时在途的请求过多容易触发风控，超过上限的请求等待空闲名额（受请求截止时间限制）
+"""
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from xhs_utils.config import SpiderConfig
+from xhs_utils.deadline import remaining, DeadlineExceeded
+
+# 异步等待空闲名额时的轮询间隔（秒），名额与多线程共用，不能在事件循环中阻塞等待
+ASYNC_POLL_INTERVAL = 0.01
+
+
+class ConcurrencyLimiter:
+    """按账号（a1）分别计数的并发上限（线程安全）"""
+
+    def __init__(self, limit: int):
+        """
+        :param limit: 每个账号同时进行的最大请求数
+        """
+        self.limit = limit
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        self._waits = 0
+        self._wait_seconds = 0.0
+
+    def _semaphore(self, a1: str) -> threading.BoundedSemaphore:
+        semaphore = self._semaphores.get(a1)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._semaphores.setdefault(a1, threading.BoundedSemaphore(self.limit))
+        return semaphore
+
+    @contextmanager
+    def slot(self, a1: str):
+        """
+        占用账号的一个并发名额，名额已满时等待，超过请求截止时间时抛出 DeadlineExceeded
+        :param a1: cookies 中的 a1
+        """
+        semaphore = self._semaphore(a1)
+        if not semaphore.acquire(blocking=False):
+            start = time.monotonic()
+            if not semaphore.acquire(timeout=remaining()):
+                raise DeadlineExceeded('等待账号并发名额超过请求剩余时间')
+            with self._lock:
+                self._waits += 1
+                self._wait_seconds += time.monotonic() - start
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    @asynccontextmanager
+    async def slot_async(self, a1: str):
+        """slot 的异步版本，等待期间不阻塞事件循环"""
+        semaphore = self._semaphore(a1)
+        if not semaphore.acquire(blocking=False):
+            start = time.monotonic()
+            while not semaphore.acquire(blocking=False):
+                left = remaining()
+                if left is not None and left <= 0:
+                    raise DeadlineExceeded('等待账号并发名额超过请求剩余时间')
+                await asyncio.sleep(ASYNC_POLL_INTERVAL if left is None else min(ASYNC_POLL_INTERVAL, left))
+            with self._lock:
+                self._waits += 1
+                self._wait_seconds += time.monotonic() - start
+        try:
+            yield
+        finally:
+            semaphore.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'limit': self.limit, 'waits': self._waits, 'wait_seconds': round(self._wait_seconds, 3)}
+
+
+_concurrency_limiter = None
+_concurrency_limiter_lock = threading.Lock()
+
+
+def get_concurrency_limiter():
+    """获取全局账号并发限制（单例模式），SpiderConfig.ACCOUNT_MAX_CONCURRENCY 不大于 0 时返回 None"""
+    global _concurrency_limiter
+    if _concurrency_limiter is None and SpiderConfig.ACCOUNT_MAX_CONCURRENCY > 0:
+        with _concurrency_limiter_lock:
+            if _concurrency_limiter is None:
+                _concurrency_limiter = ConcurrencyLimiter(SpiderConfig.ACCOUNT_MAX_CONCURRENCY)
+    return _concurrency_limiter
@@ -0,0 +1,112 @@
+import json
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class SpiderConfig:
+    """爬虫服务配置类（所有值均可通过环境变量覆盖）"""
+
+    # 签名配置
+    STATIC_DIR: str = os.getenv('XHS_STATIC_DIR', os.path.abspath(os.path.join(os.path.dirname(__file__), '../static')))  # 签名脚本所在目录
+    NODE_PATH: str = os.getenv('XHS_NODE_PATH', 'node')
+    SIGN_ENGINE: str = os.getenv('XHS_SIGN_ENGINE', 'python')  # python: 进程内纯Python, pool: 常驻Node进程池, execjs: 每次调用启动node
+    SIGN_POOL_SIZE: int = int(os.getenv('XHS_SIGN_POOL_SIZE', 4))
+    SIGN_CALL_TIMEOUT: float = float(os.getenv('XHS_SIGN_CALL_TIMEOUT', 10))
+    SIGN_HEALTH_CHECK_INTERVAL: float = float(os.getenv('XHS_SIGN_HEALTH_CHECK_INTERVAL', 30))
+    SIGN_VALID_SECONDS: float = float(os.getenv('XHS_SIGN_VALID_SECONDS', 60))  # 签名（x-t）视为有效的时长
+    SIGN_BATCH_SIZE: int = int(os.getenv('XHS_SIGN_BATCH_SIZE', 10))  # 分页请求一次最多预签名的数量
+    PRESIGN_CACHE_SIZE: int = int(os.getenv('XHS_PRESIGN_CACHE_SIZE', 1000))  # 最多保留的预签名请求数，超过时淘汰最早的
+    SIGN_CACHE_SIZE: int = int(os.getenv('XHS_SIGN_CACHE_SIZE', 0))  # GET 请求签名缓存的最大条目数，0 表示不启用
+    SIGN_CACHE_TTL: float = float(os.getenv('XHS_SIGN_CACHE_TTL', 30))  # 签名缓存有效期，不会超过 SIGN_VALID_SECONDS
+    XRAY_TRACEID_BUFFER_SIZE: int = int(os.getenv('XHS_XRAY_TRACEID_BUFFER_SIZE', 0))  # 预生成 x-xray-traceid 的缓冲区大小，0 表示不启用
+
+    # 上游接口地址，压测时可指向本地的 replay_server.py
+    XHS_BASE_URL: str = os.getenv('XHS_BASE_URL', 'https://edith.xiaohongshu.com').rstrip('/')
+
+    # HTTP连接池配置
+    HTTP_POOL_CONNECTIONS: int = int(os.getenv('XHS_HTTP_POOL_CONNECTIONS', 10))  # 缓存连接池的主机数量
+    HTTP_POOL_MAXSIZE: int = int(os.getenv('XHS_HTTP_POOL_MAXSIZE', 20))  # 每个主机保持的最大连接数
+    HTTP_POOL_BLOCK: bool = os.getenv('XHS_HTTP_POOL_BLOCK', 'false').lower() == 'true'  # 连接数达到上限时是否等待
+
+    # 超时配置（秒）
+    HTTP_CONNECT_TIMEOUT: float = float(os.getenv('XHS_HTTP_CONNECT_TIMEOUT', 5))
+    HTTP_READ_TIMEOUT: float = float(os.getenv('XHS_HTTP_READ_TIMEOUT', 15))
+    MEDIA_READ_TIMEOUT: float = float(os.getenv('XHS_MEDIA_READ_TIMEOUT', 60))  # 下载图片/视频的读超时
+    # 按接口路径前缀单独设置 [连接超时, 读超时]，如 {"/api/sns/web/v1/search/": [5, 20]}
+    ENDPOINT_TIMEOUTS: dict = json.loads(os.getenv('XHS_ENDPOINT_TIMEOUTS', '{}'))
+    REQUEST_DEADLINE: float = float(os.getenv('XHS_REQUEST_DEADLINE', 60))  # api_server 单个请求的总耗时上限，0 表示不限制
+
+    # 限流配置：按账号(a1)和接口类别分别限速，{接口类别: [每秒请求数, 突发数量]}
+    RATE_LIMIT_ENABLED: bool = os.getenv('XHS_RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMITS: dict = {
+        'search': [0.5, 3],
+        'user_posted': [1, 3],
+        'feed': [1, 5],
+        'comment': [2, 5],
+        'other': [2, 5],
+        **json.loads(os.getenv('XHS_RATE_LIMITS', '{}')),
+    }
+
+    # 多账号配置
+    COOKIES_FILE: str = os.getenv('XHS_COOKIES_FILE', '')  # 账号 cookie 文件，每行一个
+    COOKIE_COOLDOWN: float = float(os.getenv('XHS_COOKIE_COOLDOWN', 30))  # 账号出错后的首次冷却时间，连续出错时翻倍
+    COOKIE_MAX_COOLDOWN: float = float(os.getenv('XHS_COOKIE_MAX_COOLDOWN', 600))
+    ACCOUNT_MAX_CONCURRENCY: int = int(os.getenv('XHS_ACCOUNT_MAX_CONCURRENCY', 3))  # 每个账号同时进行的最大请求数，0 表示不限制
+
+    # NoteFetcher 并发抓取：同时处理的用户数、每个用户同时获取的笔记详情数，为 1 时顺序执行
+    FETCH_USER_CONCURRENCY: int = int(os.getenv('XHS_FETCH_USER_CONCURRENCY', 5))
+    FETCH_DETAIL_CONCURRENCY: int = int(os.getenv('XHS_FETCH_DETAIL_CONCURRENCY', 5))
+
+    # 抓取流水线（列表 -> 详情 -> 保存/下载）：各阶段的线程数和阶段之间队列的容量
+    PIPELINE_DETAIL_WORKERS: int = int(os.getenv('XHS_PIPELINE_DETAIL_WORKERS', 4))
+    PIPELINE_SAVE_WORKERS: int = int(os.getenv('XHS_PIPELINE_SAVE_WORKERS', 4))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv('XHS_PIPELINE_QUEUE_SIZE', 50))
+
+    # 代理池配置
+    PROXIES_FILE: str = os.getenv('XHS_PROXIES_FILE', '')  # 代理列表文件，每行一个
+    PROXY_STICKY: bool = os.getenv('XHS_PROXY_STICKY', 'false').lower() == 'true'  # 同一账号固定使用同一个代理
+    PROXY_MAX_FAILURES: int = int(os.getenv('XHS_PROXY_MAX_FAILURES', 3))  # 连续失败多少次后剔除代理
+
+    # 重试策略，按接口类别配置: 最多尝试次数、首次退避上限（秒）、单次退避上限（秒）、总耗时上限（秒）
+    # 可重试的错误类别: network（连接失败/超时）、server（5xx）、rate_limited（429/访问频次异常），auth、captcha 不重试
+    RETRY_POLICIES: dict = {
+        'default': {'max_attempts': 3, 'base_delay': 0.5, 'max_delay': 8, 'max_elapsed': 30},
+        'search': {'max_attempts': 3, 'base_delay': 2, 'max_delay': 10, 'max_elapsed': 30},
+        'media': {'max_attempts': 3, 'base_delay': 1, 'max_delay': 10, 'max_elapsed': 120, 'retry_on': ['network', 'server']},
+        **json.loads(os.getenv('XHS_RETRY_POLICIES', '{}')),
+    }
+
+    # 并发的相同调用（相同接口 + 相同参数）合并为一次上游请求
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv('XHS_SINGLE_FLIGHT', 'true').lower() == 'true'
+
+    # 接口响应缓存，后端: memory（进程内）、sqlite（多进程共享）、none（关闭）
+    RESPONSE_CACHE_BACKEND: str = os.getenv('XHS_RESPONSE_CACHE', 'memory').lower()
+    RESPONSE_CACHE_PATH: str = os.getenv('XHS_RESPONSE_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'datas', 'response_cache.sqlite3'))
+    RESPONSE_CACHE_SIZE: int = int(os.getenv('XHS_RESPONSE_CACHE_SIZE', 10000))
+    RESPONSE_CACHE_EVICT_EVERY: int = int(os.getenv('XHS_RESPONSE_CACHE_EVICT_EVERY', 100))  # sqlite 后端每写入多少次检查一次容量并淘汰
+    RESPONSE_CACHE_REFRESH_WORKERS: int = int(os.getenv('XHS_RESPONSE_CACHE_REFRESH_WORKERS', 2))  # 后台刷新过期条目的线程数
+    # 按接口类别的有效期（秒），过期后 stale 秒内先返回旧结果并在后台刷新；ttl 为 0 表示不缓存
+    RESPONSE_CACHE_POLICIES: dict = {
+        'note': {'ttl': 6 * 3600, 'stale': 3600},
+        'user': {'ttl': 3600, 'stale': 600},
+        'user_posted': {'ttl': 300, 'stale': 300},
+        'search': {'ttl': 300, 'stale': 60},
+        **json.loads(os.getenv('XHS_RESPONSE_CACHE_POLICIES', '{}')),
+    }
+
+    # 笔记详情缓存：按 note_id 保存 handle_note_info 的结果和原始数据，并记住每篇笔记最近一次可用的 xsec_token
+    NOTE_DETAIL_CACHE_SIZE: int = int(os.getenv('XHS_NOTE_DETAIL_CACHE_SIZE', 5000))  # 0 表示不启用
+    NOTE_DETAIL_CACHE_TTL: float = float(os.getenv('XHS_NOTE_DETAIL_CACHE_TTL', 6 * 3600))
+    NOTE_DETAIL_COUNTS_TTL: float = float(os.getenv('XHS_NOTE_DETAIL_COUNTS_TTL', 600))  # 点赞、收藏、评论、分享数的有效期，过期后需要这些数据时重新获取
+    NOTE_TOKEN_TTL: float = float(os.getenv('XHS_NOTE_TOKEN_TTL', 24 * 3600))  # 记住的 xsec_token 的有效期
+
+    # xsec_token 登记表：从搜索、主页推荐、笔记列表的响应中记录用户和笔记的 xsec_token，只有用户id时先查这里再搜索
+    TOKEN_REGISTRY_ENABLED: bool = os.getenv('XHS_TOKEN_REGISTRY', 'true').lower() == 'true'
+    TOKEN_REGISTRY_PATH: str = os.getenv('XHS_TOKEN_REGISTRY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'datas', 'xsec_tokens.sqlite3'))
+    TOKEN_REGISTRY_TTL: float = float(os.getenv('XHS_TOKEN_REGISTRY_TTL', 24 * 3600))  # 超过该秒数的 token 不再使用
+
+    # 原始响应持久化存储（SQLite），笔记详情、用户信息、搜索等接口的原始 json 压缩保存，可重启后复用或回放
+    RAW_STORE_ENABLED: bool = os.getenv('XHS_RAW_STORE', 'false').lower() == 'true'
+    RAW_STORE_PATH: str = os.getenv('XHS_RAW_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'datas', 'raw_store.sqlite3'))
@@ -0,0 +1,159 @@
+"""
+多账号 cookie 池
+按 进行中请求数 -> 健康分 -> 最久未使用 的顺序选择账号，出错的账号按连续失败次数指数冷却
+"""
+import os
+import threading
+import time
+from typing import List, Optional
+from loguru import logger
+from xhs_utils.config import SpiderConfig
+from xhs_utils.cookie_util import Credential
+
+
+class AccountState:
+    """单个账号的调度状态"""
+
+    def __init__(self, credential: Credential):
+        self.credential = credential
+        self.in_flight = 0
+        self.last_used = 0.0
+        self.score = 1.0  # 成功率的指数滑动平均
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+
+    def to_dict(self, now: float) -> dict:
+        return {
+            'a1': self.credential.a1[:8] + '***',
+            'in_flight': self.in_flight,
+            'score': round(self.score, 3),
+            'successes': self.successes,
+            'failures': self.failures,
+            'cooldown_seconds': round(max(self.cooldown_until - now, 0), 1),
+        }
+
+
+class CookiePool:
+    """多账号 cookie 池（线程安全）"""
+
+    def __init__(self, cookies: List, cooldown: float = None, max_cooldown: float = None, score_alpha: float = 0.2):
+        """
+        :param cookies: cookie 字符串或 Credential 列表
+        :param cooldown: 首次失败的冷却时间（秒），之后每次连续失败翻倍
+        :param max_cooldown: 最长冷却时间（秒）
+        :param score_alpha: 健康分滑动平均的权重
+        """
+        if not cookies:
+            raise ValueError('cookie 池不能为空')
+        self.cooldown = SpiderConfig.COOKIE_COOLDOWN if cooldown is None else cooldown
+        self.max_cooldown = SpiderConfig.COOKIE_MAX_COOLDOWN if max_cooldown is None else max_cooldown
+        self.score_alpha = score_alpha
+        self._accounts = {}
+        for cookie in cookies:
+            credential = Credential.of(cookie)
+            self._accounts[credential.a1] = AccountState(credential)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def acquire(self) -> Credential:
+        """
+        选择一个账号，所有账号都在冷却时选择最早结束冷却的账号
+        :return: Credential，可直接作为 cookies_str 传给 XHS_Apis 的各个接口
+        """
+        with self._lock:
+            now = time.monotonic()
+            available = [account for account in self._accounts.values() if account.cooldown_until <= now]
+            if available:
+                account = min(available, key=lambda a: (a.in_flight, -round(a.score, 1), a.last_used))
+            else:
+                account = min(self._accounts.values(), key=lambda a: a.cooldown_until)
+            account.last_used = now
+            return account.credential
+
+    def acquire_other(self, a1: str) -> Optional[Credential]:
+        """
+        选择 a1 以外一个不在冷却中的账号，用于账号级错误后换号重试
+        :return: Credential，没有可用的其他账号时返回 None
+        """
+        with self._lock:
+            now = time.monotonic()
+            available = [account for a, account in self._accounts.items() if a != a1 and account.cooldown_until <= now]
+            if not available:
+                return None
+            account = min(available, key=lambda a: (a.in_flight, -round(a.score, 1), a.last_used))
+            account.last_used = now
+            return account.credential
+
+    def is_cooling(self, a1: str) -> bool:
+        account = self._accounts.get(a1)
+        return account is not None and account.cooldown_until > time.monotonic()
+
+    def begin(self, a1: str) -> bool:
+        """
+        记录账号开始一次请求
+        :return: 该账号是否属于本池
+        """
+        with self._lock:
+            account = self._accounts.get(a1)
+            if account is None:
+                return False
+            account.in_flight += 1
+            return True
+
+    def end(self, a1: str, success: bool = None):
+        """
+        记录账号请求结束
+        :param success: 账号是否正常，None 表示与账号无关（如网络错误），只结束计数不计分
+        """
+        with self._lock:
+            account = self._accounts.get(a1)
+            if account is None:
+                return
+            account.in_flight = max(account.in_flight - 1, 0)
+            if success is None:
+                return
+            account.score = (1 - self.score_alpha) * account.score + self.score_alpha * (1.0 if success else 0.0)
+            if success:
+                account.successes += 1
+                account.consecutive_failures = 0
+                return
+            account.failures += 1
+            account.consecutive_failures += 1
+            failures = account.consecutive_failures
+            cooldown = min(self.cooldown * 2 ** (failures - 1), self.max_cooldown)
+            account.cooldown_until = time.monotonic() + cooldown
+        logger.warning(f'账号 {a1[:8]}*** 请求失败，冷却 {cooldown:.0f}s（连续失败 {failures} 次）')
+
+    def stats(self) -> list:
+        with self._lock:
+            now = time.monotonic()
+            return [account.to_dict(now) for account in self._accounts.values()]
+
+
+def read_cookies_list() -> List[str]:
+    """
+    读取账号列表，优先级: XHS_COOKIES_FILE 文件（每行一个，# 开头为注释） > COOKIES_LIST 环境变量（用 || 分隔） > COOKIES
+    """
+    cookies_list = []
+    if SpiderConfig.COOKIES_FILE and os.path.exists(SpiderConfig.COOKIES_FILE):
+        with open(SpiderConfig.COOKIES_FILE, 'r', encoding='utf-8') as f:
+            cookies_list = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    elif os.getenv('COOKIES_LIST'):
+        cookies_list = [cookies.strip() for cookies in os.getenv('COOKIES_LIST').split('||') if cookies.strip()]
+    elif os.getenv('COOKIES'):
+        cookies_list = [os.getenv('COOKIES')]
+    return cookies_list
+
+
+def load_cookie_pool():
+    """从配置加载 cookie 池，没有配置任何账号时返回 None"""
+    cookies_list = read_cookies_list()
+    if not cookies_list:
+        logger.warning('未配置任何账号 cookie')
+        return None
+    logger.info(f'cookie 池已加载，账号数: {len(cookies_list)}')
+    return CookiePool(cookies_list)
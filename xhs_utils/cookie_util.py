@@ -1,6 +1,46 @@
+import functools
+
+
 def trans_cookies(cookies_str):
     if '; ' in cookies_str:
         ck = {i.split('=')[0]: '='.join(i.split('=')[1:]) for i in cookies_str.split('; ')}
     else:
         ck = {i.split('=')[0]: '='.join(i.split('=')[1:]) for i in cookies_str.split(';')}
     return ck
+
+
+class Credential:
+    """
+    解析后的账号凭证，cookie 字符串只在创建时解析一次
+    所有接受 cookies_str 的接口都可以直接传入 Credential
+    """
+
+    def __init__(self, cookies_str: str):
+        """
+        :param cookies_str: 你的cookies
+        """
+        self.cookies_str = cookies_str
+        # 多个请求共用同一个字典，调用方不要修改
+        self.cookies = trans_cookies(cookies_str)
+        self.a1 = self.cookies.get('a1', '')
+
+    @classmethod
+    def of(cls, cookies):
+        """
+        :param cookies: cookie 字符串或 Credential
+        :return: Credential，相同的 cookie 字符串返回同一个对象
+        """
+        if isinstance(cookies, Credential):
+            return cookies
+        return _parse_credential(cookies)
+
+    def __str__(self):
+        return self.cookies_str
+
+    def __repr__(self):
+        return f'Credential(a1={self.a1!r})'
+
+
+@functools.lru_cache(maxsize=64)
+def _parse_credential(cookies_str: str) -> Credential:
+    return Credential(cookies_str)
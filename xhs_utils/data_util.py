@@ -3,9 +3,10 @@ import os
 import re
 import time
 import openpyxl
-import requests
 from loguru import logger
-from retry import retry
+from xhs_utils.config import SpiderConfig
+from xhs_utils.http_util import get_shared_session, get_timeout
+from xhs_utils.retry_policy import get_retry_policy
 
 
 def norm_str(str):
@@ -297,6 +298,37 @@ def handle_note_info(data):
     
     return result
 
+# 笔记列表（user_posted）中已有的字段，只需要这些字段时不必请求笔记详情
+NOTE_LIST_FIELDS = ('note_id', 'note_url', 'note_type', 'user_id', 'home_url', 'nickname', 'avatar', 'title', 'liked_count', 'video_cover')
+
+
+def handle_note_list_item(data):
+    """
+    处理笔记列表中的一条笔记，字段名与 handle_note_info 一致，只包含 NOTE_LIST_FIELDS
+    """
+    note_id = data['note_id']
+    xsec_token = data.get('xsec_token', '')
+    note_url = f'https://www.xiaohongshu.com/explore/{note_id}?xsec_token={xsec_token}&xsec_source=pc_user' if xsec_token else f'https://www.xiaohongshu.com/explore/{note_id}'
+    user = data.get('user', {})
+    user_id = user.get('user_id', '')
+    title = data.get('display_title') or data.get('title') or ''
+    if title.strip() == '':
+        title = '无标题'
+    cover = data.get('cover', {})
+    return {
+        'note_id': note_id,
+        'note_url': note_url,
+        'note_type': '图集' if data.get('type', 'normal') == 'normal' else '视频',
+        'user_id': user_id,
+        'home_url': f'https://www.xiaohongshu.com/user/profile/{user_id}',
+        'nickname': user.get('nickname', user.get('nick_name', '')),
+        'avatar': user.get('avatar', ''),
+        'title': title,
+        'liked_count': data.get('interact_info', {}).get('liked_count', 0),
+        'video_cover': cover.get('url_default') or cover.get('url'),
+    }
+
+
 def handle_comment_info(data):
     note_id = data['note_id']
     note_url = data['note_url']
@@ -357,12 +389,19 @@ def save_to_xlsx(datas, file_path, type='note'):
     logger.info(f'数据保存至 {file_path}')
 
 def download_media(path, name, url, type):
+    """下载图片/视频，网络错误和5xx按 media 重试策略重试"""
+    get_retry_policy('media').call(_download_media, path, name, url, type)
+
+
+def _download_media(path, name, url, type):
     if type == 'image':
-        content = requests.get(url).content
+        res = get_shared_session().get(url, timeout=get_timeout(url, SpiderConfig.MEDIA_READ_TIMEOUT))
+        res.raise_for_status()
         with open(path + '/' + name + '.jpg', mode="wb") as f:
-            f.write(content)
+            f.write(res.content)
     elif type == 'video':
-        res = requests.get(url, stream=True)
+        res = get_shared_session().get(url, stream=True, timeout=get_timeout(url, SpiderConfig.MEDIA_READ_TIMEOUT))
+        res.raise_for_status()
         size = 0
         chunk_size = 1024 * 1024
         with open(path + '/' + name + '.mp4', mode="wb") as f:
@@ -411,7 +450,6 @@ def save_note_detail(note, path):
 
 
 
-@retry(tries=3, delay=1)
 def download_note(note_info, path, save_choice):
     handle_info_dir = os.path.abspath('download_note_info')
     os.makedirs(handle_info_dir, exist_ok=True)
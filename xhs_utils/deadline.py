@@ -0,0 +1,69 @@
+"""
+请求级截止时间
+api_server 在收到请求时设置截止时间，之后同一上下文（线程/协程）内的所有上游请求共享剩余时间，
+到期后不再发出新的请求，翻页接口返回已获取的部分结果
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+_deadline = contextvars.ContextVar('xhs_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """已超过请求截止时间"""
+
+    def __init__(self, msg: str = '已超过请求截止时间'):
+        super().__init__(msg)
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """
+    在 with 代码块内设置截止时间，嵌套时取更早的截止时间
+    :param seconds: 从现在起的秒数，None 表示不限制
+    """
+    if seconds is None:
+        yield
+        return
+    token = set_deadline(seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def set_deadline(seconds: float) -> contextvars.Token:
+    """
+    设置截止时间，返回的 token 用于 reset_deadline 恢复
+    :param seconds: 从现在起的秒数
+    """
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    if current is not None:
+        at = min(at, current)
+    return _deadline.set(at)
+
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """剩余秒数，未设置截止时间时返回 None"""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return max(at - time.monotonic(), 0.0)
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check_deadline():
+    """已超过截止时间时抛出 DeadlineExceeded"""
+    if expired():
+        raise DeadlineExceeded()
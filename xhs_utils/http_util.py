@@ -0,0 +1,87 @@
+"""
+HTTP连接池
+所有接口共用带 keep-alive 的 requests.Session，避免每次请求都重新建立 TCP+TLS 连接
+"""
+import os
+import threading
+import urllib.parse
+from http.cookiejar import DefaultCookiePolicy
+import requests
+from requests.adapters import HTTPAdapter
+from xhs_utils.config import SpiderConfig
+from xhs_utils.deadline import remaining, DeadlineExceeded
+
+
+class BlockAllCookiePolicy(DefaultCookiePolicy):
+    """
+    不保存任何服务端下发的 cookie
+    同一个 session 会被多个账号、多个线程共用，cookie 只能随每次请求显式传入
+    """
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+def create_session(pool_connections: int = None, pool_maxsize: int = None, pool_block: bool = None) -> requests.Session:
+    """
+    创建带连接池的 session
+    :param pool_connections: 缓存连接池的主机数量
+    :param pool_maxsize: 每个主机保持的最大连接数
+    :param pool_block: 连接数达到上限时是否等待空闲连接（否则临时新建连接，用完即关闭）
+    """
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections or SpiderConfig.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=pool_maxsize or SpiderConfig.HTTP_POOL_MAXSIZE,
+        pool_block=SpiderConfig.HTTP_POOL_BLOCK if pool_block is None else pool_block,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.cookies.set_policy(BlockAllCookiePolicy())
+    return session
+
+
+def get_timeout(url: str, read_timeout: float = None) -> tuple:
+    """
+    计算请求的 (连接超时, 读超时)，不会超过当前请求截止时间的剩余时间
+    :param url: 请求地址，按路径前缀匹配 SpiderConfig.ENDPOINT_TIMEOUTS
+    :param read_timeout: 指定读超时，默认取接口配置或 SpiderConfig.HTTP_READ_TIMEOUT
+    """
+    connect, read = SpiderConfig.HTTP_CONNECT_TIMEOUT, SpiderConfig.HTTP_READ_TIMEOUT
+    path = urllib.parse.urlparse(url).path
+    matched = max((prefix for prefix in SpiderConfig.ENDPOINT_TIMEOUTS if path.startswith(prefix)), key=len, default=None)
+    if matched is not None:
+        connect, read = SpiderConfig.ENDPOINT_TIMEOUTS[matched]
+    if read_timeout is not None:
+        read = read_timeout
+    left = remaining()
+    if left is not None:
+        if left <= 0:
+            raise DeadlineExceeded()
+        connect, read = min(connect, left), min(read, left)
+    return connect, read
+
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+
+def get_shared_session() -> requests.Session:
+    """获取进程内共享的 session（单例模式）"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session()
+    return _shared_session
+
+
+def _reset_after_fork():
+    # 子进程不能复用父进程连接池中的 socket
+    global _shared_session, _shared_session_lock
+    _shared_session = None
+    _shared_session_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
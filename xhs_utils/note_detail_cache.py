@@ -0,0 +1,147 @@
+"""
+笔记详情缓存
+按 note_id 保存 handle_note_info 的结果和原始数据，同一篇笔记出现在不同用户的列表或搜索结果中时不再重复请求 feed 接口；
+点赞、收藏等互动数据单独设置更短的有效期，并记住每篇笔记最近一次可用的 xsec_token 及其 xsec_source，之后的请求可以不带 xsec_token
+"""
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from contextlib import nullcontext
+from typing import Optional, Tuple
+from xhs_utils.cache_util import TTLCache
+from xhs_utils.config import SpiderConfig
+from xhs_utils.data_util import handle_note_info
+from xhs_utils.response_cache import is_success, refresh_cache
+from xhs_utils.token_registry import NOTE
+
+# 互动数据字段，有效期为 SpiderConfig.NOTE_DETAIL_COUNTS_TTL
+COUNT_FIELDS = ('liked_count', 'collected_count', 'comment_count', 'share_count')
+
+
+class NoteDetailCache:
+    """笔记详情缓存（线程安全）"""
+
+    def __init__(self, maxsize: int = None, ttl: float = None, counts_ttl: float = None, token_ttl: float = None):
+        """
+        :param maxsize: 最多缓存的笔记数，默认 SpiderConfig.NOTE_DETAIL_CACHE_SIZE
+        :param ttl: 笔记内容的有效期（秒），默认 SpiderConfig.NOTE_DETAIL_CACHE_TTL
+        :param counts_ttl: 互动数据的有效期（秒），默认 SpiderConfig.NOTE_DETAIL_COUNTS_TTL
+        :param token_ttl: xsec_token 的有效期（秒），默认 SpiderConfig.NOTE_TOKEN_TTL
+        """
+        maxsize = maxsize or SpiderConfig.NOTE_DETAIL_CACHE_SIZE
+        self.counts_ttl = SpiderConfig.NOTE_DETAIL_COUNTS_TTL if counts_ttl is None else counts_ttl
+        self._entries = TTLCache(maxsize, SpiderConfig.NOTE_DETAIL_CACHE_TTL if ttl is None else ttl)
+        # token 比详情保留得更久，详情过期后重新获取时仍然可以使用
+        self._tokens = TTLCache(maxsize * 4, SpiderConfig.NOTE_TOKEN_TTL if token_ttl is None else token_ttl)
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, note_id: str, need_counts: bool = True) -> Tuple[Optional[dict], bool]:
+        """
+        :param need_counts: 是否需要互动数据，为 True 时互动数据过期的条目不能直接使用
+        :return: (条目, 是否可以直接使用)，条目为 {'note': handle_note_info 的结果, 'raw': 原始数据, 'fetched_at': 获取时间}，不存在时为 None
+        """
+        entry = self._entries.get(note_id)
+        if entry is None:
+            self._count('misses')
+            return None, False
+        if need_counts and time.time() - entry['fetched_at'] > self.counts_ttl:
+            self._count('stale_counts')
+            return entry, False
+        self._count('hits')
+        return entry, True
+
+    def put(self, note_id: str, raw: dict, note: dict, xsec_token: str = '', xsec_source: str = 'pc_search'):
+        """
+        :param raw: feed 接口返回的原始笔记数据（data.items[0]）
+        :param note: handle_note_info 的结果
+        :param xsec_token: 本次获取成功时使用的 xsec_token
+        :param xsec_source: 与 xsec_token 一起使用的 xsec_source
+        """
+        self._entries.set(note_id, {'note': note, 'raw': raw, 'fetched_at': time.time()})
+        if xsec_token:
+            self.remember_token(note_id, xsec_token, xsec_source)
+
+    def remember_token(self, note_id: str, xsec_token: str, xsec_source: str = 'pc_search'):
+        self._tokens.set(note_id, (xsec_token, xsec_source))
+
+    def token(self, note_id: str) -> Optional[Tuple[str, str]]:
+        """最近一次可用的 (xsec_token, xsec_source)，没有时返回 None"""
+        return self._tokens.get(note_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._tokens.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {'size': len(self._entries), 'tokens': len(self._tokens), **counts}
+
+
+def get_note_detail(xhs_apis, note_url: str, cookies_str, proxies: dict = None, need_counts: bool = True):
+    """
+    获取处理后的笔记详情（handle_note_info 的结果），优先使用笔记详情缓存
+    链接中没有 xsec_token 时依次使用缓存中记住的和 xsec_token 登记表中的 xsec_token
+    :param xhs_apis: XHS_Apis 实例
+    :param need_counts: 是否需要最新的互动数据，不需要时互动数据过期的缓存也可以使用
+    :return: (success, msg, note_info)，note_info 是缓存条目的副本，可以修改
+    """
+    urlParse = urllib.parse.urlparse(note_url)
+    note_id = urlParse.path.rstrip('/').split('/')[-1]
+    # 不做 url 解码，xsec_token 中的 "+"、"=" 原样保留
+    kvDist = dict(kv.split('=', 1) for kv in urlParse.query.split('&') if '=' in kv)
+    xsec_token = kvDist.get('xsec_token', '')
+    xsec_source = kvDist.get('xsec_source', 'pc_search')
+    cache = get_note_detail_cache()
+    entry = None
+    remembered = None
+    if cache is not None:
+        entry, usable = cache.get(note_id, need_counts)
+        if usable:
+            return True, 'success', dict(entry['note'])
+        if not xsec_token:
+            remembered = cache.token(note_id)
+    # 再从 xsec_token 登记表中查找（列表、搜索等响应中记录的）
+    token_registry = getattr(xhs_apis, 'token_registry', None)
+    if not xsec_token and remembered is None and token_registry is not None:
+        row = token_registry.lookup(NOTE, note_id)
+        if row is not None:
+            remembered = row[:2]
+    if remembered is not None:
+        # token 与获取它时的 xsec_source 一起使用
+        xsec_token, xsec_source = remembered
+        note_url = f"https://www.xiaohongshu.com/explore/{note_id}?xsec_token={xsec_token}&xsec_source={xsec_source}"
+    # 内容仍有效只是互动数据过期时，跳过响应缓存直接请求上游
+    with refresh_cache() if entry is not None else nullcontext():
+        result = xhs_apis.get_note_info(note_url, cookies_str, proxies)
+    success, msg, res_json = result
+    if not is_success(result):
+        return False, res_json.get('msg', msg) if isinstance(res_json, dict) else msg, None
+    items = (res_json.get('data') or {}).get('items') or []
+    if not items:
+        return False, '笔记不存在或不可见', None
+    # 响应可能来自缓存，不原地修改
+    note_info = handle_note_info({**items[0], 'url': note_url})
+    if cache is not None:
+        cache.put(note_id, items[0], note_info, xsec_token, xsec_source)
+    return True, 'success', dict(note_info)
+
+
+_note_detail_cache = None
+_note_detail_cache_lock = threading.Lock()
+
+
+def get_note_detail_cache():
+    """获取全局笔记详情缓存（单例模式），SpiderConfig.NOTE_DETAIL_CACHE_SIZE 为 0 时返回 None"""
+    global _note_detail_cache
+    if _note_detail_cache is None and SpiderConfig.NOTE_DETAIL_CACHE_SIZE > 0:
+        with _note_detail_cache_lock:
+            if _note_detail_cache is None:
+                _note_detail_cache = NoteDetailCache()
+    return _note_detail_cache
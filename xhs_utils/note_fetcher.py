@@ -1,124 +1,260 @@
 # xhs_utils/note_fetcher.py（简化版，按照main.py的方式）
 
-from typing import List, Dict, Optional
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional, Tuple
 from loguru import logger
 from apis.xhs_pc_apis import XHS_Apis
-from xhs_utils.data_util import handle_note_info
+from xhs_utils.config import SpiderConfig
+from xhs_utils.cookie_pool import CookiePool
+from xhs_utils.data_util import NOTE_LIST_FIELDS, handle_note_list_item
+from xhs_utils.deadline import expired
+from xhs_utils.note_detail_cache import COUNT_FIELDS, get_note_detail
+from xhs_utils.pipeline import Pipeline, Stage
+from xhs_utils.single_flight import coalesce
+
+# 笔记详情的获取方式: none 只用笔记列表中的字段, lazy 请求的字段不在列表中时才获取详情, full 总是获取详情
+DETAIL_MODES = ('none', 'lazy', 'full')
+
+
+def needs_detail(fields: Optional[List[str]] = None, detail: str = 'lazy') -> bool:
+    """
+    是否需要获取笔记详情
+    :param fields: 需要的字段（handle_note_info 中的字段名），None 表示全部
+    :param detail: none | lazy | full
+    """
+    if detail not in DETAIL_MODES:
+        raise ValueError(f'detail 只能是 {"、".join(DETAIL_MODES)}')
+    if detail != 'lazy':
+        return detail == 'full'
+    return fields is None or any(field not in NOTE_LIST_FIELDS for field in fields)
+
+
+def needs_counts(fields: Optional[List[str]] = None) -> bool:
+    """是否需要最新的互动数据（点赞、收藏、评论、分享数），不需要时笔记详情缓存中互动数据过期的条目也可以使用"""
+    return fields is None or any(field in COUNT_FIELDS for field in fields)
 
 
 class NoteFetcher:
     """笔记获取工具类"""
     
-    def __init__(self, cookies_str: str):
+    def __init__(self, cookies_str, xhs_apis: Optional[XHS_Apis] = None, token_registry=None):
         """
         初始化笔记获取器
-        :param cookies_str: Cookie字符串
+        :param cookies_str: Cookie字符串，或 CookiePool（每个用户从池中选择一个账号）
+        :param xhs_apis: 复用已有的 XHS_Apis 实例，默认新建（共用进程内的连接池）
+        :param token_registry: xhs_utils.token_registry.TokenRegistry，用于查找用户的 xsec_token，默认与 xhs_apis 相同（全局登记表）
         """
         self.cookies_str = cookies_str
-        self.xhs_apis = XHS_Apis()
+        self.cookie_pool = cookies_str if isinstance(cookies_str, CookiePool) else None
+        self.xhs_apis = xhs_apis or XHS_Apis(cookie_pool=self.cookie_pool)
+        self.token_registry = token_registry or getattr(self.xhs_apis, 'token_registry', None)
+    
+    def _pick_cookies(self):
+        """选择本次使用的账号"""
+        if self.cookie_pool is not None:
+            return self.cookie_pool.acquire()
+        return self.cookies_str
     
     def get_users_latest_notes(
         self, 
         user_ids: List[str], 
         max_users: int = 5, 
-        notes_per_user: int = 5
+        notes_per_user: int = 5,
+        fields: Optional[List[str]] = None,
+        detail: str = 'lazy'
     ) -> List[Dict]:
         """
         获取多个用户的最新笔记（按照main.py的简单方式）
         :param user_ids: 用户ID列表
         :param max_users: 最多处理几个用户（默认5个）
         :param notes_per_user: 每个用户获取几条笔记（默认5条）
-        :return: 笔记列表
+        :param fields: 需要的字段，见 fetch_users_notes
+        :param detail: 笔记详情的获取方式，见 fetch_users_notes
+        :return: 笔记列表，超过请求截止时间时返回已获取的部分
         """
-        all_notes = []
-        processed_users = 0
+        all_notes, _ = self.fetch_users_notes(user_ids, max_users, notes_per_user, fields, detail)
+        return all_notes
+    
+    def fetch_users_notes(
+        self, 
+        user_ids: List[str], 
+        max_users: int = 5, 
+        notes_per_user: int = 5,
+        fields: Optional[List[str]] = None,
+        detail: str = 'lazy'
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        并发获取多个用户的最新笔记，同时处理的用户数为 SpiderConfig.FETCH_USER_CONCURRENCY
+        某个用户失败时依次补上 user_ids 中后面的用户，直到成功 max_users 个或没有更多用户
+        :param user_ids: 用户ID列表
+        :param max_users: 最多处理几个用户（默认5个）
+        :param notes_per_user: 每个用户获取几条笔记（默认5条）
+        :param fields: 需要的字段（handle_note_info 中的字段名），None 表示全部
+        :param detail: none 只用笔记列表（每个用户只需要列表请求），lazy（默认）fields 中有列表没有的字段时才获取详情，full 总是获取详情
+        :return: (笔记列表, 每个用户的结果)，笔记按 user_ids 的顺序、每个用户内按发布时间从新到旧排列，
+                 每个用户的结果为 {'user_id', 'success', 'msg', 'count'}；超过请求截止时间时返回已获取的部分
+        """
+        need_detail = needs_detail(fields, detail)
+        need_counts = needs_counts(fields)
         
-        for user_id in user_ids:
-            if processed_users >= max_users:
-                break
+        # 预先为每个用户分配账号，使用 cookie 池时请求分散到多个账号
+        user_cookies = {user_id: self._pick_cookies() for user_id in user_ids[:max_users]}
+        
+        # 所有用户笔记列表的第一页参数（包括页大小、登记表中的 xsec_token）都已知，按账号一次性预签名
+        presign_groups = {}
+        for user_id, cookies in user_cookies.items():
+            _, kvDist = XHS_Apis._parse_url(self._build_user_url(user_id))
+            presign_groups.setdefault(cookies, []).append((user_id, kvDist.get('xsec_token', ''), kvDist.get('xsec_source', 'pc_search')))
+        for cookies, users in presign_groups.items():
+            self.xhs_apis.presign_user_note_info(users, cookies, notes_per_user)
+        
+        results = {}  # user_ids 中的位置 -> (success, msg, 笔记列表)
+        pending = {}
+        next_index = 0
+        with ThreadPoolExecutor(max_workers=max(min(SpiderConfig.FETCH_USER_CONCURRENCY, max_users), 1)) as executor:
+            def submit():
+                nonlocal next_index
+                user_id = user_ids[next_index]
+                # 每个任务使用当前上下文的副本，请求截止时间对所有线程生效
+                future = executor.submit(contextvars.copy_context().run, self._fetch_user, user_id, notes_per_user, user_cookies.get(user_id), need_detail, need_counts)
+                pending[future] = next_index
+                next_index += 1
             
-            try:
-                logger.info(f"正在获取用户 {user_id} 的最新 {notes_per_user} 条笔记...")
-                
-                # 构建用户URL（按照main.py的方式）
-                user_url = f"https://www.xiaohongshu.com/user/profile/{user_id}"
-                
-                # 获取用户所有笔记（按照main.py的方式）
-                success, msg, all_note_info = self.xhs_apis.get_user_all_notes(
-                    user_url, self.cookies_str
-                )
-                
-                if success:
-                    logger.info(f'用户 {user_id} 作品数量: {len(all_note_info)}')
-                    
-                    # 限制数量（取最新的notes_per_user条）
-                    latest_notes = all_note_info[:notes_per_user]
-                    
-                    # 按照main.py的方式遍历笔记
-                    for simple_note_info in latest_notes:
-                        try:
-                            note_id = simple_note_info.get('note_id', '')
-                            xsec_token = simple_note_info.get('xsec_token', '')
-                            
-                            if note_id:
-                                # 构建笔记URL（按照main.py的方式）
-                                note_url = f"https://www.xiaohongshu.com/explore/{note_id}?xsec_token={xsec_token}&xsec_source=pc_user" if xsec_token else f"https://www.xiaohongshu.com/explore/{note_id}"
-                                
-                                # 获取笔记详细信息（可选，如果需要详细信息）
-                                note_detail = self._get_note_detail(note_url)
-                                if note_detail:
-                                    note_detail['user_id'] = user_id
-                                    all_notes.append(note_detail)
-                                else:
-                                    # 如果获取详情失败，至少返回基本信息
-                                    all_notes.append({
-                                        'note_id': note_id,
-                                        'title': simple_note_info.get('display_title', simple_note_info.get('title', '无标题')),
-                                        'desc': simple_note_info.get('desc', ''),
-                                        'note_type': simple_note_info.get('type', 'normal'),
-                                        'user_id': user_id,
-                                        'xsec_token': xsec_token,
-                                        'url': note_url
-                                    })
-                        except Exception as e:
-                            logger.warning(f'处理笔记时出错: {e}')
-                            continue
-                    
-                    logger.info(f"✅ 用户 {user_id} 成功获取 {len(latest_notes)} 条笔记")
-                    processed_users += 1
-                else:
-                    logger.warning(f"⚠️ 获取用户 {user_id} 的笔记失败: {msg}")
-                    
-            except Exception as e:
-                logger.error(f"❌ 处理用户 {user_id} 时出错: {e}", exc_info=True)
-                continue
+            while next_index < len(user_ids) and len(pending) < max_users:
+                submit()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[pending.pop(future)] = future.result()
+                succeeded = sum(1 for success, _, _ in results.values() if success)
+                while next_index < len(user_ids) and succeeded + len(pending) < max_users:
+                    if expired():
+                        logger.warning("⏱️ 已超过请求截止时间，跳过剩余用户")
+                        break
+                    submit()
         
+        all_notes = []
+        user_results = []
+        for index in sorted(results):
+            success, msg, user_notes = results[index]
+            all_notes.extend(user_notes)
+            user_results.append({'user_id': user_ids[index], 'success': success, 'msg': msg, 'count': len(user_notes)})
+        processed_users = sum(1 for result in user_results if result['success'])
         logger.info(f"📝 共获取到 {len(all_notes)} 条笔记（来自 {processed_users} 个用户）")
-        return all_notes
+        return all_notes, user_results
+    
+    def _fetch_user(self, user_id: str, notes_per_user: int, cookies=None, need_detail: bool = True, need_counts: bool = True):
+        """
+        获取单个用户的笔记，不抛出异常
+        :return: (success, msg, 笔记列表)
+        """
+        # 预分配的账号已进入冷却时改用其他账号
+        if cookies is None or (self.cookie_pool is not None and self.cookie_pool.is_cooling(cookies.a1)):
+            cookies = self._pick_cookies()
+        try:
+            logger.info(f"正在获取用户 {user_id} 的最新 {notes_per_user} 条笔记...")
+            # 其他请求正在获取同一用户时直接共享它的结果
+            success, msg, user_notes = self._get_user_latest_notes(user_id, notes_per_user, cookies, need_detail, need_counts)
+            if success:
+                logger.info(f"✅ 用户 {user_id} 成功获取 {len(user_notes)} 条笔记")
+            else:
+                logger.warning(f"⚠️ 获取用户 {user_id} 的笔记失败: {msg}")
+            return success, msg, user_notes
+        except Exception as e:
+            logger.error(f"❌ 处理用户 {user_id} 时出错: {e}", exc_info=True)
+            return False, str(e), []
+    
+    @coalesce('user_id', 'notes_per_user', 'need_detail', 'need_counts', empty=list)
+    def _get_user_latest_notes(self, user_id: str, notes_per_user: int, cookies, need_detail: bool = True, need_counts: bool = True):
+        """
+        获取单个用户的最新笔记及详情
+        :param need_detail: 为 False 时只使用笔记列表中的字段，不请求详情
+        :param need_counts: 为 False 时笔记详情缓存中互动数据过期的条目也可以使用
+        :return: (success, msg, 笔记列表)
+        """
+        # 构建用户URL（按照main.py的方式），登记表中有该用户的 xsec_token 时带上
+        user_url = self._build_user_url(user_id)
+        
+        # 列表翻页与详情获取同时进行：每拿到一页就开始获取这一页的详情，凑够notes_per_user条后不再翻页
+        def stubs():
+            for notes, _ in self.xhs_apis.iter_user_notes(user_url, cookies, limit=notes_per_user):
+                if need_detail:
+                    # 这一页笔记的详情请求一次性预签名
+                    self.xhs_apis.presign_note_info(
+                        [self._build_note_url(note.get('note_id', ''), note.get('xsec_token', '')) for note in notes if note.get('note_id')],
+                        cookies
+                    )
+                yield from notes
+        
+        if need_detail:
+            stage = Stage('detail', lambda simple_note_info: self._build_note(user_id, simple_note_info, cookies, need_counts), SpiderConfig.FETCH_DETAIL_CONCURRENCY)
+        else:
+            stage = Stage('list', lambda simple_note_info: self._list_note(user_id, simple_note_info))
+        pipeline = Pipeline([stage])
+        success, msg, user_notes = pipeline.run(stubs())
+        
+        # 超过截止时间时翻页会中断，已获取的部分仍然可用
+        if not (success or (expired() and user_notes)):
+            return False, msg, []
+        logger.info(f'用户 {user_id} 获取到 {len(user_notes)} 条最新笔记')
+        return True, 'success', user_notes
+    
+    def _build_note(self, user_id: str, simple_note_info: Dict, cookies, need_counts: bool = True) -> Optional[Dict]:
+        """获取一条笔记的详情，失败时返回列表中的基本信息"""
+        try:
+            note_id = simple_note_info.get('note_id', '')
+            xsec_token = simple_note_info.get('xsec_token', '')
+            
+            if note_id:
+                # 构建笔记URL（按照main.py的方式）
+                note_url = self._build_note_url(note_id, xsec_token)
+                
+                # 获取笔记详细信息（可选，如果需要详细信息）
+                note_detail = self._get_note_detail(note_url, cookies, need_counts)
+                if note_detail:
+                    note_detail['user_id'] = user_id
+                    return note_detail
+                # 如果获取详情失败，至少返回列表中的基本信息
+                return self._list_note(user_id, simple_note_info)
+        except Exception as e:
+            logger.warning(f'处理笔记时出错: {e}')
+        return None
+    
+    def _list_note(self, user_id: str, simple_note_info: Dict) -> Optional[Dict]:
+        """只使用笔记列表中的字段"""
+        if not simple_note_info.get('note_id'):
+            return None
+        return {**handle_note_list_item(simple_note_info), 'user_id': user_id}
     
     def _build_user_url(self, user_id: str) -> str:
-        """构建用户URL"""
+        """构建用户URL，xsec_token 登记表中有该用户时返回带 xsec_token 的URL"""
         # 如果已经是完整URL，直接返回
         if user_id.startswith('http'):
             return user_id
         
+        if self.token_registry is not None:
+            user_url = self.token_registry.user_url(user_id)
+            if user_url:
+                return user_url
+        
         # 否则构建URL（按照main.py的方式）
         return f"https://www.xiaohongshu.com/user/profile/{user_id}"
     
-    def _get_note_detail(self, note_url: str) -> Optional[Dict]:
-        """获取笔记详细信息（可选，如果不需要详细信息可以跳过）"""
+    def _build_note_url(self, note_id: str, xsec_token: str) -> str:
+        """构建笔记URL"""
+        if xsec_token:
+            return f"https://www.xiaohongshu.com/explore/{note_id}?xsec_token={xsec_token}&xsec_source=pc_user"
+        return f"https://www.xiaohongshu.com/explore/{note_id}"
+    
+    def _get_note_detail(self, note_url: str, cookies=None, need_counts: bool = True) -> Optional[Dict]:
+        """获取笔记详细信息（可选，如果不需要详细信息可以跳过），优先使用笔记详情缓存"""
         try:
-            success, msg, note_info = self.xhs_apis.get_note_info(
-                note_url, self.cookies_str
+            success, msg, note_info = get_note_detail(
+                self.xhs_apis, note_url, cookies or self._pick_cookies(), need_counts=need_counts
             )
-            
-            if success and note_info:
-                items = note_info.get('data', {}).get('items', [])
-                if items and len(items) > 0:
-                    note_data = items[0]
-                    note_data['url'] = note_url
-                    handled_note = handle_note_info(note_data)
-                    return handled_note
+            if success:
+                return note_info
         except Exception as e:
             logger.debug(f"获取笔记详情失败（可选）: {e}")
         
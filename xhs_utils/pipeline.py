@@ -0,0 +1,123 @@
+"""
+分阶段流水线
+列表翻页 -> 笔记详情 -> 保存/下载 等阶段各自使用独立的线程数，阶段之间用有界队列连接：
+上游一拿到条目下游就开始处理，下游处理不过来时上游在队列上等待（背压），内存占用与抓取规模无关
+"""
+import contextvars
+import queue
+import threading
+from collections import defaultdict
+from typing import Callable, Iterable, List
+from loguru import logger
+from xhs_utils.config import SpiderConfig
+
+_DONE = object()
+
+
+class Stage:
+    """流水线的一个阶段"""
+
+    def __init__(self, name: str, fn: Callable, workers: int = 1, queue_size: int = None):
+        """
+        :param name: 阶段名称，用于日志和统计
+        :param fn: 处理单个条目的函数，返回 None 表示丢弃该条目，抛出异常时记为失败并继续处理后面的条目
+        :param workers: 线程数
+        :param queue_size: 本阶段输入队列的容量，默认 SpiderConfig.PIPELINE_QUEUE_SIZE
+        """
+        self.name = name
+        self.fn = fn
+        self.workers = max(workers, 1)
+        self.queue_size = queue_size or SpiderConfig.PIPELINE_QUEUE_SIZE
+
+
+class Pipeline:
+    """由多个 Stage 组成的流水线，每次 run 使用新的线程和队列"""
+
+    def __init__(self, stages: List[Stage], keep_results: bool = True):
+        """
+        :param stages: 按顺序执行的阶段
+        :param keep_results: 是否保留最后一个阶段的输出，只关心副作用（如下载）时设为 False
+        """
+        if not stages:
+            raise ValueError('流水线至少需要一个阶段')
+        self.stages = stages
+        self.keep_results = keep_results
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, stage: str, name: str):
+        with self._lock:
+            self._counts[stage][name] += 1
+
+    def run(self, source: Iterable):
+        """
+        :param source: 输入条目的可迭代对象（通常是翻页生成器），在单独的线程中迭代
+        :return: (success, msg, 最后一个阶段的输出列表)，输出按输入顺序排列；source 迭代出错时 success 为 False，已处理的条目仍会返回
+        """
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        active = [stage.workers for stage in self.stages]
+        results = {}
+        source_error = []
+
+        def feed():
+            try:
+                for index, item in enumerate(source):
+                    self._count('source', 'items')
+                    queues[0].put((index, item))
+            except Exception as e:
+                source_error.append(e)
+                logger.warning(f'流水线输入出错: {e}')
+            finally:
+                for _ in range(self.stages[0].workers):
+                    queues[0].put(_DONE)
+
+        def work(i: int):
+            stage = self.stages[i]
+            while True:
+                task = queues[i].get()
+                if task is _DONE:
+                    break
+                index, item = task
+                try:
+                    output = stage.fn(item)
+                except Exception as e:
+                    self._count(stage.name, 'failed')
+                    logger.warning(f'流水线阶段 {stage.name} 处理失败: {e}')
+                    continue
+                if output is None:
+                    self._count(stage.name, 'dropped')
+                    continue
+                self._count(stage.name, 'done')
+                if i + 1 < len(self.stages):
+                    queues[i + 1].put((index, output))
+                elif self.keep_results:
+                    with self._lock:
+                        results[index] = output
+            # 本阶段的最后一个线程结束后通知下一阶段
+            with self._lock:
+                active[i] -= 1
+                last = active[i] == 0
+            if last and i + 1 < len(self.stages):
+                for _ in range(self.stages[i + 1].workers):
+                    queues[i + 1].put(_DONE)
+
+        # 每个线程使用当前上下文的副本，请求截止时间对所有阶段生效
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(feed,), name='pipeline-source', daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads.extend(
+                threading.Thread(target=contextvars.copy_context().run, args=(work, i), name=f'pipeline-{stage.name}-{n}', daemon=True)
+                for n in range(stage.workers)
+            )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        outputs = [results[index] for index in sorted(results)]
+        if source_error:
+            return False, str(source_error[0]), outputs
+        return True, 'success', outputs
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {stage: dict(counts) for stage, counts in self._counts.items()}
@@ -0,0 +1,133 @@
+"""
+令牌桶限流
+按账号（cookie 中的 a1）和接口类别分别限速，避免请求过快触发风控
+令牌在锁内预留、在锁外等待，同一个限流器可以同时被多线程和 asyncio 使用
+"""
+import asyncio
+import threading
+import time
+from collections import defaultdict
+from xhs_utils.config import SpiderConfig
+from xhs_utils.deadline import remaining, DeadlineExceeded
+
+# 接口路径前缀 -> 接口类别，未匹配的归入 other
+ENDPOINT_FAMILIES = [
+    ('/api/sns/web/v1/search/', 'search'),
+    ('/api/sns/web/v1/user_posted', 'user_posted'),
+    ('/api/sns/web/v1/feed', 'feed'),
+    ('/api/sns/web/v2/comment/', 'comment'),
+]
+
+
+def endpoint_family(path: str) -> str:
+    for prefix, family in ENDPOINT_FAMILIES:
+        if path.startswith(prefix):
+            return family
+    return 'other'
+
+
+class TokenBucket:
+    """令牌桶，rate 为每秒补充的令牌数，burst 为桶容量"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1, max_wait: float = None):
+        """
+        预留令牌（令牌数可以为负，表示已被后续请求预订）
+        :param max_wait: 最多愿意等待的秒数，需要等待更久时不预留令牌，None 表示不限
+        :return: 需要等待的秒数，超过 max_wait 时返回 None
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            wait = max(tokens - self._tokens, 0) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self._tokens -= tokens
+            return wait
+
+
+class RateLimiter:
+    """按 (a1, 接口类别) 分桶的限流器"""
+
+    def __init__(self, limits: dict = None):
+        """
+        :param limits: {接口类别: [每秒请求数, 突发数量]}，默认使用 SpiderConfig.RATE_LIMITS
+        """
+        self.limits = limits or SpiderConfig.RATE_LIMITS
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._wait_seconds = defaultdict(float)
+        self._wait_count = defaultdict(int)
+        self._request_count = defaultdict(int)
+
+    def _bucket(self, a1: str, family: str) -> TokenBucket:
+        key = (a1, family)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._lock:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    rate, burst = self.limits.get(family, self.limits['other'])
+                    bucket = self._buckets[key] = TokenBucket(rate, burst)
+        return bucket
+
+    def _reserve(self, a1: str, path: str) -> float:
+        family = endpoint_family(path)
+        # 等不到令牌的请求不会发出，不占用令牌
+        wait = self._bucket(a1, family).reserve(max_wait=remaining())
+        if wait is None:
+            raise DeadlineExceeded('限流等待超过请求剩余时间')
+        with self._lock:
+            self._request_count[family] += 1
+            if wait > 0:
+                self._wait_count[family] += 1
+                self._wait_seconds[family] += wait
+        return wait
+
+    def acquire(self, a1: str, path: str):
+        """
+        阻塞直到允许发出请求
+        :param a1: cookies 中的 a1
+        :param path: 接口路径
+        """
+        wait = self._reserve(a1, path)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, a1: str, path: str):
+        """acquire 的异步版本，等待期间不阻塞事件循环"""
+        wait = self._reserve(a1, path)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                family: {
+                    'requests': self._request_count[family],
+                    'waits': self._wait_count[family],
+                    'wait_seconds': round(self._wait_seconds[family], 3),
+                }
+                for family in self._request_count
+            }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """获取全局限流器（单例模式），SpiderConfig.RATE_LIMIT_ENABLED 为 False 时返回 None"""
+    global _rate_limiter
+    if _rate_limiter is None and SpiderConfig.RATE_LIMIT_ENABLED:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+    return _rate_limiter
@@ -0,0 +1,141 @@
+"""
+原始响应持久化存储
+把接口返回的原始 json 压缩后按 (接口类别, 对象id, 获取时间) 保存到 SQLite（WAL 模式），
+重启后仍可作为缓存使用，也可以不访问上游直接回放，用 handle_note_info 等重新处理
+"""
+import functools
+import inspect
+import json
+import threading
+import time
+import zlib
+from typing import Iterator, Optional, Tuple
+from loguru import logger
+from xhs_utils.config import SpiderConfig
+from xhs_utils.response_cache import is_refreshing, is_success
+from xhs_utils.single_flight import call_key
+from xhs_utils.sqlite_util import SQLiteDB
+
+
+class RawStore:
+    """原始响应存储（线程安全，多个进程可以共用同一个文件）"""
+
+    def __init__(self, path: str = None):
+        """
+        :param path: 数据库文件路径，默认 SpiderConfig.RAW_STORE_PATH
+        """
+        self.path = path or SpiderConfig.RAW_STORE_PATH
+        self._db = SQLiteDB(self.path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS raw_responses (endpoint TEXT, object_id TEXT, fetched_at REAL, body BLOB, PRIMARY KEY (endpoint, object_id, fetched_at))')
+
+    @staticmethod
+    def _encode(data) -> bytes:
+        return zlib.compress(json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @staticmethod
+    def _decode(body: bytes):
+        return json.loads(zlib.decompress(body).decode('utf-8'))
+
+    def put(self, endpoint: str, object_id: str, data, fetched_at: float = None):
+        """
+        保存一次响应，同一对象的多次获取会保留多个版本
+        :param endpoint: 接口类别，如 note、user、user_posted、search
+        :param object_id: 对象id，如 note_id、user_id
+        :param fetched_at: 获取时间（时间戳），默认当前时间
+        """
+        self._db.execute(
+            'INSERT OR REPLACE INTO raw_responses (endpoint, object_id, fetched_at, body) VALUES (?, ?, ?, ?)',
+            (endpoint, object_id, fetched_at or time.time(), self._encode(data)),
+        )
+
+    def latest(self, endpoint: str, object_id: str, max_age: float = None) -> Optional[Tuple[float, object]]:
+        """
+        获取对象最新的一次响应
+        :param max_age: 只返回不超过该秒数的响应，None 表示不限
+        :return: (获取时间, 响应)，没有时返回 None
+        """
+        row = self._db.execute(
+            'SELECT fetched_at, body FROM raw_responses WHERE endpoint = ? AND object_id = ? AND fetched_at > ? ORDER BY fetched_at DESC LIMIT 1',
+            (endpoint, object_id, time.time() - max_age if max_age else 0),
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], self._decode(row[1])
+
+    def iter_latest(self, endpoint: str, since: float = None) -> Iterator[Tuple[str, float, object]]:
+        """
+        遍历某个接口类别下每个对象最新的一次响应，用于回放
+        :param since: 只遍历该时间（时间戳）之后获取的响应
+        :return: (对象id, 获取时间, 响应) 的迭代器
+        """
+        rows = self._db.execute(
+            'SELECT object_id, MAX(fetched_at), body FROM raw_responses WHERE endpoint = ? AND fetched_at >= ? GROUP BY object_id ORDER BY MAX(fetched_at)',
+            (endpoint, since or 0),
+        )
+        for object_id, fetched_at, body in rows:
+            yield object_id, fetched_at, self._decode(body)
+
+    def count(self, endpoint: str = None) -> int:
+        if endpoint is None:
+            return self._db.execute('SELECT COUNT(*) FROM raw_responses').fetchone()[0]
+        return self._db.execute('SELECT COUNT(*) FROM raw_responses WHERE endpoint = ?', (endpoint,)).fetchone()[0]
+
+    def prune(self, keep: int = 1):
+        """每个对象只保留最新的 keep 个版本"""
+        self._db.execute(
+            'DELETE FROM raw_responses WHERE rowid IN (SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER (PARTITION BY endpoint, object_id ORDER BY fetched_at DESC) AS n FROM raw_responses) WHERE n > ?)',
+            (keep,),
+        )
+
+
+def _object_id(values: tuple) -> str:
+    if len(values) == 1:
+        return str(values[0])
+    return json.dumps(values, ensure_ascii=False)
+
+
+def stored(endpoint: str, *arg_names, policy: str = None):
+    """
+    装饰 XHS_Apis 中返回 (success, msg, data) 的方法：self.raw_store 中有足够新的响应时直接返回，否则请求上游并写入
+    “足够新”沿用 SpiderConfig.RESPONSE_CACHE_POLICIES 中的 ttl，ttl 为 0 或处于 refresh_cache() 中时只写不读
+    :param endpoint: 存储中的接口类别
+    :param arg_names: 组成对象id的参数名（链接按其中的 id 归一）
+    :param policy: 使用的缓存策略，默认与 endpoint 相同
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            raw_store = getattr(self, 'raw_store', None)
+            if raw_store is None:
+                return fn(self, *args, **kwargs)
+            object_id = _object_id(call_key(fn, signature, arg_names, (self,) + args, kwargs)[1:])
+            max_age = (SpiderConfig.RESPONSE_CACHE_POLICIES.get(policy or endpoint) or {}).get('ttl', 0)
+            if max_age and not is_refreshing():
+                item = raw_store.latest(endpoint, object_id, max_age)
+                if item is not None:
+                    return True, 'success', item[1]
+            result = fn(self, *args, **kwargs)
+            if is_success(result):
+                try:
+                    raw_store.put(endpoint, object_id, result[2])
+                except Exception as e:
+                    logger.warning(f'保存原始响应失败: {e}')
+            return result
+        return wrapper
+    return decorator
+
+
+_raw_store = None
+_raw_store_lock = threading.Lock()
+
+
+def get_raw_store():
+    """获取全局原始响应存储（单例模式），SpiderConfig.RAW_STORE_ENABLED 为 False 时返回 None"""
+    global _raw_store
+    if _raw_store is None and SpiderConfig.RAW_STORE_ENABLED:
+        with _raw_store_lock:
+            if _raw_store is None:
+                _raw_store = RawStore()
+    return _raw_store
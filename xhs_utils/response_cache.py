@@ -0,0 +1,308 @@
+"""
+接口响应缓存
+按接口类别设置有效期（笔记详情数小时、搜索数分钟），过期后在 stale 时间内仍先返回旧结果，同时在后台刷新（stale-while-revalidate）
+后端可选进程内 LRU（memory）或多个 worker 进程共享的 SQLite 文件（sqlite）
+"""
+import asyncio
+import contextvars
+import copy
+import functools
+import inspect
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from xhs_utils.cache_util import TTLCache
+from xhs_utils.config import SpiderConfig
+from xhs_utils.single_flight import call_key
+from xhs_utils.sqlite_util import SQLiteDB
+
+
+_refreshing = contextvars.ContextVar('xhs_cache_refreshing', default=False)
+
+
+@contextmanager
+def refresh_cache():
+    """在 with 代码块内跳过响应缓存和原始响应存储的读取，直接请求上游并写入新结果"""
+    token = _refreshing.set(True)
+    try:
+        yield
+    finally:
+        _refreshing.reset(token)
+
+
+def is_refreshing() -> bool:
+    return _refreshing.get()
+
+
+def is_success(result: tuple) -> bool:
+    """(success, msg, data) 是否为可以保存的成功结果"""
+    success, _, data = result
+    # 部分接口（如 get_note_info）的 success 不反映返回体中的业务错误，这里一并检查
+    return bool(success) and not (isinstance(data, dict) and data.get('success') is False)
+
+
+class MemoryCacheBackend:
+    """进程内 LRU 后端，读写时都复制一份，调用方修改返回值不会影响缓存"""
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize, 0)
+
+    def get(self, key: str):
+        """:return: (写入时间, 值)，不存在或已完全过期时返回 None"""
+        item = self._cache.get(key)
+        return None if item is None else (item[0], copy.deepcopy(item[1]))
+
+    def set(self, key: str, value, stored_at: float, ttl: float):
+        """:param ttl: 条目保留时间（有效期 + stale 时间）"""
+        self._cache.set(key, (stored_at, copy.deepcopy(value)), ttl)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class SQLiteCacheBackend:
+    """SQLite 后端，WAL 模式下多个进程可以同时读写同一个文件"""
+
+    def __init__(self, path: str, maxsize: int, evict_every: int = None):
+        """
+        :param path: 数据库文件路径
+        :param maxsize: 最大条目数，超过时淘汰最久未访问的条目
+        :param evict_every: 每写入多少次检查一次容量，默认 SpiderConfig.RESPONSE_CACHE_EVICT_EVERY；两次检查之间条目数可能短暂超过 maxsize
+        """
+        self.maxsize = maxsize
+        self.evict_every = max(evict_every or SpiderConfig.RESPONSE_CACHE_EVICT_EVERY, 1)
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._db = SQLiteDB(path)
+        self._execute('CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, value TEXT, stored_at REAL, expire_at REAL, accessed_at REAL)')
+        self._execute('CREATE INDEX IF NOT EXISTS response_cache_accessed_at ON response_cache (accessed_at)')
+
+    def _execute(self, sql: str, params: tuple = ()):
+        return self._db.execute(sql, params)
+
+    def get(self, key: str):
+        now = time.time()
+        row = self._execute('SELECT value, stored_at FROM response_cache WHERE key = ? AND expire_at > ?', (key, now)).fetchone()
+        if row is None:
+            return None
+        self._execute('UPDATE response_cache SET accessed_at = ? WHERE key = ?', (now, key))
+        return row[1], json.loads(row[0])
+
+    def set(self, key: str, value, stored_at: float, ttl: float):
+        now = time.time()
+        self._execute(
+            'INSERT OR REPLACE INTO response_cache (key, value, stored_at, expire_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+            (key, json.dumps(value, ensure_ascii=False), stored_at, now + ttl, now),
+        )
+        # COUNT(*) 需要扫描整张表，不在每次写入时执行
+        with self._writes_lock:
+            self._writes += 1
+            if self._writes % self.evict_every:
+                return
+        if len(self) > self.maxsize:
+            self._execute('DELETE FROM response_cache WHERE expire_at <= ?', (now,))
+            self._execute(
+                'DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache ORDER BY accessed_at LIMIT MAX((SELECT COUNT(*) FROM response_cache) - ?, 0))',
+                (self.maxsize,),
+            )
+
+    def clear(self):
+        self._execute('DELETE FROM response_cache')
+
+    def __len__(self):
+        return self._execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+class ResponseCache:
+    """按接口类别设置有效期的响应缓存"""
+
+    def __init__(self, backend, policies: dict = None):
+        """
+        :param backend: MemoryCacheBackend 或 SQLiteCacheBackend
+        :param policies: {接口类别: {'ttl': 有效期（秒）, 'stale': 过期后仍可返回旧结果的时间（秒）}}，默认使用 SpiderConfig.RESPONSE_CACHE_POLICIES
+        """
+        self.backend = backend
+        self.policies = policies or SpiderConfig.RESPONSE_CACHE_POLICIES
+        self._executor = None
+        self._refreshing = set()
+        # 异步刷新任务的引用，避免任务在完成前被回收
+        self._tasks = set()
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, endpoint: str, name: str):
+        with self._lock:
+            self._counts[endpoint][name] += 1
+
+    def get_or_fetch(self, endpoint: str, key: str, fetch):
+        """
+        :param endpoint: 接口类别，对应 policies 中的配置，未配置或 ttl 为 0 时不缓存
+        :param fetch: 无参函数，返回 (success, msg, data)，只缓存成功的结果
+        :return: (success, msg, data)
+        """
+        policy = self.policies.get(endpoint)
+        if not policy or not policy.get('ttl'):
+            return fetch()
+        ttl, stale = policy['ttl'], policy.get('stale', 0)
+        if is_refreshing():
+            self._count(endpoint, 'bypasses')
+            return self._fetch_and_store(key, fetch, ttl + stale)
+        item = self.backend.get(key)
+        if item is not None:
+            stored_at, value = item
+            if time.time() - stored_at < ttl:
+                self._count(endpoint, 'hits')
+                return tuple(value)
+            self._count(endpoint, 'stale_hits')
+            self._refresh(endpoint, key, fetch, ttl + stale)
+            return tuple(value)
+        self._count(endpoint, 'misses')
+        return self._fetch_and_store(key, fetch, ttl + stale)
+
+    async def get_or_fetch_async(self, endpoint: str, key: str, fetch):
+        """
+        get_or_fetch 的异步版本，过期条目在事件循环中的后台任务里刷新
+        :param fetch: 无参协程函数，返回 (success, msg, data)
+        """
+        policy = self.policies.get(endpoint)
+        if not policy or not policy.get('ttl'):
+            return await fetch()
+        ttl, stale = policy['ttl'], policy.get('stale', 0)
+        if is_refreshing():
+            self._count(endpoint, 'bypasses')
+            return self._store(key, await fetch(), ttl + stale)
+        item = self.backend.get(key)
+        if item is not None:
+            stored_at, value = item
+            if time.time() - stored_at < ttl:
+                self._count(endpoint, 'hits')
+                return tuple(value)
+            self._count(endpoint, 'stale_hits')
+            self._refresh_async(endpoint, key, fetch, ttl + stale)
+            return tuple(value)
+        self._count(endpoint, 'misses')
+        return self._store(key, await fetch(), ttl + stale)
+
+    def _fetch_and_store(self, key: str, fetch, keep: float):
+        return self._store(key, fetch(), keep)
+
+    def _store(self, key: str, result: tuple, keep: float):
+        if is_success(result):
+            try:
+                self.backend.set(key, list(result), time.time(), keep)
+            except Exception as e:
+                logger.warning(f'写入响应缓存失败: {e}')
+        return result
+
+    def _start_refresh(self, key: str) -> bool:
+        """同一条目同时只刷新一次，已在刷新时返回 False"""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _finish_refresh(self, endpoint: str, key: str, result: tuple = None, error: Exception = None):
+        if error is not None:
+            self._count(endpoint, 'refresh_failures')
+            logger.warning(f'后台刷新缓存失败: {error}')
+        elif not result[0]:
+            self._count(endpoint, 'refresh_failures')
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def _refresh(self, endpoint: str, key: str, fetch, keep: float):
+        """在后台刷新过期条目，同一条目同时只刷新一次"""
+        if not self._start_refresh(key):
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=SpiderConfig.RESPONSE_CACHE_REFRESH_WORKERS, thread_name_prefix='cache-refresh')
+
+        def refresh():
+            try:
+                result = self._fetch_and_store(key, fetch, keep)
+            except Exception as e:
+                self._finish_refresh(endpoint, key, error=e)
+            else:
+                self._finish_refresh(endpoint, key, result)
+        self._executor.submit(refresh)
+
+    def _refresh_async(self, endpoint: str, key: str, fetch, keep: float):
+        """_refresh 的异步版本，在当前事件循环中创建后台任务"""
+        if not self._start_refresh(key):
+            return
+
+        async def refresh():
+            try:
+                result = self._store(key, await fetch(), keep)
+            except Exception as e:
+                self._finish_refresh(endpoint, key, error=e)
+            else:
+                self._finish_refresh(endpoint, key, result)
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {endpoint: dict(counts) for endpoint, counts in self._counts.items()}
+        return {'size': len(self.backend), 'endpoints': stats}
+
+
+def cached(endpoint: str, *arg_names):
+    """
+    装饰返回 (success, msg, data) 的方法（也可以是协程方法），按接口类别的有效期缓存成功的结果
+    :param endpoint: 接口类别，对应 SpiderConfig.RESPONSE_CACHE_POLICIES
+    :param arg_names: 组成缓存 key 的参数名，cookies、proxies 等不影响结果的参数不要放进来
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                cache = get_response_cache()
+                if cache is None:
+                    return await fn(*args, **kwargs)
+                key = json.dumps(call_key(fn, signature, arg_names, args, kwargs), ensure_ascii=False)
+                return await cache.get_or_fetch_async(endpoint, key, lambda: fn(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return fn(*args, **kwargs)
+            key = json.dumps(call_key(fn, signature, arg_names, args, kwargs), ensure_ascii=False)
+            return cache.get_or_fetch(endpoint, key, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """获取全局响应缓存（单例模式），SpiderConfig.RESPONSE_CACHE_BACKEND 为 none 时返回 None"""
+    global _response_cache
+    if _response_cache is None and SpiderConfig.RESPONSE_CACHE_BACKEND != 'none':
+        with _response_cache_lock:
+            if _response_cache is None:
+                if SpiderConfig.RESPONSE_CACHE_BACKEND == 'sqlite':
+                    backend = SQLiteCacheBackend(SpiderConfig.RESPONSE_CACHE_PATH, SpiderConfig.RESPONSE_CACHE_SIZE)
+                else:
+                    backend = MemoryCacheBackend(SpiderConfig.RESPONSE_CACHE_SIZE)
+                _response_cache = ResponseCache(backend)
+    return _response_cache
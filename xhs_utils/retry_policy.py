@@ -0,0 +1,153 @@
+"""
+统一的重试策略
+先把上游错误分类（网络、5xx、限流、登录失效、验证码），只重试可以重试的错误，
+重试间隔为带随机抖动的指数退避，总耗时不超过 max_elapsed 和当前请求的截止时间
+"""
+import random
+import threading
+import time
+import requests
+from loguru import logger
+from xhs_utils.config import SpiderConfig
+from xhs_utils.deadline import remaining
+
+# 错误类别
+OK = 'ok'
+NETWORK = 'network'
+SERVER = 'server'
+RATE_LIMITED = 'rate_limited'
+AUTH = 'auth'
+CAPTCHA = 'captcha'
+OTHER = 'other'
+
+# 账号本身出问题的错误类别，cookie 池据此冷却账号
+ACCOUNT_ERRORS = (RATE_LIMITED, AUTH, CAPTCHA)
+
+# 返回体中的业务错误码
+_CODE_KINDS = {
+    -100: AUTH,  # 登录已过期
+    -101: AUTH,  # 未登录
+    300011: AUTH,  # 账号异常
+    300012: CAPTCHA,  # IP存在风险，需要验证
+    300013: RATE_LIMITED,  # 访问频次异常
+    300015: CAPTCHA,  # 浏览器异常，需要验证
+}
+
+
+def classify_status(status_code: int, code: int = None) -> str:
+    """
+    根据HTTP状态码和返回体中的 code 判断错误类别
+    :param code: 返回体中的业务错误码
+    """
+    if status_code in (461, 471):
+        return CAPTCHA
+    if status_code == 429:
+        return RATE_LIMITED
+    if status_code in (401, 403):
+        return AUTH
+    if status_code >= 500:
+        return SERVER
+    if code in _CODE_KINDS:
+        return _CODE_KINDS[code]
+    if status_code >= 400:
+        return OTHER
+    return OK
+
+
+def classify_response(response: requests.Response) -> str:
+    code = None
+    # 只有失败的返回体才需要解析出 code，正常响应不额外解析一次json
+    if response.status_code == 200 and b'"success":false' in response.content:
+        try:
+            body = response.json()
+            if isinstance(body, dict) and not body.get('success', True):
+                code = body.get('code')
+        except ValueError:
+            pass
+    return classify_status(response.status_code, code)
+
+
+def classify_exception(e: Exception) -> str:
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return classify_status(e.response.status_code)
+    if isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)):
+        return NETWORK
+    # aiohttp 是可选依赖，按名称判断
+    if type(e).__module__.startswith('aiohttp') or isinstance(e, (TimeoutError, ConnectionError)):
+        return NETWORK
+    return OTHER
+
+
+class RetryPolicy:
+    """指数退避重试策略"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8, max_elapsed: float = 30, retry_on=(NETWORK, SERVER, RATE_LIMITED)):
+        """
+        :param max_attempts: 最多尝试次数（包含第一次）
+        :param base_delay: 第一次重试前的最大等待时间（秒），之后每次翻倍
+        :param max_delay: 单次等待的上限（秒）
+        :param max_elapsed: 从第一次尝试开始的总耗时上限（秒）
+        :param retry_on: 需要重试的错误类别
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_elapsed = max_elapsed
+        self.retry_on = tuple(retry_on)
+
+    def backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def next_delay(self, kind: str, attempt: int, started_at: float):
+        """
+        :param kind: 本次失败的错误类别
+        :param attempt: 已经尝试的次数
+        :param started_at: 第一次尝试的 time.monotonic()
+        :return: 需要等待的秒数，不应重试时返回 None
+        """
+        if kind not in self.retry_on or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt)
+        if time.monotonic() - started_at + delay > self.max_elapsed:
+            return None
+        left = remaining()
+        if left is not None and delay >= left:
+            return None
+        return delay
+
+    def call(self, fn, *args, **kwargs):
+        """
+        调用 fn，抛出可重试的异常时按策略重试
+        :return: fn 的返回值
+        """
+        started_at = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_exception(e)
+                delay = self.next_delay(kind, attempt, started_at)
+                if delay is None:
+                    raise
+                logger.warning(f'{getattr(fn, "__name__", fn)} 第 {attempt} 次失败（{kind}: {e}），{delay:.2f}s 后重试')
+                time.sleep(delay)
+
+
+_retry_policies = {}
+_retry_policies_lock = threading.Lock()
+
+
+def get_retry_policy(name: str = 'default') -> RetryPolicy:
+    """
+    获取指定接口类别的重试策略（单例模式），未单独配置的类别使用 default
+    :param name: 接口类别，同 rate_limiter.endpoint_family，另有 media 用于下载图片/视频
+    """
+    if name not in _retry_policies:
+        with _retry_policies_lock:
+            if name not in _retry_policies:
+                config = SpiderConfig.RETRY_POLICIES.get(name, SpiderConfig.RETRY_POLICIES['default'])
+                _retry_policies[name] = RetryPolicy(**config)
+    return _retry_policies[name]
@@ -0,0 +1,245 @@
+"""
+常驻Node签名进程池
+execjs 的 Node 运行时每次 call 都会启动新的 node 进程并重新执行签名脚本，
+这里改为启动固定数量的常驻 node 进程，签名脚本只加载一次，通过管道收发 JSON
+"""
+import atexit
+import itertools
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from loguru import logger
+from xhs_utils.config import SpiderConfig
+
+WORKER_SCRIPT = os.path.join(SpiderConfig.STATIC_DIR, 'sign_worker.js')
+
+
+class SignWorkerError(Exception):
+    """签名进程调用失败（超时、进程退出或脚本报错）"""
+
+
+class NodeSignWorker:
+    """单个常驻node签名进程"""
+
+    def __init__(self, node_path: str = None, script_path: str = WORKER_SCRIPT):
+        """
+        :param node_path: node 可执行文件路径
+        :param script_path: 签名进程脚本路径
+        """
+        self.node_path = node_path or SpiderConfig.NODE_PATH
+        self.script_path = script_path
+        self.process = None
+        self._responses = None
+        self._ids = itertools.count(1)
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [self.node_path, self.script_path],
+            cwd=os.path.dirname(self.script_path),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            encoding='utf-8',
+            bufsize=1,
+        )
+        self._responses = queue.Queue()
+        # 独立线程读取 stdout，调用方可以带超时等待
+        threading.Thread(target=self._read_loop, args=(self.process, self._responses), daemon=True).start()
+
+    @staticmethod
+    def _read_loop(process, responses):
+        for line in process.stdout:
+            responses.put(line)
+        responses.put(None)
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def call(self, fn: str, *args, timeout: float = None):
+        """
+        调用签名进程中的函数
+        :param fn: 函数名
+        :param args: 参数（需可 JSON 序列化）
+        :param timeout: 超时时间（秒）
+        """
+        if not self.is_alive():
+            raise SignWorkerError('签名进程未运行')
+        timeout = timeout or SpiderConfig.SIGN_CALL_TIMEOUT
+        request_id = next(self._ids)
+        try:
+            self.process.stdin.write(json.dumps({'id': request_id, 'fn': fn, 'args': args}, ensure_ascii=False) + '\n')
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise SignWorkerError(f'写入签名进程失败: {e}')
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                line = self._responses.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                raise SignWorkerError(f'签名进程响应超时: {fn}')
+            if line is None:
+                raise SignWorkerError('签名进程已退出')
+            response = json.loads(line)
+            # 丢弃之前超时请求的迟到响应
+            if response.get('id') != request_id:
+                continue
+            if not response['ok']:
+                raise SignWorkerError(response['error'])
+            return response['result']
+
+    def ping(self, timeout: float = 5) -> bool:
+        try:
+            return self.call('ping', timeout=timeout) == 'pong'
+        except SignWorkerError:
+            return False
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=2)
+        except Exception:
+            self.process.kill()
+        self.process = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+
+class NodeSignPool:
+    """常驻node签名进程池，支持健康检查和异常进程自动重启"""
+
+    def __init__(self, size: int = None, node_path: str = None, health_check_interval: float = None):
+        """
+        :param size: 进程数量
+        :param node_path: node 可执行文件路径
+        :param health_check_interval: 空闲进程健康检查间隔（秒），0 表示不检查
+        """
+        self.size = size or SpiderConfig.SIGN_POOL_SIZE
+        self.node_path = node_path or SpiderConfig.NODE_PATH
+        self.health_check_interval = SpiderConfig.SIGN_HEALTH_CHECK_INTERVAL if health_check_interval is None else health_check_interval
+        self._idle = queue.Queue()
+        self._workers = []
+        # 重启失败的进程，不再交给调用方，由健康检查重新启动
+        self._failed = []
+        self._failed_lock = threading.Lock()
+        self._closed = threading.Event()
+        self.restarts = 0
+        self.failures = 0
+        for _ in range(self.size):
+            worker = NodeSignWorker(self.node_path)
+            worker.start()
+            self._workers.append(worker)
+            self._idle.put(worker)
+        if self.health_check_interval > 0:
+            threading.Thread(target=self._health_check_loop, daemon=True).start()
+        logger.info(f'签名进程池已启动，进程数: {self.size}')
+
+    def call(self, fn: str, *args, timeout: float = None):
+        """
+        从池中取一个空闲进程执行调用，进程异常时重启并重试一次
+        """
+        if self._closed.is_set():
+            raise SignWorkerError('签名进程池已关闭')
+        timeout = timeout or SpiderConfig.SIGN_CALL_TIMEOUT
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise SignWorkerError('等待空闲签名进程超时')
+        try:
+            try:
+                return worker.call(fn, *args, timeout=timeout)
+            except SignWorkerError as e:
+                if worker.is_alive() and worker.ping():
+                    # 进程正常，是脚本本身报错
+                    raise
+                logger.warning(f'签名进程异常，正在重启: {e}')
+                try:
+                    self._restart(worker)
+                except Exception as restart_error:
+                    raise SignWorkerError(f'重启签名进程失败: {restart_error}') from e
+                return worker.call(fn, *args, timeout=timeout)
+        finally:
+            self._release(worker)
+
+    def _restart(self, worker: NodeSignWorker):
+        worker.restart()
+        self.restarts += 1
+
+    def _release(self, worker: NodeSignWorker):
+        """进程仍在运行时放回空闲队列，否则记为失败，等健康检查重新启动"""
+        if worker.is_alive():
+            self._idle.put(worker)
+            return
+        with self._failed_lock:
+            self._failed.append(worker)
+            self.failures += 1
+        logger.error('签名进程不可用，已移出进程池，等待健康检查重新启动')
+
+    def _revive_failed(self):
+        """重新启动之前失败的进程，成功的放回空闲队列"""
+        with self._failed_lock:
+            failed, self._failed = self._failed, []
+        for worker in failed:
+            try:
+                self._restart(worker)
+            except Exception as e:
+                logger.error(f'重启签名进程失败: {e}')
+            self._release(worker)
+
+    def _health_check_loop(self):
+        while not self._closed.wait(self.health_check_interval):
+            self._revive_failed()
+            # 只检查当前空闲的进程，忙碌的进程由 call 自己处理
+            for _ in range(self._idle.qsize()):
+                try:
+                    worker = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if not worker.ping():
+                        logger.warning('签名进程健康检查失败，正在重启')
+                        self._restart(worker)
+                except Exception as e:
+                    logger.error(f'重启签名进程失败: {e}')
+                finally:
+                    self._release(worker)
+
+    def close(self):
+        self._closed.set()
+        for worker in self._workers:
+            worker.stop()
+
+
+_sign_pool = None
+_sign_pool_lock = threading.Lock()
+
+
+def get_sign_pool() -> NodeSignPool:
+    """获取全局签名进程池（单例模式，首次使用时启动）"""
+    global _sign_pool
+    if _sign_pool is None:
+        with _sign_pool_lock:
+            if _sign_pool is None:
+                _sign_pool = NodeSignPool()
+                atexit.register(_sign_pool.close)
+    return _sign_pool
+
+
+def _reset_after_fork():
+    """
+    fork 出的子进程不能共用父进程的签名进程（管道和读线程都不会被继承），
+    丢弃继承来的引用，子进程首次使用时重新启动自己的进程池
+    """
+    global _sign_pool, _sign_pool_lock
+    _sign_pool = None
+    _sign_pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
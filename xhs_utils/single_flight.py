@@ -0,0 +1,127 @@
+"""
+单飞（single-flight）请求合并
+同一时刻多个线程发起相同的调用（相同接口 + 规范化后的参数）时，只有第一个线程真正请求上游，
+其余线程等待并共享它的结果，节省账号配额，降低突发流量下的尾延迟
+"""
+import functools
+import inspect
+import threading
+import urllib.parse
+from xhs_utils.config import SpiderConfig
+from xhs_utils.deadline import remaining, DeadlineExceeded
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """按 key 合并并发调用（线程安全）"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._executed = 0
+        self._shared = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        执行 fn，同一 key 已有调用在进行时等待并返回它的结果（或抛出它的异常）
+        结果在所有等待方之间共享，调用方不要原地修改
+        :param key: 可哈希的调用标识
+        :return: fn 的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._executed += 1
+            else:
+                self._shared += 1
+        if not leader:
+            # 等待时间不超过本请求的截止时间
+            if not call.done.wait(remaining()):
+                raise DeadlineExceeded('等待相同请求的结果超时')
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._executed + self._shared
+            return {
+                'in_flight': len(self._calls),
+                'executed': self._executed,
+                'shared': self._shared,
+                'shared_rate': round(self._shared / total, 4) if total else 0.0,
+            }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """获取全局的 SingleFlight（单例模式），SpiderConfig.SINGLE_FLIGHT_ENABLED 为 False 时返回 None"""
+    global _single_flight
+    if _single_flight is None and SpiderConfig.SINGLE_FLIGHT_ENABLED:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
+
+
+def _normalize(value):
+    # 小红书链接按其中的 id 归一，xsec_token 等查询参数不影响结果
+    if isinstance(value, str) and value.startswith('https://www.xiaohongshu.com/'):
+        return urllib.parse.urlparse(value).path.rstrip('/').split('/')[-1]
+    return value
+
+
+def call_key(fn, signature: inspect.Signature, arg_names: tuple, args: tuple, kwargs: dict) -> tuple:
+    """
+    由函数名和指定参数（补齐默认值、链接归一后）组成调用标识
+    :param arg_names: 组成 key 的参数名
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    return (fn.__qualname__,) + tuple(_normalize(bound.arguments[name]) for name in arg_names)
+
+
+def coalesce(*arg_names, empty=None):
+    """
+    装饰返回 (success, msg, data) 的方法，参数相同的并发调用合并为一次
+    :param arg_names: 组成 key 的参数名，cookies、proxies 等不影响结果的参数不要放进来
+    :param empty: 等待超过截止时间时返回的 data
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            flight = get_single_flight()
+            if flight is None:
+                return fn(*args, **kwargs)
+            key = call_key(fn, signature, arg_names, args, kwargs)
+            try:
+                return flight.do(key, fn, *args, **kwargs)
+            except DeadlineExceeded as e:
+                return False, str(e), empty() if callable(empty) else empty
+        return wrapper
+    return decorator
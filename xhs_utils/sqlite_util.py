@@ -0,0 +1,45 @@
+"""
+SQLite 工具
+"""
+import os
+import sqlite3
+import threading
+
+
+class SQLiteDB:
+    """WAL 模式的 SQLite 连接，每个线程一个连接，fork 后的子进程重新建立连接，多个进程可以同时读写同一个文件"""
+
+    def __init__(self, path: str):
+        """
+        :param path: 数据库文件路径，所在目录不存在时自动创建
+        """
+        self.path = path
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._pid != os.getpid():
+            if self._pid != os.getpid():
+                self._local = threading.local()
+                self._pid = os.getpid()
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        return self._conn().execute(sql, params)
+
+    def executemany(self, sql: str, rows) -> sqlite3.Cursor:
+        """在一个事务中执行多行写入"""
+        conn = self._conn()
+        conn.execute('BEGIN')
+        try:
+            cursor = conn.executemany(sql, rows)
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return cursor
@@ -0,0 +1,159 @@
+"""
+xsec_token 登记表
+从搜索、主页推荐、用户笔记列表等接口的响应中顺带记录用户和笔记的 xsec_token（及其 xsec_source、获取时间），保存到 SQLite，重启后仍可使用；
+只有用户id时先查这里，查不到才需要调用 search_user 搜索
+"""
+import functools
+import threading
+import time
+from collections import defaultdict
+from typing import Iterator, Optional, Tuple
+from loguru import logger
+from xhs_utils.config import SpiderConfig
+from xhs_utils.sqlite_util import SQLiteDB
+
+USER = 'user'
+NOTE = 'note'
+
+
+def extract_tokens(data) -> Iterator[Tuple[str, str, str]]:
+    """
+    从接口响应中提取 xsec_token
+    :param data: 接口返回的 json
+    :return: (类别 user/note, 对象id, xsec_token) 的迭代器
+    """
+    data = (data or {}).get('data') or {}
+    # 搜索笔记、主页推荐: data.items，笔记作者的 token 在 note_card.user 中
+    for item in data.get('items') or []:
+        if item.get('xsec_token') and item.get('id') and item.get('model_type', 'note') == 'note':
+            yield NOTE, item['id'], item['xsec_token']
+        user = (item.get('note_card') or {}).get('user') or {}
+        if user.get('xsec_token') and user.get('user_id'):
+            yield USER, user['user_id'], user['xsec_token']
+    # 用户笔记列表、点赞、收藏: data.notes
+    for note in data.get('notes') or []:
+        if note.get('xsec_token') and note.get('note_id'):
+            yield NOTE, note['note_id'], note['xsec_token']
+    # 搜索用户: data.users
+    for user in data.get('users') or []:
+        if user.get('xsec_token') and user.get('id'):
+            yield USER, user['id'], user['xsec_token']
+
+
+class TokenRegistry:
+    """xsec_token 登记表（线程安全，多个进程可以共用同一个文件）"""
+
+    def __init__(self, path: str = None, ttl: float = None):
+        """
+        :param path: 数据库文件路径，默认 SpiderConfig.TOKEN_REGISTRY_PATH
+        :param ttl: xsec_token 的有效期（秒），超过后视为不存在，默认 SpiderConfig.TOKEN_REGISTRY_TTL
+        """
+        self.path = path or SpiderConfig.TOKEN_REGISTRY_PATH
+        self.ttl = SpiderConfig.TOKEN_REGISTRY_TTL if ttl is None else ttl
+        self._db = SQLiteDB(self.path)
+        self._db.execute('CREATE TABLE IF NOT EXISTS xsec_tokens (kind TEXT, object_id TEXT, xsec_token TEXT, source TEXT, seen_at REAL, PRIMARY KEY (kind, object_id))')
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self._counts[name] += n
+
+    def remember(self, kind: str, object_id: str, xsec_token: str, source: str, seen_at: float = None):
+        """
+        记录一个 xsec_token，同一对象只保留最新的
+        :param kind: user 或 note
+        :param source: 对应的 xsec_source，如 pc_search、pc_feed、pc_user
+        """
+        self._db.execute(
+            'INSERT OR REPLACE INTO xsec_tokens (kind, object_id, xsec_token, source, seen_at) VALUES (?, ?, ?, ?, ?)',
+            (kind, object_id, xsec_token, source, seen_at or time.time()),
+        )
+
+    def harvest(self, data, source: str) -> int:
+        """
+        记录接口响应中的所有 xsec_token
+        :param source: 响应所属接口的 xsec_source
+        :return: 记录的数量
+        """
+        seen_at = time.time()
+        rows = [(kind, object_id, xsec_token, source, seen_at) for kind, object_id, xsec_token in extract_tokens(data)]
+        if rows:
+            self._db.executemany('INSERT OR REPLACE INTO xsec_tokens (kind, object_id, xsec_token, source, seen_at) VALUES (?, ?, ?, ?, ?)', rows)
+            self._count('harvested', len(rows))
+        return len(rows)
+
+    def lookup(self, kind: str, object_id: str) -> Optional[Tuple[str, str, float]]:
+        """
+        :return: 未过期的 (xsec_token, xsec_source, 获取时间)，没有时返回 None
+        """
+        row = self._db.execute(
+            'SELECT xsec_token, source, seen_at FROM xsec_tokens WHERE kind = ? AND object_id = ? AND seen_at > ?',
+            (kind, object_id, time.time() - self.ttl if self.ttl else 0),
+        ).fetchone()
+        self._count('misses' if row is None else 'hits')
+        return row
+
+    def user_url(self, user_id: str) -> Optional[str]:
+        """带 xsec_token 的用户主页链接，没有未过期的 token 时返回 None"""
+        row = self.lookup(USER, user_id)
+        if row is None:
+            return None
+        return f"https://www.xiaohongshu.com/user/profile/{user_id}?xsec_token={row[0]}&xsec_source={row[1]}"
+
+    def note_url(self, note_id: str) -> Optional[str]:
+        """带 xsec_token 的笔记链接，没有未过期的 token 时返回 None"""
+        row = self.lookup(NOTE, note_id)
+        if row is None:
+            return None
+        return f"https://www.xiaohongshu.com/explore/{note_id}?xsec_token={row[0]}&xsec_source={row[1]}"
+
+    def prune(self):
+        """删除已过期的 token"""
+        if self.ttl:
+            self._db.execute('DELETE FROM xsec_tokens WHERE seen_at <= ?', (time.time() - self.ttl,))
+
+    def count(self, kind: str = None) -> int:
+        if kind is None:
+            return self._db.execute('SELECT COUNT(*) FROM xsec_tokens').fetchone()[0]
+        return self._db.execute('SELECT COUNT(*) FROM xsec_tokens WHERE kind = ?', (kind,)).fetchone()[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        return {'users': self.count(USER), 'notes': self.count(NOTE), **counts}
+
+
+def harvested(source: str):
+    """
+    装饰 XHS_Apis 中返回 (success, msg, data) 的方法：成功时把响应中的 xsec_token 记录到 self.token_registry
+    :param source: 该接口对应的 xsec_source
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            result = fn(self, *args, **kwargs)
+            token_registry = getattr(self, 'token_registry', None)
+            if token_registry is not None and result[0] and isinstance(result[2], dict):
+                try:
+                    token_registry.harvest(result[2], source)
+                except Exception as e:
+                    logger.warning(f'记录 xsec_token 失败: {e}')
+            return result
+        return wrapper
+    return decorator
+
+
+_token_registry = None
+_token_registry_lock = threading.Lock()
+
+
+def get_token_registry():
+    """获取全局 xsec_token 登记表（单例模式），SpiderConfig.TOKEN_REGISTRY_ENABLED 为 False 时返回 None"""
+    global _token_registry
+    if _token_registry is None and SpiderConfig.TOKEN_REGISTRY_ENABLED:
+        with _token_registry_lock:
+            if _token_registry is None:
+                _token_registry = TokenRegistry()
+                _token_registry.prune()
+    return _token_registry
@@ -13,13 +13,14 @@ from apis.xhs_pc_apis import XHS_Apis
 class UserURLHelper:
     """用户URL辅助类"""
     
-    def __init__(self, cookies_str: str):
+    def __init__(self, cookies_str: str, xhs_apis: Optional[XHS_Apis] = None):
         """
         初始化
         :param cookies_str: Cookie字符串
+        :param xhs_apis: 复用已有的 XHS_Apis 实例，默认新建（共用进程内的连接池）
         """
         self.cookies_str = cookies_str
-        self.xhs_apis = XHS_Apis()
+        self.xhs_apis = xhs_apis or XHS_Apis()
     
     def get_user_url_with_token(self, user_id: str) -> Optional[str]:
         """
@@ -46,12 +47,19 @@ class UserURLHelper:
     
     def search_user_by_id(self, user_id: str, search_keyword: str = None) -> Optional[str]:
         """
-        通过搜索找到用户并获取完整URL
+        通过搜索找到用户并获取完整URL，xsec_token 登记表中有该用户时不再搜索
         :param user_id: 用户ID
         :param search_keyword: 搜索关键词（可选，如果不提供会尝试使用用户ID）
         :return: 完整的用户URL（包含xsec_token）
         """
         try:
+            token_registry = self.xhs_apis.token_registry
+            if token_registry is not None:
+                user_url = token_registry.user_url(user_id)
+                if user_url:
+                    logger.info(f"✅ 从xsec_token登记表获取到完整URL: {user_url}")
+                    return user_url
+            
             # 如果没有提供搜索关键词，尝试使用用户ID
             if not search_keyword:
                 search_keyword = user_id
@@ -1,15 +1,28 @@
 import json
+import os
+import threading
 
 import execjs
+from xhs_utils.config import SpiderConfig
 
-try:
-    js = execjs.compile(open(r'../static/xhs_creator_xs.js', 'r', encoding='utf-8').read())
-except:
-    js = execjs.compile(open(r'static/xhs_creator_xs.js', 'r', encoding='utf-8').read())
+_js = None
+_js_lock = threading.Lock()
+
+
+def get_js():
+    """获取编译后的创作者中心签名脚本（单例模式，首次使用时编译）"""
+    global _js
+    if _js is None:
+        with _js_lock:
+            if _js is None:
+                path = os.path.join(SpiderConfig.STATIC_DIR, 'xhs_creator_xs.js')
+                with open(path, 'r', encoding='utf-8') as f:
+                    _js = execjs.compile(f.read(), cwd=SpiderConfig.STATIC_DIR)
+    return _js
 
 
 def generate_xs(a1, api, data=''):
-    ret = js.call('get_request_headers_params', api, data, a1)
+    ret = get_js().call('get_request_headers_params', api, data, a1)
     xs, xt = ret['xs'], ret['xt']
     if data:
         data = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
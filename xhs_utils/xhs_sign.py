@@ -0,0 +1,183 @@
+"""
+小红书PC端签名的纯Python实现
+与 static/xhs_xs_xsc_56.js 逐字节对应，用于在进程内计算 x-s / x-t / x-s-common，不再依赖 node
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+import zlib
+
+BASE64_ALPHABET = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+CUSTOM_BASE64_ALPHABET = 'ZmserbBoHQtNP+wOcza/LpngG8yJq42KWYj0DSfdikx3VT16IlUAFM97hECvuRX5'
+X3_BASE64_ALPHABET = 'MfgqrsbcyzPQRStuvC7mn501HIJBo2DEFTKdeNOwxWXYZap89+/A4UVLhijkl63G'
+HEX_KEY_BYTES = bytes.fromhex(
+    '71a302257793271ddd273bcee3e4b98d9d7935e1da33f5765e2ea8afb6dc77a51a499d23b67c20660025860cbf13d4540d92497f58686c574e'
+    '508f46e1956344f39139bf4faf22a3eef120b79258145b2feb5193b6478669961298e79bedca646e1a693a926154a5a7a1bd1cf0dedb742f91'
+    '7a747a1e388b234f2277'
+)
+VERSION_BYTES = bytes([119, 104, 96, 41])
+ENV_FINGERPRINT_XOR_KEY = 41
+SEQUENCE_VALUE_RANGE = (15, 50)
+WINDOW_PROPS_LENGTH_RANGE = (900, 1200)
+ENV_FINGERPRINT_TIME_OFFSET_RANGE = (10, 50)
+CHECKSUM_VERSION = 1
+CHECKSUM_XOR_KEY = 115
+CHECKSUM_FIXED_TAIL = bytes([249, 65, 103, 103, 201, 181, 131, 99, 94, 7, 68, 250, 132, 21])
+X3_PREFIX = 'mns0301_'
+XYS_PREFIX = 'XYS_'
+XS_TEMPLATE_VERSION = '4.2.6'
+APP_ID = 'xhs-pc-web'
+PLATFORM = 'Windows'
+APP_VERSION = '4.84.1'
+XS_COMMON_FINGERPRINT = (
+    'I38rHdgsjopgIvesdVwgIC+oIELmBZ5e3VwXLgFTIxS3bqwErFeexd0ekncAzMFYnqthIhJeSnMDKutRI3KsYorWHPtGrbV0P9WfIi/eWc6eYqtyQApPI37e'
+    'kmR6QL+5Ii6sdneeSfqYHqwl2qt5B0DBIx++GDi/sVtkIxdsxuwr4qtiIhuaIE3e3LV0I3VTIC7e0utl2ADmsLveDSKsSPw5IEvsiVtJOqw8BuwfPpdeTF'
+    'WOIx4TIiu6ZPwbPut5IvlaLbgs3qtxIxes1VwHIkumIkIyejgsY/WTge7eSqte/D7sDcpipedeYrDtIC6eDVw2IENsSqtlnlSuNjVtIvoekqt3cZ7sVo4g'
+    'IESyIhE4NnquIxhnqz8gIkIfoqwkICZW8g3sdlOeVPw3IvAe0fged0YyIi5s3Mc52utAIiKsidvekZNeTPt4nAOeWPwEIvSzaAdeSVwXpnesDqwmI3TrIx'
+    'E5Luwwaqw+rekhZANe1MNe0Pw9ICNsVLoeSbIFIkosSr7sVnFiIkgsVVtMIiudqqw+tqtWI30e3PwIIhoe3ut1IiOsjut3wutnsPwXICclI3Ir27lk2I5e'
+    '1utCIES/IEJs0PtnpYIAO0JeYfD1IErPOPtKoqw3I3OexqtWQL5eiz0sVSEyIEJekd/skPtsnPwqICJeSPwiIh5eVAuLIv5eYo/e0PtSICKsVqwV4omqI3'
+    'RIIkge0e0sYZ0si/7eiuwSIvTeIhqmGuwCIkrPIx0edUzbzbveTPw5IxI0yVwImZeedM0eWVwmeqt2IiM9IhhQLqwJPqtbIxZ='
+)
+
+_CUSTOM_TABLE = str.maketrans(BASE64_ALPHABET, CUSTOM_BASE64_ALPHABET)
+_X3_TABLE = str.maketrans(BASE64_ALPHABET, X3_BASE64_ALPHABET)
+
+
+def _rand32() -> int:
+    return int.from_bytes(os.urandom(4), 'little')
+
+
+def _rand_between(rand32, low: int, high: int) -> int:
+    return low + rand32() % (high - low + 1)
+
+
+def _to_json(value) -> str:
+    """与 JSON.stringify 一致的紧凑序列化"""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def build_content_string(method: str, uri: str, payload=None) -> str:
+    """拼接参与签名的内容：POST 为 uri + 请求体，GET 为带查询参数的 uri"""
+    payload = payload or {}
+    if method == 'POST':
+        return uri + _to_json(payload)
+    if not payload:
+        return uri
+    parts = []
+    for key, value in payload.items():
+        if isinstance(value, list):
+            value = ','.join('' if v is None else _js_str(v) for v in value)
+        elif value is None:
+            value = ''
+        else:
+            value = _js_str(value)
+        parts.append(f"{key}={value.replace('=', '%3D')}")
+    return uri + '?' + '&'.join(parts)
+
+
+def _js_str(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def _env_fingerprint_a(timestamp: int) -> bytes:
+    data = bytearray(timestamp.to_bytes(8, 'little'))
+    data[0] = ((sum(data[1:5]) & 0xFF) + sum(data[5:8])) & 0xFF
+    return bytes(b ^ ENV_FINGERPRINT_XOR_KEY for b in data)
+
+
+def _pad(value: str, length: int) -> bytes:
+    return value.encode('utf-8')[:length].ljust(length, b'\x00')
+
+
+def build_payload(md5_hex: str, a1: str, app_id: str, content: str, timestamp: int, rand32=_rand32) -> bytes:
+    """构造 x3 明文，字段顺序与随机数的取用顺序都必须与 JS 保持一致"""
+    seed = rand32()
+    seed_bytes = seed.to_bytes(4, 'little')
+    time_offset = _rand_between(rand32, *ENV_FINGERPRINT_TIME_OFFSET_RANGE)
+    sequence_value = _rand_between(rand32, *SEQUENCE_VALUE_RANGE)
+    window_props_length = _rand_between(rand32, *WINDOW_PROPS_LENGTH_RANGE)
+    md5_bytes = bytes.fromhex(md5_hex)
+    return b''.join([
+        VERSION_BYTES,
+        seed_bytes,
+        _env_fingerprint_a(timestamp),
+        (timestamp - time_offset).to_bytes(8, 'little'),
+        sequence_value.to_bytes(4, 'little'),
+        window_props_length.to_bytes(4, 'little'),
+        len(content.encode('utf-8')).to_bytes(4, 'little'),
+        bytes(b ^ seed_bytes[0] for b in md5_bytes[:8]),
+        bytes([52]),
+        _pad(a1, 52),
+        bytes([10]),
+        _pad(app_id, 10),
+        bytes([1, CHECKSUM_VERSION, seed_bytes[0] ^ CHECKSUM_XOR_KEY]),
+        CHECKSUM_FIXED_TAIL,
+    ])
+
+
+def sign_xs(method: str, uri: str, a1: str, app_id: str = APP_ID, payload=None, timestamp: int = None, rand32=_rand32) -> str:
+    """
+    计算 x-s
+    :param timestamp: 毫秒时间戳，默认当前时间
+    :param rand32: 32位随机数生成函数，测试时可替换为固定值
+    """
+    method = method.upper()
+    content = build_content_string(method, uri, payload)
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    plain = build_payload(hashlib.md5(content.encode('utf-8')).hexdigest(), a1.strip(), app_id.strip(), content, timestamp, rand32)
+    x3 = bytes(b ^ k for b, k in zip(plain[:124], HEX_KEY_BYTES))
+    x3 = base64.b64encode(x3).decode().translate(_X3_TABLE)
+    template = {'x0': XS_TEMPLATE_VERSION, 'x1': APP_ID, 'x2': PLATFORM, 'x3': X3_PREFIX + x3, 'x4': ''}
+    return XYS_PREFIX + base64.b64encode(_to_json(template).encode('utf-8')).decode().translate(_CUSTOM_TABLE)
+
+
+def crc32_checksum(text: str) -> int:
+    """对应 JS 中的 gens9：标准 crc32 再异或多项式，结果为有符号32位整数"""
+    value = zlib.crc32(text.encode('utf-8')) ^ 0xEDB88320
+    return value - (1 << 32) if value >= (1 << 31) else value
+
+
+def sign_xs_common(a1: str, xs: str, xt: int) -> str:
+    """计算 x-s-common"""
+    data = {
+        's0': 5,
+        's1': '',
+        'x0': '1',
+        'x1': XS_TEMPLATE_VERSION,
+        'x2': PLATFORM,
+        'x3': APP_ID,
+        'x4': APP_VERSION,
+        'x5': a1,
+        'x6': xt,
+        'x7': xs,
+        'x8': XS_COMMON_FINGERPRINT,
+        'x9': crc32_checksum(str(xt) + xs + XS_COMMON_FINGERPRINT),
+        'x10': 0,
+        'x11': 'normal',
+    }
+    return base64.b64encode(_to_json(data).encode('utf-8')).decode().translate(_CUSTOM_TABLE)
+
+
+def get_request_headers_params(api: str, data, a1: str, method: str = 'POST') -> dict:
+    """对应 JS 的 get_request_headers_params，返回 xs / xt / xs_common"""
+    xs = sign_xs(method, api, a1, APP_ID, data)
+    xt = int(time.time() * 1000)
+    return {
+        'xs': xs,
+        'xt': xt,
+        'xs_common': sign_xs_common(a1, xs, xt),
+    }
+
+
+def get_xs(api: str, data, a1: str, method: str = 'POST') -> dict:
+    """只计算 x-s 和 x-t"""
+    xt = int(time.time() * 1000)
+    return {
+        'X-s': sign_xs(method, api, a1, APP_ID, data, timestamp=xt),
+        'X-t': xt,
+    }
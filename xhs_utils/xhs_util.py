@@ -1,18 +1,150 @@
+import asyncio
+import hashlib
 import json
 import math
+import os
 import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
 import execjs
-from xhs_utils.cookie_util import trans_cookies
+from loguru import logger
+from xhs_utils import xhs_sign, xhs_xray
+from xhs_utils.cache_util import TTLCache
+from xhs_utils.config import SpiderConfig
+from xhs_utils.cookie_util import Credential
+from xhs_utils.sign_pool import get_sign_pool
 
-try:
-    js = execjs.compile(open(r'../static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
-except:
-    js = execjs.compile(open(r'static/xhs_xs_xsc_56.js', 'r', encoding='utf-8').read())
+# 批量签名，一次 js.call 完成整批计算
+SIGN_MANY_JS = '''
+function get_request_headers_params_many(items, a1) {
+  return items.map(function (item) {
+    return get_request_headers_params(item[0], item[1], a1, item[2]);
+  });
+}
+'''
 
-try:
-    xray_js = execjs.compile(open(r'../static/xhs_xray.js', 'r', encoding='utf-8').read())
-except:
-    xray_js = execjs.compile(open(r'static/xhs_xray.js', 'r', encoding='utf-8').read())
+_js = None
+_js_lock = threading.Lock()
+
+
+def get_js():
+    """获取编译后的签名脚本（单例模式，首次使用时编译）"""
+    global _js
+    if _js is None:
+        with _js_lock:
+            if _js is None:
+                path = os.path.join(SpiderConfig.STATIC_DIR, 'xhs_xs_xsc_56.js')
+                with open(path, 'r', encoding='utf-8') as f:
+                    _js = execjs.compile(f.read() + SIGN_MANY_JS, cwd=SpiderConfig.STATIC_DIR)
+    return _js
+
+
+class SignBackend(ABC):
+    """签名后端接口"""
+
+    @abstractmethod
+    def get_request_headers_params(self, api, data, a1, method='POST') -> dict:
+        """返回 {'xs': ..., 'xt': ..., 'xs_common': ...}"""
+        pass
+
+    @abstractmethod
+    def get_xs(self, api, data, a1) -> dict:
+        """返回 {'X-s': ..., 'X-t': ...}"""
+        pass
+
+    def warmup(self):
+        """提前完成脚本编译、进程启动等初始化工作，默认不需要"""
+        pass
+
+    def get_request_headers_params_many(self, a1, sign_items) -> list:
+        """
+        批量签名，默认逐个计算，支持批量的后端应覆盖此方法以减少调用次数
+        :param sign_items: [(api, data, method), ...]
+        """
+        return [self.get_request_headers_params(api, data, a1, method) for api, data, method in sign_items]
+
+
+class ExecjsSignBackend(SignBackend):
+    """通过 execjs 调用签名脚本（每次调用都会启动node）"""
+
+    def warmup(self):
+        get_js()
+
+    def get_request_headers_params(self, api, data, a1, method='POST') -> dict:
+        return get_js().call('get_request_headers_params', api, data, a1, method)
+
+    def get_request_headers_params_many(self, a1, sign_items) -> list:
+        return get_js().call('get_request_headers_params_many', [list(item) for item in sign_items], a1)
+
+    def get_xs(self, api, data, a1) -> dict:
+        # xhs_xs_xsc_56.js 中没有单独的 get_xs，取完整签名中的 x-s 和 x-t
+        ret = self.get_request_headers_params(api, data, a1)
+        return {'X-s': ret['xs'], 'X-t': ret['xt']}
+
+
+class NodePoolSignBackend(SignBackend):
+    """通过常驻node进程池调用签名脚本"""
+
+    def warmup(self):
+        get_sign_pool().call('ping')
+
+    def get_request_headers_params(self, api, data, a1, method='POST') -> dict:
+        return get_sign_pool().call('get_request_headers_params', api, data, a1, method)
+
+    def get_request_headers_params_many(self, a1, sign_items) -> list:
+        return get_sign_pool().call('get_request_headers_params_many', [list(item) for item in sign_items], a1)
+
+    def get_xs(self, api, data, a1) -> dict:
+        ret = self.get_request_headers_params(api, data, a1)
+        return {'X-s': ret['xs'], 'X-t': ret['xt']}
+
+
+class PythonSignBackend(SignBackend):
+    """进程内纯Python签名，不依赖node"""
+
+    def get_request_headers_params(self, api, data, a1, method='POST') -> dict:
+        return xhs_sign.get_request_headers_params(api, data, a1, method)
+
+    def get_xs(self, api, data, a1) -> dict:
+        return xhs_sign.get_xs(api, data, a1)
+
+
+SIGN_BACKENDS = {
+    'execjs': ExecjsSignBackend,
+    'pool': NodePoolSignBackend,
+    'python': PythonSignBackend,
+}
+_sign_backends = {}
+_sign_backends_lock = threading.Lock()
+
+
+def get_sign_backend(name: str = None) -> SignBackend:
+    """
+    获取签名后端（单例模式）
+    :param name: 后端名称，默认使用 SpiderConfig.SIGN_ENGINE
+    """
+    name = name or SpiderConfig.SIGN_ENGINE
+    if name not in _sign_backends:
+        if name not in SIGN_BACKENDS:
+            raise ValueError(f'未知的签名引擎: {name}，可选: {", ".join(SIGN_BACKENDS)}')
+        with _sign_backends_lock:
+            if name not in _sign_backends:
+                _sign_backends[name] = SIGN_BACKENDS[name]()
+    return _sign_backends[name]
+
+
+def warmup(names=None):
+    """
+    预热签名后端，服务启动时调用，避免首个请求承担编译/启动开销
+    prefork 部署时在 master 进程中调用即可，常驻node进程池会在子进程首次使用时重新启动
+    :param names: 后端名称列表，默认只预热 SpiderConfig.SIGN_ENGINE
+    """
+    for name in names or [SpiderConfig.SIGN_ENGINE]:
+        start = time.perf_counter()
+        get_sign_backend(name).warmup()
+        logger.info(f'签名引擎 {name} 预热完成，耗时 {time.perf_counter() - start:.2f}s')
 
 def generate_x_b3_traceid(len=16):
     x_b3_traceid = ""
@@ -21,17 +153,125 @@ def generate_x_b3_traceid(len=16):
     return x_b3_traceid
 
 def generate_xs_xs_common(a1, api, data='', method='POST'):
-    ret = js.call('get_request_headers_params', api, data, a1, method)
+    presigned = _pop_presigned(a1, api, data, method)
+    if presigned:
+        return presigned
+    cache = get_sign_cache() if method.upper() == 'GET' else None
+    if cache is not None:
+        cache_key = _sign_cache_key(a1, api, data, method)
+        cached = cache.get(cache_key)
+        if cached:
+            return cached
+    ret = get_sign_backend().get_request_headers_params(api, data, a1, method)
     xs, xt, xs_common = ret['xs'], ret['xt'], ret['xs_common']
+    if cache is not None:
+        # 缓存到期时间不超过签名本身的有效期
+        ttl = min(SpiderConfig.SIGN_CACHE_TTL, SpiderConfig.SIGN_VALID_SECONDS - (time.time() * 1000 - int(xt)) / 1000)
+        if ttl > 0:
+            cache.set(cache_key, (xs, xt, xs_common), ttl)
     return xs, xt, xs_common
 
+def sign_many(a1, sign_items):
+    """
+    一次调用签名引擎，批量计算多个请求的签名
+    :param a1: cookies 中的 a1
+    :param sign_items: [(api, data, method), ...]
+    :return: [(xs, xt, xs_common), ...]，顺序与 sign_items 一致
+    """
+    if not sign_items:
+        return []
+    rets = get_sign_backend().get_request_headers_params_many(a1, sign_items)
+    return [(ret['xs'], ret['xt'], ret['xs_common']) for ret in rets]
+
+# 预签名结果，key 为 (a1, method, api, data)，value 为签名队列，每个签名只使用一次
+# 提前结束翻页时没用上的签名随过期或容量淘汰释放
+_presigned = TTLCache(SpiderConfig.PRESIGN_CACHE_SIZE, SpiderConfig.SIGN_VALID_SECONDS)
+_presigned_lock = threading.Lock()
+
+
+def _sign_key(a1, api, data, method):
+    if data and not isinstance(data, str):
+        data = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+    return a1, method.upper(), api, data or ''
+
+def _sign_cache_key(a1, api, data, method):
+    a1, method, api, data = _sign_key(a1, api, data, method)
+    return a1, method, api, hashlib.md5(data.encode('utf-8')).hexdigest() if data else ''
+
+def _is_sign_fresh(xt):
+    return time.time() * 1000 - int(xt) <= SpiderConfig.SIGN_VALID_SECONDS * 1000
+
+def presign(a1, sign_items):
+    """
+    预先批量签名接下来要发出的请求，之后 generate_xs_xs_common 遇到相同请求时直接取用
+    :param a1: cookies 中的 a1
+    :param sign_items: [(api, data, method), ...]
+    """
+    signatures = sign_many(a1, sign_items)
+    with _presigned_lock:
+        for (api, data, method), signature in zip(sign_items, signatures):
+            key = _sign_key(a1, api, data, method)
+            queue = _presigned.get(key) or deque()
+            queue.append(signature)
+            # 队列在最后一个签名失效时整体过期
+            _presigned.set(key, queue, SpiderConfig.SIGN_VALID_SECONDS - (time.time() * 1000 - int(signature[1])) / 1000)
+    return signatures
+
+def _pop_presigned(a1, api, data, method):
+    if not len(_presigned):
+        return None
+    key = _sign_key(a1, api, data, method)
+    with _presigned_lock:
+        queue = _presigned.get(key)
+        while queue:
+            signature = queue.popleft()
+            if _is_sign_fresh(signature[1]):
+                if not queue:
+                    _presigned.pop(key)
+                return signature
+        _presigned.pop(key)
+    return None
+
+# GET 请求的签名缓存，相同请求在有效期内直接复用签名
+_sign_cache = None
+_sign_cache_lock = threading.Lock()
+
+
+def get_sign_cache():
+    """获取签名缓存（单例模式），SpiderConfig.SIGN_CACHE_SIZE 为 0 时返回 None"""
+    global _sign_cache
+    if _sign_cache is None and SpiderConfig.SIGN_CACHE_SIZE > 0:
+        with _sign_cache_lock:
+            if _sign_cache is None:
+                _sign_cache = TTLCache(SpiderConfig.SIGN_CACHE_SIZE, min(SpiderConfig.SIGN_CACHE_TTL, SpiderConfig.SIGN_VALID_SECONDS))
+    return _sign_cache
+
+def get_sign_stats():
+    """签名相关的统计信息"""
+    cache = get_sign_cache()
+    return {
+        'engine': SpiderConfig.SIGN_ENGINE,
+        'cache': cache.stats() if cache is not None else None,
+    }
+
 def generate_xs(a1, api, data=''):
-    ret = js.call('get_xs', api, data, a1)
+    ret = get_sign_backend().get_xs(api, data, a1)
     xs, xt = ret['X-s'], ret['X-t']
     return xs, xt
 
+_trace_id_buffer = None
+_trace_id_buffer_lock = threading.Lock()
+
+
 def generate_xray_traceid():
-    return xray_js.call('traceId')
+    global _trace_id_buffer
+    if SpiderConfig.XRAY_TRACEID_BUFFER_SIZE <= 0:
+        return xhs_xray.trace_id()
+    if _trace_id_buffer is None:
+        with _trace_id_buffer_lock:
+            if _trace_id_buffer is None:
+                _trace_id_buffer = xhs_xray.TraceIdBuffer(SpiderConfig.XRAY_TRACEID_BUFFER_SIZE)
+    return _trace_id_buffer.get()
 def get_common_headers():
     return {
         "authority": "www.xiaohongshu.com",
@@ -88,10 +328,27 @@ def generate_headers(a1, api, data='', method='POST'):
     return headers, data
 
 def generate_request_params(cookies_str, api, data='', method='POST'):
-    cookies = trans_cookies(cookies_str)
-    a1 = cookies['a1']
-    headers, data = generate_headers(a1, api, data, method)
-    return headers, cookies, data
+    """
+    :param cookies_str: cookie 字符串或 Credential
+    """
+    credential = Credential.of(cookies_str)
+    headers, data = generate_headers(credential.a1, api, data, method)
+    return headers, credential.cookies, data
+
+async def generate_request_params_async(cookies_str, api, data='', method='POST'):
+    """
+    generate_request_params 的异步版本
+    纯Python签名耗时很短直接计算，需要等待node的签名引擎放到线程池中执行，不阻塞事件循环
+    """
+    if SpiderConfig.SIGN_ENGINE == 'python':
+        return generate_request_params(cookies_str, api, data, method)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, generate_request_params, cookies_str, api, data, method)
+
+async def presign_async(a1, sign_items):
+    """presign 的异步版本，在线程池中执行"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, presign, a1, sign_items)
 
 def splice_str(api, params):
     url = api + '?'
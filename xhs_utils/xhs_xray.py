@@ -0,0 +1,70 @@
+"""
+x-xray-traceid 的纯Python实现，对应 static/xhs_xray.js 中的 traceId
+traceId = 16位十六进制(毫秒时间戳 << 23 | 自增序号) + 16位十六进制(64位随机数)
+"""
+import random
+import threading
+import time
+from collections import deque
+
+MAX_SEQ = (1 << 23) - 1
+_MASK_64 = (1 << 64) - 1
+
+_seq = random.getrandbits(23)
+_seq_lock = threading.Lock()
+
+
+def _next_seq() -> int:
+    global _seq
+    with _seq_lock:
+        if _seq > MAX_SEQ:
+            _seq = 0
+        value = _seq
+        _seq += 1
+    return value
+
+
+def trace_id(timestamp: int = None) -> str:
+    """
+    生成 x-xray-traceid
+    :param timestamp: 毫秒时间戳，默认当前时间
+    """
+    if timestamp is None:
+        timestamp = int(time.time() * 1000)
+    head = ((timestamp << 23) | _next_seq()) & _MASK_64
+    return f'{head:016x}{random.getrandbits(64):016x}'
+
+
+class TraceIdBuffer:
+    """后台线程预先生成 traceId 的环形缓冲区，取用时不需要现场计算"""
+
+    def __init__(self, size: int, max_age: float = 2.0):
+        """
+        :param size: 缓冲区容量
+        :param max_age: traceId 中带有时间戳，超过该时长（秒）的预生成值直接丢弃
+        """
+        self.size = size
+        self.max_age = max_age
+        self._buffer = deque(maxlen=size)
+        self._refill = threading.Event()
+        self._refill.set()
+        threading.Thread(target=self._fill_loop, daemon=True).start()
+
+    def _fill_loop(self):
+        while True:
+            self._refill.wait()
+            self._refill.clear()
+            while len(self._buffer) < self.size:
+                self._buffer.append((time.monotonic(), trace_id()))
+
+    def get(self) -> str:
+        # 低于一半容量时通知后台线程补充
+        if len(self._buffer) < self.size // 2:
+            self._refill.set()
+        while True:
+            try:
+                created_at, value = self._buffer.popleft()
+            except IndexError:
+                return trace_id()
+            if time.monotonic() - created_at <= self.max_age:
+                return value